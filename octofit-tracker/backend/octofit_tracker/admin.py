@@ -1,23 +1,56 @@
 from django.contrib import admin
-from .models import User, Team, Activity, Leaderboard, Workout
+from .models import User, Team, TeamMembership, Activity, Leaderboard, Workout
+from .search import matching_ids
+
+
+class FixedNaturalKeyAdminMixin:
+    """Shows ``natural_key`` read-only on existing rows; other tables refer to it by value"""
+    natural_key = None
+
+    def get_readonly_fields(self, request, obj=None):
+        fields = super().get_readonly_fields(request, obj)
+        return [*fields, self.natural_key] if obj is not None else fields
+
+
+class IndexedSearchMixin:
+    """Answers the changelist search box from the search index instead of LIKE scans"""
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=matching_ids(self.search_kind, search_term)), False
 
 
 @admin.register(User)
-class UserAdmin(admin.ModelAdmin):
+class UserAdmin(FixedNaturalKeyAdminMixin, IndexedSearchMixin, admin.ModelAdmin):
     """Admin configuration for User model"""
+    natural_key = 'username'
+    search_kind = 'user'
     list_display = ['username', 'email', 'full_name', 'team', 'created_at']
     list_filter = ['team', 'created_at']
-    search_fields = ['username', 'email', 'full_name']
+    search_fields = ['username', 'full_name', 'email']
+    list_select_related = ['team']
     ordering = ['-created_at']
 
 
+class TeamMembershipInline(admin.TabularInline):
+    """Roster rows edited on the team page"""
+    model = TeamMembership
+    raw_id_fields = ['user']
+    extra = 0
+
+
 @admin.register(Team)
-class TeamAdmin(admin.ModelAdmin):
+class TeamAdmin(FixedNaturalKeyAdminMixin, IndexedSearchMixin, admin.ModelAdmin):
     """Admin configuration for Team model"""
+    natural_key = 'name'
+    search_kind = 'team'
     list_display = ['name', 'captain', 'total_points', 'created_at']
     list_filter = ['created_at']
-    search_fields = ['name', 'captain']
+    search_fields = ['name', 'captain', 'description']
     ordering = ['-total_points']
+    inlines = [TeamMembershipInline]
 
 
 @admin.register(Activity)
@@ -25,7 +58,8 @@ class ActivityAdmin(admin.ModelAdmin):
     """Admin configuration for Activity model"""
     list_display = ['user', 'activity_type', 'duration', 'distance', 'calories', 'points', 'date']
     list_filter = ['activity_type', 'date', 'created_at']
-    search_fields = ['user', 'activity_type']
+    search_fields = ['user__username', 'activity_type']
+    list_select_related = ['user']
     ordering = ['-date']
 
 
@@ -34,14 +68,16 @@ class LeaderboardAdmin(admin.ModelAdmin):
     """Admin configuration for Leaderboard model"""
     list_display = ['rank', 'user', 'team', 'total_points', 'total_activities', 'last_updated']
     list_filter = ['team', 'last_updated']
-    search_fields = ['user', 'team']
+    search_fields = ['user__username', 'team__name']
+    list_select_related = ['user', 'team']
     ordering = ['rank']
 
 
 @admin.register(Workout)
-class WorkoutAdmin(admin.ModelAdmin):
+class WorkoutAdmin(IndexedSearchMixin, admin.ModelAdmin):
     """Admin configuration for Workout model"""
+    search_kind = 'workout'
     list_display = ['name', 'difficulty', 'duration', 'category', 'created_at']
     list_filter = ['difficulty', 'category', 'created_at']
-    search_fields = ['name', 'category', 'recommended_for']
+    search_fields = ['name', 'category', 'description', 'exercises', 'recommended_for']
     ordering = ['difficulty', 'name']
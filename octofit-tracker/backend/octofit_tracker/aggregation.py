@@ -0,0 +1,237 @@
+"""
+Incremental maintenance of the aggregates derived from activities.
+
+``apply_activity_changes`` is the single entry point for activity writes;
+it updates the leaderboard and team totals here and the time-bucketed
+rollups in ``rollups``. Activity writes are folded into per-user point and
+activity-count deltas that are applied to the affected ``Leaderboard`` row
+and its team's totals in the caller's transaction. Ranks form a dense
+ordering on ``(-total_points, user)``: when a row's points change, only the
+rows it overtakes (or falls behind) are shifted by one, so standings never
+need a full recount. ``team_rank`` is the same ordering within the entry's
+team, so its shifts stay inside that team's partition. Committed changes
+are also published to live subscribers (see ``live``).
+
+Team member counts follow roster changes through
+``apply_membership_change`` and ``recount_members``.
+
+An entry's ``team`` is the team every aggregate is attributed to: team
+totals, ``team_rank`` and the team rollups. It mirrors ``User.team``; when a
+user changes team, ``apply_team_change`` moves the entry together with its
+totals and team rollups.
+
+Deleting a user or team goes through ``remove_user`` and ``remove_team``
+(wired to ``pre_delete``), which take their contributions out of the
+aggregates before the database cascades remove or detach the rows.
+"""
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from . import live, rollups
+from .models import Activity, Leaderboard, Team, TeamMembership, User
+from .versions import bump_on_commit, user_activity_namespace
+
+
+def activity_deltas(added=(), removed=()):
+    """Collapse activities into ``{username: (points, activities)}`` deltas"""
+    deltas = defaultdict(lambda: [0, 0])
+    for activity in added:
+        delta = deltas[activity.user_id]
+        delta[0] += activity.points
+        delta[1] += 1
+    for activity in removed:
+        delta = deltas[activity.user_id]
+        delta[0] -= activity.points
+        delta[1] -= 1
+    return {user: tuple(delta) for user, delta in deltas.items() if delta != [0, 0]}
+
+
+def apply_activity_changes(added=(), removed=()):
+    """
+    Apply created, updated or deleted activities to the aggregates.
+
+    An update is passed as the new instance in ``added`` and a copy of the
+    previous state in ``removed``.
+    """
+    added, removed = list(added), list(removed)
+    deltas = activity_deltas(added, removed)
+    moved = []
+    with transaction.atomic():
+        # Fixed order so concurrent batches lock rows consistently.
+        for username in sorted(deltas):
+            points, activities = deltas[username]
+            moved.append(live.entry_payload(apply_delta(username, points, activities), points))
+        rollups.apply_activity_changes(added, removed)
+        if added or removed:
+            # Bulk inserts and rank shifts send no model signals.
+            users = {user_activity_namespace(activity.user_id) for activity in added + removed}
+            bump_on_commit('activity', 'leaderboard', 'team', *sorted(users))
+        if moved:
+            transaction.on_commit(lambda: live.get_broadcaster().publish(moved))
+    return deltas
+
+
+def apply_delta(username, points, activities):
+    """Add ``points`` and ``activities`` to a user's leaderboard entry and team"""
+    with transaction.atomic():
+        entry = Leaderboard.objects.select_for_update().filter(user_id=username).first()
+        if entry is None:
+            try:
+                with transaction.atomic():
+                    entry = _insert_entry(username, points, activities)
+            except IntegrityError:
+                # A concurrent writer created the entry after our lookup.
+                entry = Leaderboard.objects.select_for_update().get(user_id=username)
+                _move_entry(entry, entry.total_points + points, activities)
+        else:
+            _move_entry(entry, entry.total_points + points, activities)
+        if entry.team_id:
+            Team.objects.filter(name=entry.team_id).update(
+                total_points=F('total_points') + points,
+                total_activities=F('total_activities') + activities,
+            )
+    return entry
+
+
+def apply_membership_change(team, members):
+    """Add ``members`` (negative to remove) to a team's member count"""
+    Team.objects.filter(name=team).update(member_count=F('member_count') + members)
+
+
+def apply_team_change(username, team):
+    """Move a user's entry, with the totals and team rollups it carries, to ``team``"""
+    with transaction.atomic():
+        entry = Leaderboard.objects.select_for_update().filter(user_id=username).first()
+        if entry is None or entry.team_id == team:
+            return entry
+        previous = entry.team_id
+        team_entries(previous).filter(team_rank__gt=entry.team_rank).update(team_rank=F('team_rank') - 1)
+        team_rank = _position(entry.total_points, username, team_entries(team))
+        team_entries(team).filter(team_rank__gte=team_rank).update(team_rank=F('team_rank') + 1)
+        Leaderboard.objects.filter(pk=entry.pk).update(team_id=team, team_rank=team_rank)
+        for name, sign in ((previous, -1), (team, 1)):
+            if name is not None:
+                Team.objects.filter(name=name).update(
+                    total_points=F('total_points') + sign * entry.total_points,
+                    total_activities=F('total_activities') + sign * entry.total_activities,
+                )
+        rollups.move_user(username, previous, team)
+        bump_on_commit('leaderboard', 'team')
+    entry.team_id, entry.team_rank = team, team_rank
+    return entry
+
+
+def remove_user(username):
+    """Take a user's activities and entry out of the aggregates, closing the gaps in both rankings"""
+    with transaction.atomic():
+        activities = Activity.objects.filter(user_id=username).only(
+            'user', 'activity_type', 'duration', 'distance', 'calories', 'points', 'date',
+        )
+        apply_activity_changes(removed=activities)
+        entry = Leaderboard.objects.select_for_update().filter(user_id=username).first()
+        if entry is not None:
+            Leaderboard.objects.filter(pk=entry.pk).delete()
+            Leaderboard.objects.filter(rank__gt=entry.rank).update(rank=F('rank') - 1)
+            team_entries(entry.team_id).filter(team_rank__gt=entry.team_rank).update(team_rank=F('team_rank') - 1)
+            bump_on_commit('leaderboard', 'team')
+        rollups.remove_key('user', username)
+
+
+def remove_team(team):
+    """Move a team's entries to the teamless partition and drop its rollups"""
+    with transaction.atomic():
+        members = Leaderboard.objects.filter(team_id=team).order_by('team_rank').values_list('user_id', flat=True)
+        for username in list(members):
+            apply_team_change(username, None)
+        rollups.remove_key('team', team)
+
+
+def recount_members(teams):
+    """Recompute ``member_count`` for the named teams from their rosters"""
+    teams = set(teams)
+    counts = dict(
+        TeamMembership.objects.filter(team__in=teams).values_list('team').annotate(members=Count('id')).order_by()
+    )
+    for team in teams:
+        counts.setdefault(team, 0)
+        Team.objects.filter(name=team).update(member_count=counts[team])
+    return counts
+
+
+def rebuild_ranks():
+    """Recompute every rank from scratch; only needed to repair legacy data"""
+    changed = {}
+    entries = Leaderboard.objects.order_by('-total_points', 'user_id').only('id', 'team', 'rank', 'team_rank')
+    team_ranks = defaultdict(int)
+    for rank, entry in enumerate(entries.iterator(), start=1):
+        team_ranks[entry.team_id] += 1
+        if (entry.rank, entry.team_rank) != (rank, team_ranks[entry.team_id]):
+            entry.rank, entry.team_rank = rank, team_ranks[entry.team_id]
+            changed[entry.pk] = entry
+    Leaderboard.objects.bulk_update(changed.values(), ['rank', 'team_rank'], batch_size=1000)
+    return len(changed)
+
+
+def team_entries(team):
+    """The partition of entries ranked by ``team_rank``; teamless users share one"""
+    if team is None:
+        return Leaderboard.objects.filter(team__isnull=True)
+    return Leaderboard.objects.filter(team_id=team)
+
+
+def _position(points, username, entries=None):
+    """1-based rank that ``(points, username)`` takes among the other ``entries``"""
+    entries = Leaderboard.objects.all() if entries is None else entries
+    ahead = entries.filter(
+        Q(total_points__gt=points) | Q(total_points=points, user_id__lt=username)
+    ).exclude(user_id=username)
+    return ahead.count() + 1
+
+
+def _shift(entries, field, old, new):
+    """Shift the ``entries`` between ranks ``old`` and ``new`` by one place towards ``old``"""
+    if new < old:
+        entries.filter(**{f'{field}__gte': new, f'{field}__lt': old}).update(**{field: F(field) + 1})
+    elif new > old:
+        entries.filter(**{f'{field}__gt': old, f'{field}__lte': new}).update(**{field: F(field) - 1})
+
+
+def _insert_entry(username, points, activities):
+    team = User.objects.filter(username=username).values_list('team', flat=True).first()
+    rank = _position(points, username)
+    team_rank = _position(points, username, team_entries(team))
+    Leaderboard.objects.filter(rank__gte=rank).update(rank=F('rank') + 1)
+    team_entries(team).filter(team_rank__gte=team_rank).update(team_rank=F('team_rank') + 1)
+    return Leaderboard.objects.create(
+        user_id=username,
+        team_id=team,
+        total_points=points,
+        total_activities=activities,
+        rank=rank,
+        team_rank=team_rank,
+    )
+
+
+def _move_entry(entry, new_points, activities):
+    new_rank, new_team_rank = entry.rank, entry.team_rank
+    if new_points != entry.total_points:
+        teammates = team_entries(entry.team_id).exclude(pk=entry.pk)
+        new_rank = _position(new_points, entry.user_id)
+        new_team_rank = _position(new_points, entry.user_id, teammates)
+        _shift(Leaderboard.objects.exclude(pk=entry.pk), 'rank', entry.rank, new_rank)
+        # Only this team's partition moves for the in-team ranking.
+        _shift(teammates, 'team_rank', entry.team_rank, new_team_rank)
+    Leaderboard.objects.filter(pk=entry.pk).update(
+        total_points=F('total_points') + (new_points - entry.total_points),
+        total_activities=F('total_activities') + activities,
+        rank=new_rank,
+        team_rank=new_team_rank,
+        last_updated=timezone.now(),
+    )
+    entry.total_points = new_points
+    entry.total_activities += activities
+    entry.rank = new_rank
+    entry.team_rank = new_team_rank
@@ -13,4 +13,9 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once Django is set up; the router serves /api/live/ streams itself.
+from octofit_tracker.streams import LiveRouter  # noqa: E402
+
+application = LiveRouter(django_application)
@@ -0,0 +1,6 @@
+"""
+API benchmark suite.
+
+Run it with ``python manage.py benchmark``; see ``runner`` for the timing and
+baseline comparison logic and ``endpoints`` for what gets exercised.
+"""
@@ -0,0 +1,94 @@
+"""
+The endpoints exercised by the benchmark suite.
+
+Every GET route registered on the API router is discovered automatically
+(list, detail and ``@action`` routes), plus the plain Django views in
+``urls.py``. ``ACTION_PARAMS`` supplies realistic query parameters for
+actions that need them, drawn from the seeded dataset. ``LOAD_TEST_ENDPOINTS``
+are the hot reads load-tested under WSGI and ASGI for the concurrency comparison.
+"""
+from collections import namedtuple
+
+from octofit_tracker.models import User, Team, Activity, Leaderboard, Workout
+from octofit_tracker.urls import router
+
+Endpoint = namedtuple('Endpoint', ['name', 'path', 'params'])
+
+# Plain views outside the router.
+EXTRA_PATHS = [
+    ('api_root', '/api/'),
+    ('cache_stats', '/api/_cache/'),
+    ('metrics', '/api/_metrics/'),
+    ('search', '/api/search/?q=te'),
+]
+
+ACTION_PARAMS = {
+    ('user', 'by_team'): lambda sample: {'team': sample['team']},
+    ('activity', 'by_user'): lambda sample: {'user': sample['user']},
+    ('activity', 'by_type'): lambda sample: {'type': sample['activity_type']},
+    ('activity', 'export'): lambda sample: {'user': sample['user']},
+    ('activity', 'stats'): lambda sample: {'group_by': 'user', 'key': sample['user'], 'bucket': 'week'},
+    ('leaderboard', 'top_users'): lambda sample: {'limit': 10},
+    ('leaderboard', 'rank_of'): lambda sample: {'user': sample['user']},
+    ('leaderboard', 'around'): lambda sample: {'user': sample['user'], 'window': 5},
+    ('leaderboard', 'by_team'): lambda sample: {'team': sample['team']},
+    ('workout', 'by_difficulty'): lambda sample: {'difficulty': sample['difficulty']},
+    ('workout', 'by_category'): lambda sample: {'category': sample['category']},
+    ('workout', 'recommended'): lambda sample: {'user': sample['user']},
+}
+
+# Hot read paths compared under concurrent load.
+LOAD_TEST_ENDPOINTS = (
+    'activity.list',
+    'activity.by_user',
+    'leaderboard.top_users',
+    'leaderboard.by_team',
+    'workout.by_difficulty',
+    'workout.by_category',
+)
+
+MODELS = {
+    'user': User,
+    'team': Team,
+    'activity': Activity,
+    'leaderboard': Leaderboard,
+    'workout': Workout,
+}
+
+
+def sample_values():
+    """Representative filter values taken from the seeded dataset"""
+    entry = Leaderboard.objects.order_by('rank').first()
+    activity = Activity.objects.order_by('-date').first()
+    workout = Workout.objects.order_by('id').first()
+    return {
+        'user': entry.user_id if entry else '',
+        'team': entry.team_id if entry else '',
+        'activity_type': activity.activity_type if activity else '',
+        'difficulty': workout.difficulty if workout else '',
+        'category': workout.category if workout else '',
+    }
+
+
+def discover_endpoints():
+    """Build the list of GET endpoints to benchmark"""
+    sample = sample_values()
+    endpoints = [Endpoint(name, path, {}) for name, path in EXTRA_PATHS]
+    for prefix, viewset, basename in router.registry:
+        endpoints.append(Endpoint(f'{basename}.list', f'/api/{prefix}/', {}))
+        pk = MODELS[basename].objects.order_by('pk').values_list('pk', flat=True).first()
+        if pk is not None:
+            endpoints.append(Endpoint(f'{basename}.retrieve', f'/api/{prefix}/{pk}/', {}))
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping:
+                continue
+            params = ACTION_PARAMS.get((basename, extra.__name__), lambda sample: {})(sample)
+            if extra.detail:
+                if pk is None:
+                    continue
+                path = f'/api/{prefix}/{pk}/{extra.url_path}/'
+            else:
+                path = f'/api/{prefix}/{extra.url_path}/'
+            endpoints.append(Endpoint(f'{basename}.{extra.__name__}', path, params))
+    return endpoints
+
@@ -0,0 +1,141 @@
+"""
+Timing, statistics and baseline comparison for the benchmark suite.
+
+``benchmark_endpoint`` measures one request at a time; ``load_test`` keeps
+many requests in flight at once, either from threads with the sync client
+(a threaded WSGI server) or from tasks with the async client (ASGI).
+"""
+import asyncio
+import math
+import threading
+import time
+
+from django.db import connection, connections
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of ``values``"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(latencies_ms, query_counts, elapsed, statuses):
+    """Aggregate one endpoint's samples into the report format"""
+    return {
+        'requests': len(latencies_ms),
+        'p50_ms': round(percentile(latencies_ms, 50), 3),
+        'p95_ms': round(percentile(latencies_ms, 95), 3),
+        'p99_ms': round(percentile(latencies_ms, 99), 3),
+        'mean_ms': round(sum(latencies_ms) / len(latencies_ms), 3) if latencies_ms else 0.0,
+        'throughput_rps': round(len(latencies_ms) / elapsed, 2) if elapsed else 0.0,
+        'queries': max(query_counts) if query_counts else 0,
+        'statuses': sorted(set(statuses)),
+    }
+
+
+def benchmark_endpoint(client, endpoint, iterations, warmup=0):
+    """Issue ``iterations`` GETs against ``endpoint`` and summarize them"""
+    for _ in range(warmup):
+        client.get(endpoint.path, endpoint.params)
+
+    latencies_ms, query_counts, statuses = [], [], []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as queries:
+            request_started = time.perf_counter()
+            response = client.get(endpoint.path, endpoint.params)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            latencies_ms.append((time.perf_counter() - request_started) * 1000)
+        query_counts.append(len(queries))
+        statuses.append(response.status_code)
+    elapsed = time.perf_counter() - started
+    return summarize(latencies_ms, query_counts, elapsed, statuses)
+
+
+def run(endpoints, iterations, warmup=0, progress=None):
+    """Benchmark every endpoint with a fresh Django test client"""
+    client = Client()
+    results = {}
+    for endpoint in endpoints:
+        results[endpoint.name] = benchmark_endpoint(client, endpoint, iterations, warmup)
+        if progress:
+            progress(endpoint, results[endpoint.name])
+    return results
+
+
+def load_test(endpoint, concurrency, total, use_async=False):
+    """Issue ``total`` GETs against ``endpoint`` with ``concurrency`` in flight"""
+    remaining = iter(range(total))
+    latencies_ms, statuses = [], []
+    started = time.perf_counter()
+    if use_async:
+        asyncio.run(_async_load(endpoint, concurrency, remaining, latencies_ms, statuses))
+    else:
+        _threaded_load(endpoint, concurrency, remaining, latencies_ms, statuses)
+    elapsed = time.perf_counter() - started
+    result = summarize(latencies_ms, [], elapsed, statuses)
+    result['concurrency'] = concurrency
+    return result
+
+
+def _threaded_load(endpoint, concurrency, remaining, latencies_ms, statuses):
+    lock = threading.Lock()
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                with lock:
+                    if next(remaining, None) is None:
+                        return
+                request_started = time.perf_counter()
+                response = client.get(endpoint.path, endpoint.params)
+                with lock:
+                    latencies_ms.append((time.perf_counter() - request_started) * 1000)
+                    statuses.append(response.status_code)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+async def _async_load(endpoint, concurrency, remaining, latencies_ms, statuses):
+    client = AsyncClient()
+
+    async def worker():
+        while next(remaining, None) is not None:
+            request_started = time.perf_counter()
+            response = await client.get(endpoint.path, endpoint.params)
+            latencies_ms.append((time.perf_counter() - request_started) * 1000)
+            statuses.append(response.status_code)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def compare(results, baseline, threshold):
+    """
+    Return a list of regressions against ``baseline``.
+
+    An endpoint regresses when its p95 grows by more than ``threshold``
+    (a fraction) or it issues more queries than before.
+    """
+    regressions = []
+    for name, base in baseline.get('endpoints', {}).items():
+        current = results.get(name)
+        if current is None:
+            continue
+        if base['p95_ms'] and current['p95_ms'] > base['p95_ms'] * (1 + threshold):
+            regressions.append(f"{name}: p95 {base['p95_ms']}ms -> {current['p95_ms']}ms")
+        if current['queries'] > base['queries']:
+            regressions.append(f"{name}: queries {base['queries']} -> {current['queries']}")
+    return regressions
@@ -0,0 +1,87 @@
+"""
+Conditional GET for API responses.
+
+GET responses carry a weak ``ETag`` derived from the version counters of the
+collections they are built from (see ``versions``) together with everything
+else that shapes the payload: action, URL kwargs, host, query parameters and
+negotiated format. ``Last-Modified`` comes from the time of the latest bump.
+A request whose ``If-None-Match`` (or ``If-Modified-Since``) still matches is
+answered with 304 from the counters alone, before the action queries or
+serializes anything.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from rest_framework.response import Response
+
+from .response_cache import normalize_params
+from .versions import get_state
+
+
+class PreconditionResponse(Exception):
+    """Raised from ``initial`` to skip the action when a precondition decides the response"""
+
+    def __init__(self, status_code):
+        super().__init__(status_code)
+        self.status_code = status_code
+
+
+def make_etag(view, request, versions):
+    raw = repr((
+        type(view).__name__,
+        view.action,
+        request.get_host(),
+        normalize_params(request.query_params),
+        sorted(view.kwargs.items()),
+        request.accepted_media_type,
+        sorted(versions.items()),
+    ))
+    return f'W/"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+class ConditionalGetMixin:
+    """Validators and 304 responses for a viewset's GET actions"""
+    #: Collections every GET response of the viewset is built from
+    version_namespaces = ()
+
+    def get_version_namespaces(self):
+        return self.version_namespaces
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.validators = None
+        if request.method not in ('GET', 'HEAD') or not settings.OCTOFIT_CONDITIONAL_GET_ENABLED:
+            return
+        namespaces = list(self.get_version_namespaces())
+        if not namespaces:
+            return
+        versions, last_modified = get_state(namespaces, request._request)
+        etag = make_etag(self, request, versions)
+        last_modified = int(last_modified)
+        if last_modified >= int(time.time()):
+            # More writes may land within this second and would not move the date.
+            last_modified = None
+        self.validators = (etag, last_modified)
+        response = get_conditional_response(request._request, etag=etag, last_modified=last_modified)
+        if response is not None:
+            raise PreconditionResponse(response.status_code)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, PreconditionResponse):
+            return Response(status=exc.status_code)
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        validators = getattr(self, 'validators', None)
+        if validators and response.status_code in (200, 304):
+            etag, last_modified = validators
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified)
+            # Clients may store the response but must revalidate before reuse.
+            patch_cache_control(response, no_cache=True)
+        return response
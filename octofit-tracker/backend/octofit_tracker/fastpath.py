@@ -0,0 +1,169 @@
+"""
+Read-optimized serialization for list endpoints.
+
+A ``FieldPlan`` is compiled once per serializer class. It names the columns
+to fetch with ``QuerySet.values()`` and pairs each output key with a plain
+conversion function, so list responses are built from row dicts without
+instantiating models or running DRF's per-field machinery. The output is
+identical to ``serializer_class(instance).data`` for every supported field.
+Slug relations whose slug is the foreign key's target column are read from
+the key column itself, without joining the related table. A plan may be
+limited to a subset of the fields, in which case only their columns are
+fetched and unsupported fields outside the subset do not matter.
+"""
+import datetime
+import functools
+import json
+
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import ISO_8601, serializers
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+# Field types whose representation is a builtin conversion of the raw value.
+_CONVERTERS = {
+    serializers.CharField: str,
+    serializers.EmailField: str,
+    serializers.IntegerField: int,
+    serializers.FloatField: float,
+    serializers.BooleanField: bool,
+}
+
+
+class UnsupportedField(Exception):
+    """The serializer has a field the fast path cannot reproduce exactly"""
+
+
+class FieldPlan:
+    """Precompiled ``values()`` columns and converters for a serializer"""
+
+    def __init__(self, serializer_class, fields=None):
+        self.serializer_class = serializer_class
+        self.steps = []
+        model = serializer_class.Meta.model
+        for name, field in serializer_class().fields.items():
+            if field.write_only or (fields is not None and name not in fields):
+                continue
+            if isinstance(field, serializers.SlugRelatedField) and '.' not in field.source:
+                self.steps.append((name, field.source, _foreign_key_converter(model, field)))
+                continue
+            if isinstance(field, (serializers.RelatedField, serializers.ManyRelatedField,
+                                  serializers.SerializerMethodField, serializers.BaseSerializer)):
+                raise UnsupportedField(name)
+            if '.' in field.source or field.source == '*':
+                raise UnsupportedField(name)
+            self.steps.append((name, field.source, _converter(field)))
+        self.columns = [source for _, source, _ in self.steps]
+
+    def represent(self, rows):
+        """Turn ``values()`` rows into the serializer's output dicts"""
+        steps = [
+            (name, source, convert.bind() if isinstance(convert, _DateTimeConverter) else convert)
+            for name, source, convert in self.steps
+        ]
+        return [
+            {
+                name: None if row[source] is None else convert(row[source])
+                for name, source, convert in steps
+            }
+            for row in rows
+        ]
+
+
+class _DateTimeConverter:
+    """
+    ISO 8601 datetimes without DRF's per-value timezone lookups.
+
+    The target timezone is resolved once per response by ``bind()``; values
+    the shortcut does not cover go through the field itself.
+    """
+
+    def __init__(self, field):
+        self.field = field
+
+    def bind(self):
+        field = self.field
+        output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+        tz = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+        if output_format is None or output_format.lower() != ISO_8601 or tz is None:
+            return field.to_representation
+        fallback = field.to_representation
+
+        def convert(value):
+            if not isinstance(value, datetime.datetime) or value.tzinfo is None:
+                return fallback(value)
+            value = value.astimezone(tz).isoformat()
+            return value[:-6] + 'Z' if value.endswith('+00:00') else value
+        return convert
+
+
+def _converter(field):
+    for field_class, convert in _CONVERTERS.items():
+        if type(field) is field_class:
+            return convert
+    if isinstance(field, serializers.JSONField) and not field.binary:
+        return _identity
+    if type(field) is serializers.DateTimeField:
+        return _DateTimeConverter(field)
+    if isinstance(field, (serializers.DateField, serializers.TimeField)):
+        return field.to_representation
+    raise UnsupportedField(field.field_name)
+
+
+def _foreign_key_converter(model, field):
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        raise UnsupportedField(field.field_name)
+    if not (model_field.many_to_one or model_field.one_to_one) or model_field.target_field.name != field.slug_field:
+        raise UnsupportedField(field.field_name)
+    return _identity
+
+
+def _identity(value):
+    return value
+
+
+@functools.lru_cache(maxsize=None)
+def plan_for(serializer_class, fields=None):
+    """The cached plan for ``serializer_class`` (or its ``fields`` subset), or ``None`` if unsupported"""
+    try:
+        return FieldPlan(serializer_class, fields)
+    except UnsupportedField:
+        return None
+
+
+@functools.lru_cache(maxsize=None)
+def readable_fields(serializer_class):
+    """``{name: source}`` for the fields ``serializer_class`` outputs, in order"""
+    return {
+        name: field.source
+        for name, field in serializer_class().fields.items()
+        if not field.write_only
+    }
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes plain data with a preconfigured C encoder.
+
+    Produces the same bytes as ``JSONRenderer`` and falls back to it whenever
+    the payload needs DRF's encoder (dates, decimals, lazy strings, ...) or
+    indentation was requested.
+    """
+    _encoder = json.JSONEncoder(
+        ensure_ascii=False, allow_nan=False, check_circular=False, separators=(',', ':'),
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if (self.ensure_ascii or not self.compact or not self.strict
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = self._encoder.encode(data)
+        except (TypeError, ValueError):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = ret.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return ret.encode()
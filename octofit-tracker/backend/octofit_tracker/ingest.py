@@ -0,0 +1,199 @@
+"""
+Write-behind ingestion of activities.
+
+With ``OCTOFIT_INGEST_QUEUE_ENABLED``, ``POST /api/activities/`` validates the
+activity, appends it to a durable SQLite queue next to the application
+(``OCTOFIT_INGEST_QUEUE_PATH``) and answers 202 with the entry's key. The
+``drain_activity_queue`` worker stores queued activities in batches: one
+``bulk_create`` and one coalesced leaderboard/team update per batch instead
+of one transaction per request.
+
+Every entry carries a unique ``ingest_key`` that is stored on the activity.
+A worker claims its batch for ``OCTOFIT_INGEST_CLAIM_SECONDS``, so several
+workers drain disjoint batches. Entries are only removed from the queue
+after the batch has committed, and a batch skips keys that are already
+stored, so replaying the claim of a crashed worker stores each activity
+exactly once. Workers must share ``OCTOFIT_INGEST_QUEUE_PATH`` (one host) and
+publish live changes through a shared ``OCTOFIT_LIVE_BACKEND``; cache
+invalidation already goes through the database (see ``versions``). The queue holds at most
+``OCTOFIT_INGEST_QUEUE_MAX_PENDING`` entries; beyond that ``put`` raises
+``QueueFull`` and clients are asked to retry.
+"""
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+
+from .aggregation import apply_activity_changes
+from .models import Activity, User
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    key TEXT NOT NULL UNIQUE,
+    payload TEXT NOT NULL,
+    enqueued_at REAL NOT NULL,
+    claimed_until REAL NOT NULL DEFAULT 0
+)
+"""
+
+_FIELDS = [field for field in Activity._meta.concrete_fields if not field.primary_key]
+
+
+class QueueFull(Exception):
+    """The queue already holds its maximum number of pending entries"""
+
+
+def encode(data):
+    """Serialize validated activity data for the queue"""
+    activity = Activity(**data)
+    return json.dumps(
+        {field.attname: field.value_from_object(activity) for field in _FIELDS if field.name in data},
+        cls=DjangoJSONEncoder,
+    )
+
+
+def decode(key, payload):
+    """The unsaved ``Activity`` for a queue entry"""
+    values = json.loads(payload)
+    return Activity(ingest_key=key, **{
+        field.attname: field.to_python(values[field.attname]) for field in _FIELDS if field.attname in values
+    })
+
+
+class IngestQueue:
+    """An append-only queue of activity payloads in a SQLite file"""
+
+    def __init__(self, path, max_pending):
+        self.path = str(path)
+        self.max_pending = max_pending
+        self._local = threading.local()
+
+    @property
+    def connection(self):
+        # sqlite3 connections may not be shared between threads.
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=FULL')
+            connection.execute(SCHEMA)
+            columns = {row[1] for row in connection.execute('PRAGMA table_info(entries)')}
+            if 'claimed_until' not in columns:
+                # Queue files written before batches were claimed.
+                connection.execute('ALTER TABLE entries ADD COLUMN claimed_until REAL NOT NULL DEFAULT 0')
+            self._local.connection = connection
+        return connection
+
+    def put(self, payloads):
+        """Append encoded payloads; returns their keys"""
+        keys = [uuid.uuid4().hex for _ in payloads]
+        connection = self.connection
+        # BEGIN IMMEDIATE serialises writers, so the capacity check cannot race.
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            (pending,) = connection.execute('SELECT COUNT(*) FROM entries').fetchone()
+            if pending + len(payloads) > self.max_pending:
+                raise QueueFull(f'{pending} activities are already waiting')
+            now = time.time()
+            connection.executemany(
+                'INSERT INTO entries (key, payload, enqueued_at) VALUES (?, ?, ?)',
+                [(key, payload, now) for key, payload in zip(keys, payloads)],
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return keys
+
+    def claim(self, limit, lease):
+        """
+        Reserve the oldest ``limit`` unclaimed entries for ``lease`` seconds.
+
+        Returns them as ``(seq, key, payload)``. Claims of a worker that
+        died expire, and its entries are handed out again.
+        """
+        connection = self.connection
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            now = time.time()
+            entries = connection.execute(
+                'SELECT seq, key, payload FROM entries WHERE claimed_until < ? ORDER BY seq LIMIT ?', (now, limit),
+            ).fetchall()
+            connection.executemany(
+                'UPDATE entries SET claimed_until = ? WHERE seq = ?', [(now + lease, seq) for seq, _, _ in entries],
+            )
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        connection.execute('COMMIT')
+        return entries
+
+    def ack(self, seqs):
+        """Remove the entries ``seqs``"""
+        self.connection.executemany('DELETE FROM entries WHERE seq = ?', [(seq,) for seq in seqs])
+
+    def contains(self, key):
+        return self.connection.execute('SELECT 1 FROM entries WHERE key = ?', (key,)).fetchone() is not None
+
+    def stats(self):
+        pending, oldest = self.connection.execute('SELECT COUNT(*), MIN(enqueued_at) FROM entries').fetchone()
+        return {
+            'pending': pending,
+            'max_pending': self.max_pending,
+            'oldest_age': round(time.time() - oldest, 3) if oldest is not None else None,
+        }
+
+
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+def get_queue():
+    """The process-wide queue at ``OCTOFIT_INGEST_QUEUE_PATH``"""
+    path = str(settings.OCTOFIT_INGEST_QUEUE_PATH)
+    if path not in _queues:
+        with _queues_lock:
+            if path not in _queues:
+                _queues[path] = IngestQueue(path, settings.OCTOFIT_INGEST_QUEUE_MAX_PENDING)
+    queue = _queues[path]
+    queue.max_pending = settings.OCTOFIT_INGEST_QUEUE_MAX_PENDING
+    return queue
+
+
+def drain_batch(queue, batch_size=None):
+    """Store the oldest queued activities; returns ``(entries drained, activities created)``"""
+    entries = queue.claim(batch_size or settings.OCTOFIT_INGEST_BATCH_SIZE, settings.OCTOFIT_INGEST_CLAIM_SECONDS)
+    if not entries:
+        return 0, 0
+    activities = [decode(key, payload) for _, key, payload in entries]
+    try:
+        created = _store(activities)
+    except IntegrityError:
+        # Another worker stored some of these after our claim had expired.
+        created = _store(activities)
+    queue.ack([seq for seq, _, _ in entries])
+    return len(entries), len(created)
+
+
+def _store(activities):
+    """Create the activities not stored yet and apply them to the totals"""
+    with transaction.atomic():
+        # Keys stored before a crash prevented their acknowledgement are skipped.
+        stored = set(Activity.objects.filter(
+            ingest_key__in=[activity.ingest_key for activity in activities],
+        ).values_list('ingest_key', flat=True))
+        # Activities of users deleted since they were queued are dropped.
+        users = set(User.objects.filter(
+            username__in={activity.user_id for activity in activities},
+        ).values_list('username', flat=True))
+        fresh = [activity for activity in activities
+                 if activity.ingest_key not in stored and activity.user_id in users]
+        created = Activity.objects.bulk_create(fresh, batch_size=settings.OCTOFIT_BULK_BATCH_SIZE)
+        apply_activity_changes(added=created)
+    return created
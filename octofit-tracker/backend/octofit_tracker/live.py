@@ -0,0 +1,198 @@
+"""
+Live leaderboard changes for streaming clients.
+
+Activity writes publish the leaderboard entries they moved once their
+transaction commits. The process-wide ``Broadcaster`` coalesces everything
+received within ``OCTOFIT_LIVE_TICK`` seconds into one frame per user, encodes
+it once and hands it to every subscriber, so the cost of a write does not grow
+with the number of viewers.
+
+Changes travel through a pluggable backend (``OCTOFIT_LIVE_BACKEND``). The
+default ``LocalBackend`` only reaches subscribers in the same process;
+``RedisBackend`` relays changes over pub/sub so every node sees writes made on
+any other.
+"""
+import asyncio
+import json
+import threading
+import time
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+# Frames a subscriber may fall behind before it is resynchronised.
+QUEUE_SIZE = 64
+
+#: Queued in place of updates a slow subscriber had to drop
+RESYNC = object()
+
+
+def encode_event(event, data, event_id=None):
+    """One server-sent event"""
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines += [f'event: {event}', 'data: ' + json.dumps(data, separators=(',', ':'))]
+    return ('\n'.join(lines) + '\n\n').encode('utf-8')
+
+
+class LocalBackend:
+    """Delivers published changes to listeners in this process"""
+
+    def __init__(self):
+        self._listeners = []
+
+    def subscribe(self, listener):
+        self._listeners.append(listener)
+
+    def publish(self, entries):
+        self.deliver(entries)
+
+    def deliver(self, entries):
+        for listener in self._listeners:
+            listener(entries)
+
+
+class RedisBackend(LocalBackend):
+    """Relays changes between processes over a Redis pub/sub channel"""
+    channel = 'octofit:live:leaderboard'
+
+    def __init__(self):
+        super().__init__()
+        try:
+            import redis
+        except ImportError as exc:
+            raise ImproperlyConfigured('RedisBackend requires the redis package') from exc
+        self.client = redis.Redis.from_url(settings.OCTOFIT_LIVE_REDIS_URL)
+        self._reader = None
+
+    def subscribe(self, listener):
+        super().subscribe(listener)
+        if self._reader is None:
+            self._reader = threading.Thread(target=self._read, name='octofit-live-redis', daemon=True)
+            self._reader.start()
+
+    def publish(self, entries):
+        self.client.publish(self.channel, json.dumps(entries))
+
+    def _read(self):
+        pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(self.channel)
+        for message in pubsub.listen():
+            self.deliver(json.loads(message['data']))
+
+
+class Subscription:
+    """Frames waiting for one streaming client, consumed on its event loop"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+
+    def offer(self, frame):
+        """Queue ``frame`` from any thread"""
+        try:
+            self.loop.call_soon_threadsafe(self._put, frame)
+        except RuntimeError:
+            pass  # the loop has closed
+
+    def _put(self, frame):
+        if self.queue.full():
+            # Too far behind for deltas to help; start over from a snapshot.
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            frame = RESYNC
+        self.queue.put_nowait(frame)
+
+
+class Broadcaster:
+    """Coalesces leaderboard changes and fans them out once per tick"""
+
+    def __init__(self, backend, tick):
+        self.backend = backend
+        self.tick = tick
+        self.sequence = 0
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._subscribers = set()
+        self._flusher = None
+        backend.subscribe(self.receive)
+
+    def publish(self, entries):
+        """Send changed entries to every node's subscribers"""
+        self.backend.publish(entries)
+
+    def receive(self, entries):
+        with self._lock:
+            if not self._subscribers:
+                return
+            for entry in entries:
+                previous = self._pending.get(entry['user'])
+                if previous is not None:
+                    entry = dict(entry, delta=previous['delta'] + entry['delta'])
+                self._pending[entry['user']] = entry
+
+    def subscribe(self):
+        """Register a subscriber on the running event loop"""
+        subscription = Subscription(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._run, name='octofit-live', daemon=True)
+                self._flusher.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def flush(self):
+        """Send the changes collected since the last flush as one frame"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            subscribers = list(self._subscribers)
+            if not pending:
+                return 0
+            self.sequence += 1
+            sequence = self.sequence
+        entries = sorted(pending.values(), key=lambda entry: (-entry['total_points'], entry['user']))
+        frame = encode_event('update', {'entries': entries}, sequence)
+        for subscription in subscribers:
+            subscription.offer(frame)
+        return len(subscribers)
+
+    def _run(self):
+        while True:
+            time.sleep(self.tick)
+            self.flush()
+            with self._lock:
+                if not self._subscribers:
+                    self._flusher = None
+                    return
+
+
+_broadcaster = None
+_broadcaster_lock = threading.Lock()
+
+
+def get_broadcaster():
+    """The process-wide broadcaster"""
+    global _broadcaster
+    if _broadcaster is None:
+        with _broadcaster_lock:
+            if _broadcaster is None:
+                backend = import_string(settings.OCTOFIT_LIVE_BACKEND)()
+                _broadcaster = Broadcaster(backend, settings.OCTOFIT_LIVE_TICK)
+    return _broadcaster
+
+
+def entry_payload(entry, delta):
+    """The streamed form of a ``Leaderboard`` row"""
+    return {
+        'user': entry.user_id,
+        'team': entry.team_id,
+        'total_points': entry.total_points,
+        'total_activities': entry.total_activities,
+        'rank': entry.rank,
+        'team_rank': entry.team_rank,
+        'delta': delta,
+    }
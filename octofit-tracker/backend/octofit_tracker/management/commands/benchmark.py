@@ -0,0 +1,134 @@
+import json
+import platform
+from io import StringIO
+
+import django
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (
+    override_settings, setup_databases, setup_test_environment,
+    teardown_databases, teardown_test_environment,
+)
+from django.utils import timezone
+from octofit_tracker.benchmarks import runner
+from octofit_tracker.benchmarks.endpoints import LOAD_TEST_ENDPOINTS, discover_endpoints
+
+
+class Command(BaseCommand):
+    help = 'Seed a throwaway test database and benchmark every API endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200, help='Users to seed')
+        parser.add_argument('--activities-per-user', type=int, default=10, help='Activities per seeded user')
+        parser.add_argument('--teams', type=int, default=4, help='Teams to seed')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the dataset')
+        parser.add_argument('--iterations', type=int, default=50, help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Untimed requests per endpoint')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only run endpoints whose name starts with this prefix (repeatable)')
+        parser.add_argument('--disable-cache', action='store_true', help='Bypass the response cache')
+        parser.add_argument('--concurrency', type=int, default=0,
+                            help='Also load-test the hot read endpoints under WSGI (threads) and ASGI '
+                                 'with this many requests in flight (e.g. 500)')
+        parser.add_argument('--load-requests', type=int, default=2000,
+                            help='Requests per endpoint and mode in the concurrency test')
+        parser.add_argument('--output', help='Write the JSON report to this file instead of stdout')
+        parser.add_argument('--baseline', help='Compare against a previously written JSON report')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='Allowed relative p95 growth before flagging a regression (default 0.2)')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Exit with an error if the baseline comparison finds regressions')
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be >= 1')
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        # Never touch the configured database: populate_db clears it.
+        setup_test_environment()
+        old_config = setup_databases(verbosity=0, interactive=False)
+        try:
+            self.stderr.write(self.style.WARNING('Seeding benchmark dataset...'))
+            call_command(
+                'populate_db',
+                users=options['users'],
+                activities_per_user=options['activities_per_user'],
+                teams=options['teams'],
+                seed=options['seed'],
+                stdout=StringIO(),
+            )
+            endpoints = [
+                endpoint for endpoint in discover_endpoints()
+                if not options['only'] or endpoint.name.startswith(tuple(options['only']))
+            ]
+            with override_settings(OCTOFIT_RESPONSE_CACHE_ENABLED=not options['disable_cache']):
+                results = runner.run(endpoints, options['iterations'], options['warmup'], self.progress)
+                load = {}
+                if options['concurrency'] > 0:
+                    load = self.load_test(endpoints, options['concurrency'], options['load_requests'])
+        finally:
+            teardown_databases(old_config, verbosity=0)
+            teardown_test_environment()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'users': options['users'],
+                'activities_per_user': options['activities_per_user'],
+                'teams': options['teams'],
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+                'cache': not options['disable_cache'],
+                'database': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+            },
+            'endpoints': results,
+        }
+        if load:
+            report['concurrency'] = load
+        payload = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as output_file:
+                output_file.write(payload + '\n')
+            self.stderr.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+        else:
+            self.stdout.write(payload)
+
+        if baseline is not None:
+            regressions = runner.compare(results, baseline, options['threshold'])
+            for regression in regressions:
+                self.stderr.write(self.style.ERROR(f'REGRESSION {regression}'))
+            if not regressions:
+                self.stderr.write(self.style.SUCCESS('No regressions against baseline'))
+            elif options['fail_on_regression']:
+                raise CommandError(f'{len(regressions)} regression(s) against baseline')
+
+    def load_test(self, endpoints, concurrency, total):
+        """Throughput of each hot endpoint under WSGI threads and the ASGI handler"""
+        load = {}
+        for endpoint in endpoints:
+            if endpoint.name not in LOAD_TEST_ENDPOINTS:
+                continue
+            sync_result = runner.load_test(endpoint, concurrency, total)
+            async_result = runner.load_test(endpoint, concurrency, total, use_async=True)
+            speedup = (async_result['throughput_rps'] / sync_result['throughput_rps']
+                       if sync_result['throughput_rps'] else 0.0)
+            load[endpoint.name] = {'sync': sync_result, 'async': async_result, 'speedup': round(speedup, 2)}
+            self.stderr.write(
+                f"{endpoint.name:<32} x{concurrency}  sync {sync_result['throughput_rps']:>8.1f} req/s  "
+                f"async {async_result['throughput_rps']:>8.1f} req/s  p99 {sync_result['p99_ms']:.1f}ms / "
+                f"{async_result['p99_ms']:.1f}ms"
+            )
+        return load
+
+    def progress(self, endpoint, result):
+        self.stderr.write(
+            f"{endpoint.name:<32} p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+            f"p99 {result['p99_ms']:>8.2f}ms  {result['throughput_rps']:>8.1f} req/s  "
+            f"{result['queries']:>3} queries"
+        )
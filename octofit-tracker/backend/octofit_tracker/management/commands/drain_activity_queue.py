@@ -0,0 +1,43 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+from octofit_tracker.live import LocalBackend
+from octofit_tracker.ingest import drain_batch, get_queue
+
+
+class Command(BaseCommand):
+    help = 'Store activities queued by write-behind ingestion (runs until interrupted unless --once)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.OCTOFIT_INGEST_BATCH_SIZE,
+                            help='Queued activities stored per transaction')
+        parser.add_argument('--interval', type=float, default=0.5,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be >= 1')
+        if import_string(settings.OCTOFIT_LIVE_BACKEND) is LocalBackend:
+            # This process has no streaming clients, so local publishes reach nobody.
+            self.stderr.write(self.style.WARNING(
+                'OCTOFIT_LIVE_BACKEND is in-process; streaming clients miss drained activities until they '
+                'resynchronise (use octofit_tracker.live.RedisBackend to publish them)'
+            ))
+        queue = get_queue()
+        drained = created = 0
+        try:
+            while True:
+                entries, stored = drain_batch(queue, options['batch_size'])
+                drained += entries
+                created += stored
+                if entries:
+                    continue
+                if options['once']:
+                    break
+                time.sleep(options['interval'])
+        except KeyboardInterrupt:
+            pass
+        self.stdout.write(self.style.SUCCESS(f'Drained {drained} queued activities ({created} stored)'))
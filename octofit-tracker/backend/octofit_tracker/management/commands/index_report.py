@@ -0,0 +1,182 @@
+from collections import namedtuple
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import UniqueConstraint
+from django.utils import timezone
+from octofit_tracker.models import (
+    User, Team, TeamMembership, Activity, ActivityRollup, Leaderboard, LeaderboardSnapshot, LeaderboardSnapshotChunk,
+    LeaderboardSnapshotUserChunk, Workout, WorkoutRecommendation,
+)
+
+
+# ``equality`` columns are matched with ``=``, ``range`` is an optional column
+# compared with ``<``/``>``, and ``ordering`` is the ORDER BY of the query.
+QueryShape = namedtuple('QueryShape', ['label', 'model', 'equality', 'range', 'ordering'])
+
+QUERY_SHAPES = [
+    QueryShape('UserViewSet.list', User, (), None, ('id',)),
+    QueryShape('UserViewSet.retrieve', User, ('id',), None, ()),
+    QueryShape('UserViewSet.by_team', User, ('team',), 'id', ('id',)),
+    QueryShape('TeamViewSet.list', Team, (), None, ('id',)),
+    QueryShape('TeamViewSet.retrieve', Team, ('id',), None, ()),
+    QueryShape('TeamViewSet.list (rosters)', TeamMembership, ('team',), None, ()),
+    QueryShape('TeamViewSet.add_member', TeamMembership, ('team', 'user'), None, ()),
+    QueryShape('TeamViewSet.remove_member', TeamMembership, ('team', 'user'), None, ()),
+    QueryShape('ActivityViewSet.list', Activity, (), 'date', ('-date', '-id')),
+    QueryShape('ActivityViewSet.retrieve', Activity, ('id',), None, ()),
+    QueryShape('ActivityViewSet.by_user', Activity, ('user',), 'date', ('-date', '-id')),
+    QueryShape('ActivityViewSet.by_type', Activity, ('activity_type',), 'date', ('-date', '-id')),
+    QueryShape('ActivityViewSet.export', Activity, (), 'date', ('date', 'id')),
+    QueryShape('ActivityViewSet.export (user)', Activity, ('user',), 'date', ('date', 'id')),
+    QueryShape('ActivityViewSet.stats', ActivityRollup, ('dimension', 'period'), 'key', ('key', 'bucket_start')),
+    QueryShape('ActivityViewSet.stats (key)', ActivityRollup, ('dimension', 'period', 'key'), 'bucket_start',
+               ('bucket_start',)),
+    QueryShape('ActivityViewSet.create (rollup bucket)', ActivityRollup, ('dimension', 'period', 'key', 'bucket_start'),
+               None, ()),
+    QueryShape('ActivityViewSet.create (user lookup)', User, ('username',), None, ()),
+    QueryShape('ActivityViewSet.create (entry lookup)', Leaderboard, ('user',), None, ()),
+    QueryShape('ActivityViewSet.create (rank position)', Leaderboard, (), 'total_points', ('-total_points', 'user')),
+    QueryShape('ActivityViewSet.create (rank shift)', Leaderboard, (), 'rank', ()),
+    QueryShape('ActivityViewSet.create (team rank position)', Leaderboard, ('team',), 'total_points',
+               ('-total_points', 'user')),
+    QueryShape('ActivityViewSet.create (team rank shift)', Leaderboard, ('team',), 'team_rank', ()),
+    QueryShape('ActivityViewSet.create (team points)', Team, ('name',), None, ()),
+    QueryShape('LeaderboardViewSet.list', Leaderboard, (), 'total_points', ('-total_points', 'user')),
+    QueryShape('LeaderboardViewSet.top_users', Leaderboard, (), None, ('-total_points',)),
+    QueryShape('LeaderboardViewSet.rank_of', Leaderboard, ('user',), None, ()),
+    QueryShape('LeaderboardViewSet.around', Leaderboard, (), 'rank', ('rank',)),
+    QueryShape('LeaderboardViewSet.by_team', Leaderboard, ('team',), 'total_points', ('-total_points', 'user')),
+    QueryShape('LeaderboardViewSet.list (window)', ActivityRollup, ('dimension', 'period'), 'bucket_start', ()),
+    QueryShape('LeaderboardViewSet.movement', LeaderboardSnapshot, (), 'taken_at', ('-taken_at',)),
+    QueryShape('LeaderboardViewSet.movement (chunks)', LeaderboardSnapshotChunk, ('snapshot',), 'first_rank',
+               ('first_rank',)),
+    QueryShape('LeaderboardViewSet.movement (user index)', LeaderboardSnapshotUserChunk, ('snapshot',), 'first_user',
+               ()),
+    QueryShape('WorkoutViewSet.list', Workout, (), None, ('id',)),
+    QueryShape('WorkoutViewSet.by_difficulty', Workout, ('difficulty',), 'id', ('id',)),
+    QueryShape('WorkoutViewSet.by_category', Workout, ('category',), 'id', ('id',)),
+    QueryShape('WorkoutViewSet.recommended', WorkoutRecommendation, ('user',), None, ()),
+]
+
+# Substrings that mark a full collection/table scan in EXPLAIN output.
+FULL_SCAN_MARKERS = ('Seq Scan', 'COLLSCAN', 'type: ALL')
+
+
+class Command(BaseCommand):
+    help = 'Report which API query shapes are served by an index and which scan the full collection'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--explain', action='store_true',
+            help='Also run EXPLAIN for every shape against the configured database',
+        )
+        parser.add_argument(
+            '--fail-on-scan', action='store_true',
+            help='Exit with an error if any shape needs a full scan',
+        )
+
+    def handle(self, *args, **options):
+        explain = options['explain'] and connection.features.supports_explaining_query_execution
+        if options['explain'] and not explain:
+            self.stdout.write(self.style.WARNING(f'{connection.vendor} does not support EXPLAIN; using model indexes only'))
+
+        scans = []
+        for shape in QUERY_SHAPES:
+            verdict, index_name = analyze(shape)
+            plan = explain_shape(shape) if explain else None
+            if plan is not None and is_full_scan(plan, shape):
+                verdict = 'FULL SCAN'
+            if verdict == 'FULL SCAN':
+                scans.append(shape.label)
+
+            style = self.style.ERROR if verdict == 'FULL SCAN' else (
+                self.style.WARNING if verdict == 'INDEX + SORT' else self.style.SUCCESS)
+            self.stdout.write(f'{shape.label:<45} {style(verdict):<14} {index_name or "-"}')
+            if plan is not None and options['verbosity'] > 1:
+                self.stdout.write(f'    {plan}')
+
+        self.stdout.write(self.style.SUCCESS('\n' + '='*50))
+        self.stdout.write(f'Query shapes: {len(QUERY_SHAPES)}')
+        self.stdout.write(f'Full scans: {len(scans)}')
+        if scans and options['fail_on_scan']:
+            raise CommandError('Full scans: ' + ', '.join(scans))
+
+
+def model_indexes(model):
+    """Yield ``(name, [(column, descending), ...])`` for every index on ``model``"""
+    yield 'primary key', [(model._meta.pk.name, False)]
+    for field in model._meta.fields:
+        if (field.unique or field.db_index) and not field.primary_key:
+            yield f'{field.name} (unique)' if field.unique else field.name, [(field.name, False)]
+    for index in model._meta.indexes:
+        yield index.name, [(name, order == 'DESC') for name, order in index.fields_orders]
+    for constraint in model._meta.constraints:
+        if isinstance(constraint, UniqueConstraint) and constraint.fields and not constraint.condition:
+            yield constraint.name, [(name, False) for name in constraint.fields]
+
+
+def analyze(shape):
+    """Return ``(verdict, index name)`` for the best index serving ``shape``"""
+    best = ('FULL SCAN', None)
+    ordering = [(name.lstrip('-'), name.startswith('-')) for name in shape.ordering]
+    for name, columns in model_indexes(shape.model):
+        prefix = {column for column, _ in columns[:len(shape.equality)]}
+        if shape.equality and prefix != set(shape.equality):
+            continue
+        rest = columns[len(shape.equality):]
+        if not shape.equality and not rest:
+            continue
+        if not shape.equality and rest[0][0] not in (shape.range, ordering[0][0] if ordering else None):
+            continue
+        if _serves_ordering(rest, ordering):
+            return 'INDEX', name
+        best = ('INDEX + SORT', name)
+    return best
+
+
+def _serves_ordering(columns, ordering):
+    if len(columns) < len(ordering):
+        return False
+    forward = all(c == o for c, o in zip(columns, ordering))
+    backward = all(c[0] == o[0] and c[1] != o[1] for c, o in zip(columns, ordering))
+    return forward or backward
+
+
+def is_full_scan(plan, shape):
+    """Whether EXPLAIN output reads the whole table to answer ``shape``"""
+    table = shape.model._meta.db_table
+    # SQLite reports ``SCAN <table>`` and ``SCAN <table> USING INDEX <name>``.
+    scanned = any(marker in plan for marker in FULL_SCAN_MARKERS) or any(
+        step.strip().endswith(f'SCAN {table}') for step in plan.split(' | '))
+    if connection.vendor == 'sqlite' and shape.equality:
+        # A SEARCH on an unrelated index still visits every row for the filter.
+        columns = [shape.model._meta.get_field(name).column for name in shape.equality]
+        scanned = scanned or not any(f'{column}=?' in plan for column in columns + ['rowid'])
+    # An unfiltered scan in index order that stops at LIMIT is the intended plan.
+    sorted_in_memory = 'TEMP B-TREE' in plan or 'Sort' in plan
+    return scanned and bool(shape.equality or shape.range or sorted_in_memory)
+
+
+def explain_shape(shape):
+    queryset = shape.model.objects.filter(**{name: _sample(shape.model, name) for name in shape.equality})
+    if shape.range:
+        queryset = queryset.filter(**{f'{shape.range}__gt': _sample(shape.model, shape.range)})
+    queryset = queryset.order_by(*shape.ordering)[:51]
+    try:
+        return ' | '.join(queryset.explain().splitlines())
+    except Exception as exc:  # EXPLAIN support varies between backends and drivers
+        return f'explain failed: {exc}'
+
+
+def _sample(model, name):
+    value = model.objects.values_list(name, flat=True).first()
+    if value is not None:
+        return value
+    field = model._meta.get_field(name)
+    internal_type = (field.target_field if field.is_relation else field).get_internal_type()
+    if internal_type == 'DateTimeField':
+        return timezone.now()
+    if internal_type == 'DateField':
+        return timezone.localdate()
+    return 0 if internal_type.endswith(('IntegerField', 'AutoField', 'FloatField')) else ''
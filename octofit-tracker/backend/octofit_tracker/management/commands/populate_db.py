@@ -1,244 +1,345 @@
-from django.core.management.base import BaseCommand
-from octofit_tracker.models import User, Team, Activity, Leaderboard, Workout
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from octofit_tracker import rollups, scoring
+from octofit_tracker.models import (
+    User, Team, TeamMembership, Activity, ActivityRollup, Leaderboard, LeaderboardSnapshot, LeaderboardSnapshotChunk,
+    LeaderboardSnapshotUserChunk, Workout, WorkoutRecommendation,
+)
+from octofit_tracker.recommendations import refresh_recommendations
+from octofit_tracker.search import rebuild_index
+from octofit_tracker.snapshots import take_snapshot
+from octofit_tracker.versions import ACTIVITY_EPOCH, bump
 from django.utils import timezone
+from collections import defaultdict
 from datetime import timedelta
 import random
 
 
+HERO_TEAMS = [
+    {
+        'name': 'Team Marvel',
+        'description': 'Avengers assemble! The mightiest heroes of the Marvel Universe.',
+        'captain': 'iron_man',
+    },
+    {
+        'name': 'Team DC',
+        'description': 'Justice League united! Protectors of truth and justice.',
+        'captain': 'superman',
+    },
+]
+
+MARVEL_HEROES = [
+    {'username': 'iron_man', 'email': 'tony.stark@marvel.com', 'full_name': 'Tony Stark', 'password': 'jarvis123', 'avatar_url': '/avatars/iron_man.svg'},
+    {'username': 'captain_america', 'email': 'steve.rogers@marvel.com', 'full_name': 'Steve Rogers', 'password': 'shield123', 'avatar_url': '/avatars/captain_america.svg'},
+    {'username': 'thor', 'email': 'thor@asgard.com', 'full_name': 'Thor Odinson', 'password': 'mjolnir123', 'avatar_url': '/avatars/thor.svg'},
+    {'username': 'black_widow', 'email': 'natasha.romanoff@marvel.com', 'full_name': 'Natasha Romanoff', 'password': 'widow123', 'avatar_url': '/avatars/black_widow.svg'},
+    {'username': 'hulk', 'email': 'bruce.banner@marvel.com', 'full_name': 'Bruce Banner', 'password': 'smash123', 'avatar_url': '/avatars/hulk.svg'},
+    {'username': 'spider_man', 'email': 'peter.parker@marvel.com', 'full_name': 'Peter Parker', 'password': 'web123', 'avatar_url': '/avatars/spider_man.svg'},
+]
+
+DC_HEROES = [
+    {'username': 'superman', 'email': 'clark.kent@dc.com', 'full_name': 'Clark Kent', 'password': 'krypton123', 'avatar_url': '/avatars/superman.svg'},
+    {'username': 'batman', 'email': 'bruce.wayne@dc.com', 'full_name': 'Bruce Wayne', 'password': 'gotham123', 'avatar_url': '/avatars/batman.svg'},
+    {'username': 'wonder_woman', 'email': 'diana.prince@dc.com', 'full_name': 'Diana Prince', 'password': 'themyscira123', 'avatar_url': '/avatars/wonder_woman.svg'},
+    {'username': 'flash', 'email': 'barry.allen@dc.com', 'full_name': 'Barry Allen', 'password': 'speed123', 'avatar_url': '/avatars/flash.svg'},
+    {'username': 'aquaman', 'email': 'arthur.curry@dc.com', 'full_name': 'Arthur Curry', 'password': 'atlantis123', 'avatar_url': '/avatars/aquaman.svg'},
+    {'username': 'green_lantern', 'email': 'hal.jordan@dc.com', 'full_name': 'Hal Jordan', 'password': 'willpower123', 'avatar_url': '/avatars/green_lantern.svg'},
+]
+
+ACTIVITY_TYPES = ['Running', 'Cycling', 'Swimming', 'Weight Training', 'Yoga', 'Boxing', 'Hiking']
+DISTANCE_TYPES = ['Running', 'Cycling', 'Swimming', 'Hiking']
+
+WORKOUTS = [
+    {
+        'name': 'Thor\'s Hammer Strength',
+        'description': 'Build god-like strength with this intense full-body workout.',
+        'difficulty': 'Advanced',
+        'duration': 60,
+        'category': 'Strength',
+        'exercises': ['Deadlifts', 'Squats', 'Bench Press', 'Pull-ups', 'Hammer Curls'],
+        'recommended_for': 'Team Marvel'
+    },
+    {
+        'name': 'Flash\'s Speed Circuit',
+        'description': 'Increase speed and agility with high-intensity interval training.',
+        'difficulty': 'Advanced',
+        'duration': 45,
+        'category': 'Cardio',
+        'exercises': ['Sprint Intervals', 'Box Jumps', 'Burpees', 'High Knees', 'Mountain Climbers'],
+        'recommended_for': 'Team DC'
+    },
+    {
+        'name': 'Captain America\'s Endurance Run',
+        'description': 'Build superhero endurance with this steady-state cardio workout.',
+        'difficulty': 'Intermediate',
+        'duration': 45,
+        'category': 'Cardio',
+        'exercises': ['Long Distance Run', 'Jump Rope', 'Rowing', 'Cycling'],
+        'recommended_for': 'Team Marvel'
+    },
+    {
+        'name': 'Wonder Woman\'s Warrior Training',
+        'description': 'Combat-ready functional fitness for warriors.',
+        'difficulty': 'Advanced',
+        'duration': 50,
+        'category': 'Mixed',
+        'exercises': ['Battle Ropes', 'Kettlebell Swings', 'Medicine Ball Slams', 'Box Jumps', 'Push-ups'],
+        'recommended_for': 'Team DC'
+    },
+    {
+        'name': 'Spider-Man\'s Flexibility Flow',
+        'description': 'Improve flexibility and balance like your friendly neighborhood Spider-Man.',
+        'difficulty': 'Beginner',
+        'duration': 30,
+        'category': 'Flexibility',
+        'exercises': ['Yoga Flow', 'Dynamic Stretching', 'Balance Poses', 'Core Work'],
+        'recommended_for': 'Team Marvel'
+    },
+    {
+        'name': 'Batman\'s Tactical Training',
+        'description': 'Prepare for anything with this versatile tactical workout.',
+        'difficulty': 'Advanced',
+        'duration': 60,
+        'category': 'Mixed',
+        'exercises': ['Parkour Drills', 'Combat Training', 'Grip Strength', 'Agility Ladder', 'Core Circuit'],
+        'recommended_for': 'Team DC'
+    },
+    {
+        'name': 'Hulk\'s Power Smash',
+        'description': 'Pure strength and power development.',
+        'difficulty': 'Advanced',
+        'duration': 55,
+        'category': 'Strength',
+        'exercises': ['Heavy Squats', 'Power Cleans', 'Tire Flips', 'Sled Push', 'Farmer\'s Walk'],
+        'recommended_for': 'Team Marvel'
+    },
+    {
+        'name': 'Aquaman\'s Ocean Swim',
+        'description': 'Master the water with this swimming-focused workout.',
+        'difficulty': 'Intermediate',
+        'duration': 40,
+        'category': 'Cardio',
+        'exercises': ['Freestyle Swimming', 'Backstroke', 'Butterfly', 'Water Treading', 'Pool Resistance'],
+        'recommended_for': 'Team DC'
+    },
+]
+
+
 class Command(BaseCommand):
     help = 'Populate the octofit_db database with test data'
 
-    def handle(self, *args, **kwargs):
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=len(MARVEL_HEROES) + len(DC_HEROES),
+                            help='Total number of users; heroes first, then synthetic athletes')
+        parser.add_argument('--activities-per-user', type=int, default=None,
+                            help='Activities per user (default: random 3-7)')
+        parser.add_argument('--teams', type=int, default=len(HERO_TEAMS),
+                            help='Number of teams; the hero teams first, then synthetic teams')
+        parser.add_argument('--seed', type=int, default=None,
+                            help='Random seed for a reproducible dataset')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Rows per bulk insert')
+
+    def handle(self, *args, **options):
+        if options['users'] < 0 or options['teams'] < 1 or options['batch_size'] < 1:
+            raise CommandError('--users must be >= 0, --teams and --batch-size must be >= 1')
+        if options['activities_per_user'] is not None and options['activities_per_user'] < 0:
+            raise CommandError('--activities-per-user must be >= 0')
+
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        now = timezone.now()
+
         self.stdout.write(self.style.WARNING('Clearing existing data...'))
-        
-        # Delete all existing data
-        User.objects.all().delete()
-        Team.objects.all().delete()
-        Activity.objects.all().delete()
-        Leaderboard.objects.all().delete()
-        Workout.objects.all().delete()
-        
+
+        # Delete all existing data with plain DELETE statements. QuerySet.delete()
+        # would load every row to send model signals, and the user and team
+        # delete signals would unwind the aggregates one row at a time, though
+        # everything is rebuilt below; the cached collections are invalidated
+        # explicitly at the end. Referencing tables go first so no foreign key
+        # is left dangling.
+        for model in (Activity, ActivityRollup, Leaderboard, LeaderboardSnapshotChunk, LeaderboardSnapshotUserChunk,
+                      LeaderboardSnapshot, TeamMembership, WorkoutRecommendation, User, Team, Workout):
+            connection = connections[model.objects.db]
+            with connection.cursor() as cursor:
+                cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+
         self.stdout.write(self.style.SUCCESS('Existing data cleared!'))
-        
+
         # Create Teams
         self.stdout.write(self.style.WARNING('Creating teams...'))
-        team_marvel = Team.objects.create(
-            name='Team Marvel',
-            description='Avengers assemble! The mightiest heroes of the Marvel Universe.',
-            captain='iron_man',
-            members=['iron_man', 'captain_america', 'thor', 'black_widow', 'hulk', 'spider_man'],
-            total_points=0
-        )
-        
-        team_dc = Team.objects.create(
-            name='Team DC',
-            description='Justice League united! Protectors of truth and justice.',
-            captain='superman',
-            members=['superman', 'batman', 'wonder_woman', 'flash', 'aquaman', 'green_lantern'],
-            total_points=0
-        )
-        
-        self.stdout.write(self.style.SUCCESS(f'Created {Team.objects.count()} teams'))
-        
+        team_specs = HERO_TEAMS[:options['teams']] + [
+            {
+                'name': f'Team {number:03d}',
+                'description': f'Synthetic team {number}',
+                'captain': '',
+            }
+            for number in range(len(HERO_TEAMS) + 1, options['teams'] + 1)
+        ]
+        user_specs = self.build_user_specs(options['users'], team_specs)
+
+        members = {spec['name']: [] for spec in team_specs}
+        for user_spec in user_specs:
+            members[user_spec['team']].append(user_spec['username'])
+        teams = []
+        for spec in team_specs:
+            roster = members[spec['name']]
+            captain = spec['captain'] if spec['captain'] in roster else (roster[0] if roster else '')
+            teams.append(Team(name=spec['name'], description=spec['description'], captain=captain,
+                              total_points=0, member_count=len(roster)))
+        Team.objects.bulk_create(teams, batch_size=batch_size)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(teams)} teams'))
+
         # Create Users
         self.stdout.write(self.style.WARNING('Creating users...'))
-        marvel_heroes = [
-            {'username': 'iron_man', 'email': 'tony.stark@marvel.com', 'full_name': 'Tony Stark', 'password': 'jarvis123', 'avatar_url': '/avatars/iron_man.svg'},
-            {'username': 'captain_america', 'email': 'steve.rogers@marvel.com', 'full_name': 'Steve Rogers', 'password': 'shield123', 'avatar_url': '/avatars/captain_america.svg'},
-            {'username': 'thor', 'email': 'thor@asgard.com', 'full_name': 'Thor Odinson', 'password': 'mjolnir123', 'avatar_url': '/avatars/thor.svg'},
-            {'username': 'black_widow', 'email': 'natasha.romanoff@marvel.com', 'full_name': 'Natasha Romanoff', 'password': 'widow123', 'avatar_url': '/avatars/black_widow.svg'},
-            {'username': 'hulk', 'email': 'bruce.banner@marvel.com', 'full_name': 'Bruce Banner', 'password': 'smash123', 'avatar_url': '/avatars/hulk.svg'},
-            {'username': 'spider_man', 'email': 'peter.parker@marvel.com', 'full_name': 'Peter Parker', 'password': 'web123', 'avatar_url': '/avatars/spider_man.svg'},
-        ]
-        
-        dc_heroes = [
-            {'username': 'superman', 'email': 'clark.kent@dc.com', 'full_name': 'Clark Kent', 'password': 'krypton123', 'avatar_url': '/avatars/superman.svg'},
-            {'username': 'batman', 'email': 'bruce.wayne@dc.com', 'full_name': 'Bruce Wayne', 'password': 'gotham123', 'avatar_url': '/avatars/batman.svg'},
-            {'username': 'wonder_woman', 'email': 'diana.prince@dc.com', 'full_name': 'Diana Prince', 'password': 'themyscira123', 'avatar_url': '/avatars/wonder_woman.svg'},
-            {'username': 'flash', 'email': 'barry.allen@dc.com', 'full_name': 'Barry Allen', 'password': 'speed123', 'avatar_url': '/avatars/flash.svg'},
-            {'username': 'aquaman', 'email': 'arthur.curry@dc.com', 'full_name': 'Arthur Curry', 'password': 'atlantis123', 'avatar_url': '/avatars/aquaman.svg'},
-            {'username': 'green_lantern', 'email': 'hal.jordan@dc.com', 'full_name': 'Hal Jordan', 'password': 'willpower123', 'avatar_url': '/avatars/green_lantern.svg'},
-        ]
-        
-        users_created = []
-        for hero_data in marvel_heroes:
-            user = User.objects.create(
-                username=hero_data['username'],
-                email=hero_data['email'],
-                full_name=hero_data['full_name'],
-                password=hero_data['password'],
-                team='Team Marvel',
-                avatar_url=hero_data['avatar_url']
-            )
-            users_created.append(user)
-        
-        for hero_data in dc_heroes:
-            user = User.objects.create(
-                username=hero_data['username'],
-                email=hero_data['email'],
-                full_name=hero_data['full_name'],
-                password=hero_data['password'],
-                team='Team DC',
-                avatar_url=hero_data['avatar_url']
-            )
-            users_created.append(user)
-        
-        self.stdout.write(self.style.SUCCESS(f'Created {User.objects.count()} users'))
-        
-        # Create Activities
+        User.objects.bulk_create(
+            (User(team_id=spec['team'], **{k: v for k, v in spec.items() if k != 'team'}) for spec in user_specs),
+            batch_size=batch_size,
+        )
+        TeamMembership.objects.bulk_create(
+            (TeamMembership(team_id=name, user_id=username) for name, roster in members.items() for username in roster),
+            batch_size=batch_size,
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(user_specs)} users'))
+
+        # Create Activities, accumulating leaderboard totals as they are generated
         self.stdout.write(self.style.WARNING('Creating activities...'))
-        activity_types = ['Running', 'Cycling', 'Swimming', 'Weight Training', 'Yoga', 'Boxing', 'Hiking']
-        
-        for user in users_created:
-            # Create 3-7 random activities per user
-            num_activities = random.randint(3, 7)
+        totals = {}
+        activity_count = 0
+        batch = []
+        teams_by_user = {spec['username']: spec['team'] for spec in user_specs}
+        rollup_deltas = rollups.new_deltas()
+        for user_spec in user_specs:
+            num_activities = options['activities_per_user']
+            if num_activities is None:
+                num_activities = rng.randint(3, 7)
             user_total_points = 0
-            
+
             for i in range(num_activities):
-                activity_type = random.choice(activity_types)
-                duration = random.randint(20, 120)
-                distance = round(random.uniform(2.0, 25.0), 2) if activity_type in ['Running', 'Cycling', 'Swimming', 'Hiking'] else 0.0
-                calories = duration * random.randint(5, 12)
-                points = duration + int(distance * 10)
-                
-                activity_date = timezone.now() - timedelta(days=random.randint(0, 30))
-                
-                Activity.objects.create(
-                    user=user.username,
-                    activity_type=activity_type,
-                    duration=duration,
-                    distance=distance,
-                    calories=calories,
-                    points=points,
-                    date=activity_date,
-                    notes=f'{activity_type} session by {user.full_name}'
-                )
-                
-                user_total_points += points
-            
-            # Update team points
-            if user.team == 'Team Marvel':
-                team_marvel.total_points += user_total_points
-            else:
-                team_dc.total_points += user_total_points
-        
-        team_marvel.save()
-        team_dc.save()
-        
-        self.stdout.write(self.style.SUCCESS(f'Created {Activity.objects.count()} activities'))
-        
-        # Create Leaderboard
+                activity = self.build_activity(rng, user_spec, now)
+                user_total_points += activity.points
+                batch.append(activity)
+                if len(batch) >= batch_size:
+                    rollups.accumulate(rollup_deltas, batch, teams_by_user)
+                    Activity.objects.bulk_create(batch)
+                    batch = []
+
+            totals[user_spec['username']] = (user_total_points, num_activities)
+            activity_count += num_activities
+        if batch:
+            rollups.accumulate(rollup_deltas, batch, teams_by_user)
+            Activity.objects.bulk_create(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {activity_count} activities'))
+
+        # Create activity rollups from the totals gathered above
+        self.stdout.write(self.style.WARNING('Creating activity rollups...'))
+        ActivityRollup.objects.bulk_create(
+            (rollups.rollup_row(bucket, delta) for bucket, delta in rollup_deltas.items()),
+            batch_size=batch_size,
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(rollup_deltas)} activity rollups'))
+
+        # Update team points and activity counts
+        team_totals = {team.name: [0, 0] for team in teams}
+        for user_spec in user_specs:
+            points, activities = totals[user_spec['username']]
+            team_totals[user_spec['team']][0] += points
+            team_totals[user_spec['team']][1] += activities
+        for name, (total_points, total_activities) in team_totals.items():
+            Team.objects.filter(name=name).update(total_points=total_points, total_activities=total_activities)
+
+        # Create Leaderboard, ranked in the same order the incremental engine maintains
         self.stdout.write(self.style.WARNING('Creating leaderboard entries...'))
-        for user in users_created:
-            user_activities = Activity.objects.filter(user=user.username)
-            total_points = sum(activity.points for activity in user_activities)
-            total_activities = user_activities.count()
-            
-            Leaderboard.objects.create(
-                user=user.username,
-                team=user.team,
+        standings = sorted(totals.items(), key=lambda item: (-item[1][0], item[0]))
+        team_ranks = defaultdict(int)
+
+        def entry(rank, username, total_points, total_activities):
+            team_ranks[teams_by_user[username]] += 1
+            return Leaderboard(
+                user_id=username,
+                team_id=teams_by_user[username],
                 total_points=total_points,
                 total_activities=total_activities,
-                rank=0  # Will be calculated after all entries are created
+                rank=rank,
+                team_rank=team_ranks[teams_by_user[username]],
             )
-        
-        # Update ranks
-        leaderboard_entries = Leaderboard.objects.all().order_by('-total_points')
-        for rank, entry in enumerate(leaderboard_entries, start=1):
-            entry.rank = rank
-            entry.save()
-        
-        self.stdout.write(self.style.SUCCESS(f'Created {Leaderboard.objects.count()} leaderboard entries'))
-        
+        Leaderboard.objects.bulk_create(
+            (
+                entry(rank, username, total_points, total_activities)
+                for rank, (username, (total_points, total_activities)) in enumerate(standings, start=1)
+            ),
+            batch_size=batch_size,
+        )
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(standings)} leaderboard entries'))
+        take_snapshot()
+
         # Create Workouts
         self.stdout.write(self.style.WARNING('Creating workout suggestions...'))
-        workouts_data = [
-            {
-                'name': 'Thor\'s Hammer Strength',
-                'description': 'Build god-like strength with this intense full-body workout.',
-                'difficulty': 'Advanced',
-                'duration': 60,
-                'category': 'Strength',
-                'exercises': ['Deadlifts', 'Squats', 'Bench Press', 'Pull-ups', 'Hammer Curls'],
-                'recommended_for': 'Team Marvel'
-            },
-            {
-                'name': 'Flash\'s Speed Circuit',
-                'description': 'Increase speed and agility with high-intensity interval training.',
-                'difficulty': 'Advanced',
-                'duration': 45,
-                'category': 'Cardio',
-                'exercises': ['Sprint Intervals', 'Box Jumps', 'Burpees', 'High Knees', 'Mountain Climbers'],
-                'recommended_for': 'Team DC'
-            },
-            {
-                'name': 'Captain America\'s Endurance Run',
-                'description': 'Build superhero endurance with this steady-state cardio workout.',
-                'difficulty': 'Intermediate',
-                'duration': 45,
-                'category': 'Cardio',
-                'exercises': ['Long Distance Run', 'Jump Rope', 'Rowing', 'Cycling'],
-                'recommended_for': 'Team Marvel'
-            },
-            {
-                'name': 'Wonder Woman\'s Warrior Training',
-                'description': 'Combat-ready functional fitness for warriors.',
-                'difficulty': 'Advanced',
-                'duration': 50,
-                'category': 'Mixed',
-                'exercises': ['Battle Ropes', 'Kettlebell Swings', 'Medicine Ball Slams', 'Box Jumps', 'Push-ups'],
-                'recommended_for': 'Team DC'
-            },
-            {
-                'name': 'Spider-Man\'s Flexibility Flow',
-                'description': 'Improve flexibility and balance like your friendly neighborhood Spider-Man.',
-                'difficulty': 'Beginner',
-                'duration': 30,
-                'category': 'Flexibility',
-                'exercises': ['Yoga Flow', 'Dynamic Stretching', 'Balance Poses', 'Core Work'],
-                'recommended_for': 'Team Marvel'
-            },
-            {
-                'name': 'Batman\'s Tactical Training',
-                'description': 'Prepare for anything with this versatile tactical workout.',
-                'difficulty': 'Advanced',
-                'duration': 60,
-                'category': 'Mixed',
-                'exercises': ['Parkour Drills', 'Combat Training', 'Grip Strength', 'Agility Ladder', 'Core Circuit'],
-                'recommended_for': 'Team DC'
-            },
-            {
-                'name': 'Hulk\'s Power Smash',
-                'description': 'Pure strength and power development.',
-                'difficulty': 'Advanced',
-                'duration': 55,
-                'category': 'Strength',
-                'exercises': ['Heavy Squats', 'Power Cleans', 'Tire Flips', 'Sled Push', 'Farmer\'s Walk'],
-                'recommended_for': 'Team Marvel'
-            },
-            {
-                'name': 'Aquaman\'s Ocean Swim',
-                'description': 'Master the water with this swimming-focused workout.',
-                'difficulty': 'Intermediate',
-                'duration': 40,
-                'category': 'Cardio',
-                'exercises': ['Freestyle Swimming', 'Backstroke', 'Butterfly', 'Water Treading', 'Pool Resistance'],
-                'recommended_for': 'Team DC'
-            },
-        ]
-        
-        for workout_data in workouts_data:
-            Workout.objects.create(**workout_data)
-        
-        self.stdout.write(self.style.SUCCESS(f'Created {Workout.objects.count()} workouts'))
-        
+        Workout.objects.bulk_create(Workout(**workout_data) for workout_data in WORKOUTS)
+
+        self.stdout.write(self.style.SUCCESS(f'Created {len(WORKOUTS)} workouts'))
+
+        self.stdout.write(self.style.WARNING('Computing workout recommendations...'))
+        recommended = refresh_recommendations()
+        self.stdout.write(self.style.SUCCESS(f'Recommended workouts for {recommended} users'))
+
+        self.stdout.write(self.style.WARNING('Building the search index...'))
+        terms = rebuild_index(batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Indexed {terms} search terms'))
+
+        bump('activity', ACTIVITY_EPOCH, 'leaderboard', 'team', 'workout', 'recommendation')
+
         # Summary
         self.stdout.write(self.style.SUCCESS('\n' + '='*50))
         self.stdout.write(self.style.SUCCESS('DATABASE POPULATION COMPLETE!'))
         self.stdout.write(self.style.SUCCESS('='*50))
-        self.stdout.write(f'Teams: {Team.objects.count()}')
-        self.stdout.write(f'Users: {User.objects.count()}')
-        self.stdout.write(f'Activities: {Activity.objects.count()}')
-        self.stdout.write(f'Leaderboard Entries: {Leaderboard.objects.count()}')
-        self.stdout.write(f'Workouts: {Workout.objects.count()}')
+        self.stdout.write(f'Teams: {len(teams)}')
+        self.stdout.write(f'Users: {len(user_specs)}')
+        self.stdout.write(f'Activities: {activity_count}')
+        self.stdout.write(f'Leaderboard Entries: {len(standings)}')
+        self.stdout.write(f'Workouts: {len(WORKOUTS)}')
         self.stdout.write(self.style.SUCCESS('='*50))
+
+    def build_user_specs(self, count, team_specs):
+        """Heroes keep their own teams; synthetic athletes are dealt round-robin"""
+        team_names = [spec['name'] for spec in team_specs]
+        heroes = [dict(hero, team='Team Marvel') for hero in MARVEL_HEROES]
+        heroes += [dict(hero, team='Team DC') for hero in DC_HEROES]
+        specs = [hero for hero in heroes if hero['team'] in team_names][:count]
+        for number in range(len(specs) + 1, count + 1):
+            username = f'athlete_{number:07d}'
+            specs.append({
+                'username': username,
+                'email': f'{username}@octofit.example',
+                'full_name': f'Athlete {number}',
+                'password': f'{username}123',
+                'team': team_names[number % len(team_names)],
+                'avatar_url': None,
+            })
+        return specs
+
+    def build_activity(self, rng, user_spec, now):
+        """A random activity for ``user_spec`` within the last 30 days"""
+        activity_type = rng.choice(ACTIVITY_TYPES)
+        duration = rng.randint(20, 120)
+        distance = round(rng.uniform(2.0, 25.0), 2) if activity_type in DISTANCE_TYPES else 0.0
+        calories = duration * rng.randint(5, 12)
+        points = scoring.score(activity_type, duration, distance)
+
+        return Activity(
+            user_id=user_spec['username'],
+            activity_type=activity_type,
+            duration=duration,
+            distance=distance,
+            calories=calories,
+            points=points,
+            score_version=settings.OCTOFIT_SCORING_VERSION,
+            date=now - timedelta(days=rng.randint(0, 30), seconds=rng.randint(0, 86399)),
+            notes=f'{activity_type} session by {user_spec["full_name"]}',
+        )
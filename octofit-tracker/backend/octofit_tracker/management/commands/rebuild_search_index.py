@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from octofit_tracker.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the search index over users, teams and workouts from scratch'
+
+    def handle(self, *args, **options):
+        terms = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {terms} search terms'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+from octofit_tracker.recommendations import refresh_recommendations
+
+
+class Command(BaseCommand):
+    help = 'Recompute every user\'s recommended workouts (run periodically, e.g. from cron)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, help='Workouts to keep per user')
+        parser.add_argument('--window-days', type=int, help='Days of activity history to score against')
+
+    def handle(self, *args, **options):
+        if options['count'] is not None and options['count'] < 1:
+            raise CommandError('--count must be >= 1')
+        users = refresh_recommendations(count=options['count'], window_days=options['window_days'])
+        self.stdout.write(self.style.SUCCESS(f'Refreshed recommendations for {users} users'))
@@ -0,0 +1,21 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management.base import BaseCommand, CommandError
+from octofit_tracker.scoring import rescore
+
+
+class Command(BaseCommand):
+    help = 'Recompute the points of every activity and rebuild leaderboard, team and rollup totals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scoring-version', type=int,
+                            help='Scoring rules to apply (default: OCTOFIT_SCORING_VERSION)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Activities scored per batch')
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size must be >= 1')
+        try:
+            scored, changed = rescore(options['scoring_version'], batch_size=options['batch_size'])
+        except ImproperlyConfigured as exc:
+            raise CommandError(str(exc)) from exc
+        self.stdout.write(self.style.SUCCESS(f'Rescored {scored} activities ({changed} changed)'))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from octofit_tracker.snapshots import take_snapshot
+
+
+class Command(BaseCommand):
+    help = 'Record the current leaderboard ranking for rank movement reports (run daily, e.g. from cron)'
+
+    def handle(self, *args, **options):
+        snapshot = take_snapshot()
+        self.stdout.write(self.style.SUCCESS(f'Snapshot of {snapshot.entries} entries taken at {snapshot.taken_at}'))
@@ -0,0 +1,182 @@
+"""
+Per-request timing and query instrumentation.
+
+``RequestMetricsMiddleware`` measures, for a sampled fraction of requests,
+the number of database queries, time spent in the database, time spent
+rendering the response body and total wall time. Serializers run inside
+the view, so their time counts towards ``total`` only. The figures are
+returned in a ``Server-Timing`` header and aggregated per view/action in
+``registry``, which backs ``/api/_metrics/``. The middleware works under
+both WSGI and ASGI.
+"""
+import asyncio
+import bisect
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.conf import settings
+from django.db import connections
+
+# Upper bounds (ms) of the histogram buckets; the last bucket is open-ended.
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+TIMINGS = ('total', 'db', 'render')
+
+
+class MetricsRegistry:
+    """Thread-safe per-view aggregates with fixed-bucket histograms"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, label, queries, timings_ms):
+        with self._lock:
+            view = self._views.get(label)
+            if view is None:
+                view = self._views[label] = {
+                    'count': 0,
+                    'queries': 0,
+                    'max_queries': 0,
+                    'sum_ms': {name: 0.0 for name in TIMINGS},
+                    'histograms': {name: [0] * (len(BUCKETS_MS) + 1) for name in TIMINGS},
+                }
+            view['count'] += 1
+            view['queries'] += queries
+            view['max_queries'] = max(view['max_queries'], queries)
+            for name in TIMINGS:
+                view['sum_ms'][name] += timings_ms[name]
+                view['histograms'][name][bisect.bisect_left(BUCKETS_MS, timings_ms[name])] += 1
+
+    def snapshot(self):
+        with self._lock:
+            views = {}
+            for label, view in self._views.items():
+                count = view['count']
+                views[label] = {
+                    'count': count,
+                    'queries_mean': round(view['queries'] / count, 2),
+                    'queries_max': view['max_queries'],
+                    'mean_ms': {name: round(total / count, 3) for name, total in view['sum_ms'].items()},
+                    'histograms': {name: list(counts) for name, counts in view['histograms'].items()},
+                }
+        return {'buckets_ms': list(BUCKETS_MS) + ['+Inf'], 'views': views}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = MetricsRegistry()
+
+
+class _RequestTimer:
+    def __init__(self):
+        self.label = None
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.wrapped = []
+        self._render_started = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db += time.perf_counter() - started
+            self.queries += 1
+
+    def start_render(self):
+        self._render_started = time.perf_counter()
+
+    def end_render(self, response):
+        if self._render_started is not None:
+            self.render += time.perf_counter() - self._render_started
+
+
+@contextmanager
+def instrument(request):
+    """Count this thread's queries against ``request``'s timer, if it is sampled"""
+    timer = getattr(request, '_octofit_timer', None)
+    with ExitStack() as stack:
+        if timer is not None:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+        yield
+
+
+def view_label(view_func, request):
+    """``ViewSet.action`` for DRF views, the function name otherwise"""
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+    action = getattr(view_func, 'actions', {}).get(request.method.lower())
+    return f'{cls.__name__}.{action}' if action else cls.__name__
+
+
+class RequestMetricsMiddleware:
+    """Collect query count and timings for a sample of requests"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Let Django's handler await this instance (as MiddlewareMixin does).
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if random.random() >= settings.OCTOFIT_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timer = request._octofit_timer = _RequestTimer()
+        started = time.perf_counter()
+        with instrument(request):
+            response = self.get_response(request)
+        return self.finish(timer, response, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.OCTOFIT_METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        timer = request._octofit_timer = _RequestTimer()
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            for connection in timer.wrapped:
+                connection.execute_wrappers.remove(timer)
+        return self.finish(timer, response, time.perf_counter() - started)
+
+    def finish(self, timer, response, total):
+        timings_ms = {'total': total * 1000, 'db': timer.db * 1000, 'render': timer.render * 1000}
+        registry.record(timer.label or 'unresolved', timer.queries, timings_ms)
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={timings_ms["db"]:.2f};desc="{timer.queries} queries"',
+            f'render;dur={timings_ms["render"]:.2f};desc="response rendering"',
+            f'total;dur={timings_ms["total"]:.2f}',
+        ])
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        timer = getattr(request, '_octofit_timer', None)
+        if timer is not None:
+            timer.label = view_label(view_func, request)
+            if self.is_async and not asyncio.iscoroutinefunction(view_func):
+                # Under ASGI this hook runs on the thread the sync view will use.
+                for connection in connections.all():
+                    connection.execute_wrappers.append(timer)
+                    timer.wrapped.append(connection)
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered to bytes right after this hook.
+        timer = getattr(request, '_octofit_timer', None)
+        if timer is not None:
+            timer.start_render()
+            response.add_post_render_callback(timer.end_render)
+        return response
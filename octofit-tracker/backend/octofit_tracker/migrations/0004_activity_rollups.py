@@ -0,0 +1,72 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:18
+
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def backfill_rollups(apps, schema_editor):
+    """Build rollups for the activities that existed before this migration"""
+    Activity = apps.get_model('octofit_tracker', 'Activity')
+    ActivityRollup = apps.get_model('octofit_tracker', 'ActivityRollup')
+    User = apps.get_model('octofit_tracker', 'User')
+
+    teams = dict(User.objects.values_list('username', 'team'))
+    totals = defaultdict(lambda: [0, 0, 0.0, 0, 0])
+    for activity in Activity.objects.iterator(chunk_size=2000):
+        day = timezone.localtime(activity.date).date() if timezone.is_aware(activity.date) else activity.date.date()
+        starts = {'day': day, 'week': day - timedelta(days=day.weekday()), 'month': day.replace(day=1)}
+        keys = {'user': activity.user, 'type': activity.activity_type}
+        if teams.get(activity.user):
+            keys['team'] = teams[activity.user]
+        values = (1, activity.duration, activity.distance, activity.calories, activity.points)
+        for period, start in starts.items():
+            for dimension, key in keys.items():
+                total = totals[(dimension, period, key, start)]
+                for index, value in enumerate(values):
+                    total[index] += value
+
+    ActivityRollup.objects.bulk_create(
+        (
+            ActivityRollup(dimension=dimension, period=period, key=key, bucket_start=start,
+                           activities=total[0], duration=total[1], distance=total[2],
+                           calories=total[3], points=total[4])
+            for (dimension, period, key, start), total in totals.items()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0003_compound_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(max_length=10)),
+                ('key', models.CharField(max_length=150)),
+                ('period', models.CharField(max_length=10)),
+                ('bucket_start', models.DateField()),
+                ('activities', models.IntegerField(default=0)),
+                ('duration', models.IntegerField(default=0)),
+                ('distance', models.FloatField(default=0.0)),
+                ('calories', models.IntegerField(default=0)),
+                ('points', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'activity_rollups',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='activityrollup',
+            constraint=models.UniqueConstraint(fields=('dimension', 'period', 'key', 'bucket_start'), name='activity_rollups_bucket_uniq'),
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0004_activity_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TeamMembership',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('joined_at', models.DateTimeField(auto_now_add=True)),
+                ('team', models.ForeignKey(db_column='team', on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='octofit_tracker.team', to_field='name')),
+                ('user', models.ForeignKey(db_column='user', on_delete=django.db.models.deletion.CASCADE, related_name='memberships', to='octofit_tracker.user', to_field='username')),
+            ],
+            options={
+                'db_table': 'team_memberships',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='teammembership',
+            constraint=models.UniqueConstraint(fields=('team', 'user'), name='team_memberships_uniq'),
+        ),
+        migrations.RenameField(
+            model_name='team',
+            old_name='members',
+            new_name='legacy_members',
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='members',
+            field=models.ManyToManyField(blank=True, related_name='member_of', through='octofit_tracker.TeamMembership', to='octofit_tracker.user'),
+        ),
+        migrations.AlterField(
+            model_name='leaderboard',
+            name='team',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:02
+
+from django.db import migrations
+
+
+def migrate_relations(apps, schema_editor):
+    """
+    Make every string reference resolvable before it becomes a foreign key.
+
+    Usernames and team names that point at nothing get a placeholder row so
+    no activity or standing is lost; empty team names become NULL. The JSON
+    rosters are copied into ``TeamMembership``.
+    """
+    User = apps.get_model('octofit_tracker', 'User')
+    Team = apps.get_model('octofit_tracker', 'Team')
+    TeamMembership = apps.get_model('octofit_tracker', 'TeamMembership')
+    Activity = apps.get_model('octofit_tracker', 'Activity')
+    Leaderboard = apps.get_model('octofit_tracker', 'Leaderboard')
+
+    User.objects.filter(team='').update(team=None)
+    Leaderboard.objects.filter(team='').update(team=None)
+
+    rosters = {team.name: list(team.legacy_members or []) for team in Team.objects.only('name', 'legacy_members')}
+    team_names = set(User.objects.exclude(team=None).values_list('team', flat=True))
+    team_names |= set(Leaderboard.objects.exclude(team=None).values_list('team', flat=True))
+    Team.objects.bulk_create(
+        [Team(name=name, captain='') for name in sorted(team_names - set(rosters))],
+        batch_size=1000,
+    )
+
+    usernames = set(Activity.objects.values_list('user', flat=True).distinct())
+    usernames |= set(Leaderboard.objects.values_list('user', flat=True))
+    usernames |= {username for members in rosters.values() for username in members if username}
+    usernames -= set(User.objects.values_list('username', flat=True))
+    User.objects.bulk_create(
+        [
+            User(username=username, email=f'{username}@placeholder.invalid', full_name=username, password='')
+            for username in sorted(usernames)
+        ],
+        batch_size=1000,
+    )
+
+    TeamMembership.objects.bulk_create(
+        [
+            TeamMembership(team_id=name, user_id=username)
+            for name, members in rosters.items()
+            for username in dict.fromkeys(members) if username
+        ],
+        batch_size=1000,
+    )
+
+
+def restore_rosters(apps, schema_editor):
+    Team = apps.get_model('octofit_tracker', 'Team')
+    TeamMembership = apps.get_model('octofit_tracker', 'TeamMembership')
+    Leaderboard = apps.get_model('octofit_tracker', 'Leaderboard')
+
+    Leaderboard.objects.filter(team=None).update(team='')
+
+    rosters = {}
+    for team, user in TeamMembership.objects.order_by('id').values_list('team', 'user'):
+        rosters.setdefault(team, []).append(user)
+    for team in Team.objects.all():
+        team.legacy_members = rosters.get(team.name, [])
+        team.save(update_fields=['legacy_members'])
+    TeamMembership.objects.all().delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0005_team_memberships'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrate_relations, restore_rosters),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0006_migrate_relations'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='team',
+            name='legacy_members',
+        ),
+        migrations.AlterField(
+            model_name='activity',
+            name='user',
+            field=models.ForeignKey(db_column='user', db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='activities', to='octofit_tracker.user', to_field='username'),
+        ),
+        migrations.AlterField(
+            model_name='leaderboard',
+            name='team',
+            field=models.ForeignKey(blank=True, db_column='team', db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='leaderboard_entries', to='octofit_tracker.team', to_field='name'),
+        ),
+        migrations.AlterField(
+            model_name='leaderboard',
+            name='user',
+            field=models.OneToOneField(db_column='user', on_delete=django.db.models.deletion.CASCADE, related_name='leaderboard_entry', to='octofit_tracker.user', to_field='username'),
+        ),
+        migrations.AlterField(
+            model_name='user',
+            name='team',
+            field=models.ForeignKey(blank=True, db_column='team', db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='users', to='octofit_tracker.team', to_field='name'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:41
+
+from collections import defaultdict
+
+from django.db import migrations, models
+
+
+def rank_within_teams(apps, schema_editor):
+    """Number each team's entries in leaderboard order"""
+    Leaderboard = apps.get_model('octofit_tracker', 'Leaderboard')
+    team_ranks = defaultdict(int)
+    entries = []
+    for entry in Leaderboard.objects.order_by('-total_points', 'user').only('id', 'team').iterator():
+        team_ranks[entry.team_id] += 1
+        entry.team_rank = team_ranks[entry.team_id]
+        entries.append(entry)
+    Leaderboard.objects.bulk_update(entries, ['team_rank'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0007_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboard',
+            name='team_rank',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['team', 'team_rank'], name='leaderboard_team_rank_idx'),
+        ),
+        migrations.RunPython(rank_within_teams, migrations.RunPython.noop),
+    ]
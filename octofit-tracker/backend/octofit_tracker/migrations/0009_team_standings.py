@@ -0,0 +1,40 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:42
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_standings(apps, schema_editor):
+    """Count each team's members and the activities of its leaderboard entries"""
+    Team = apps.get_model('octofit_tracker', 'Team')
+    TeamMembership = apps.get_model('octofit_tracker', 'TeamMembership')
+    Leaderboard = apps.get_model('octofit_tracker', 'Leaderboard')
+    members = dict(TeamMembership.objects.values_list('team').annotate(n=Count('id')).order_by())
+    activities = dict(
+        Leaderboard.objects.exclude(team=None).values_list('team').annotate(n=Sum('total_activities')).order_by()
+    )
+    for name in Team.objects.values_list('name', flat=True):
+        Team.objects.filter(name=name).update(
+            member_count=members.get(name, 0), total_activities=activities.get(name) or 0,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0008_leaderboard_team_rank'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='member_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='total_activities',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_standings, migrations.RunPython.noop),
+    ]
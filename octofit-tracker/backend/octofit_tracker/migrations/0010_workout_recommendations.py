@@ -0,0 +1,27 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0009_team_standings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WorkoutRecommendation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('workouts', models.JSONField(default=list, help_text='Workout ids, best first')),
+                ('scores', models.JSONField(default=list)),
+                ('computed_at', models.DateTimeField()),
+                ('user', models.OneToOneField(db_column='user', on_delete=django.db.models.deletion.CASCADE, related_name='workout_recommendation', to='octofit_tracker.user', to_field='username')),
+            ],
+            options={
+                'db_table': 'workout_recommendations',
+            },
+        ),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:48
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# What was searchable when the index was introduced, as (model, label field,
+# {field: weight}); kept here so later changes to ``search`` cannot alter it.
+SOURCES = {
+    'user': ('User', 'username', {'username': 3, 'full_name': 2}),
+    'team': ('Team', 'name', {'name': 3, 'description': 1}),
+    'workout': ('Workout', 'name', {'name': 3, 'description': 1, 'exercises': 1}),
+}
+
+MAX_TERM_LENGTH = 32
+
+WORD = re.compile(r'[^\W_]+')
+
+
+def terms_for(instance, fields):
+    """``{n-gram: weight}`` of one object, keeping each n-gram's best weight"""
+    terms = {}
+    for field, weight in fields.items():
+        value = getattr(instance, field)
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(item) for item in value)
+        text = unicodedata.normalize('NFKD', str(value or ''))
+        text = ''.join(char for char in text if not unicodedata.combining(char))
+        for word in WORD.findall(text.lower()):
+            for end in range(1, min(len(word), MAX_TERM_LENGTH) + 1):
+                if terms.get(word[:end], 0) < weight:
+                    terms[word[:end]] = weight
+    return terms
+
+
+def index_existing(apps, schema_editor):
+    """Write the search terms of every existing user, team and workout"""
+    SearchTerm = apps.get_model('octofit_tracker', 'SearchTerm')
+    for kind, (model_name, label, fields) in SOURCES.items():
+        rows = []
+        for instance in apps.get_model('octofit_tracker', model_name).objects.only(label, *fields):
+            rows.extend(
+                SearchTerm(term=term, kind=kind, document=f'{kind}:{instance.pk}',
+                           label=str(getattr(instance, label))[:255], weight=weight)
+                for term, weight in terms_for(instance, fields).items()
+            )
+        SearchTerm.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0010_workout_recommendations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=32)),
+                ('document', models.CharField(max_length=40)),
+                ('kind', models.CharField(max_length=10)),
+                ('label', models.CharField(max_length=255)),
+                ('weight', models.SmallIntegerField(default=1)),
+            ],
+            options={
+                'db_table': 'search_terms',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', '-weight', 'label', 'document'], name='search_terms_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['document'], name='search_terms_document_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'document'), name='search_terms_term_document_uniq'),
+        ),
+        migrations.RunPython(index_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0011_search_terms'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='ingest_key',
+            field=models.CharField(blank=True, editable=False, help_text='Key of the ingestion queue entry that stored this activity', max_length=32, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='activity',
+            constraint=models.UniqueConstraint(condition=models.Q(('ingest_key__isnull', False)), fields=('ingest_key',), name='activities_ingest_key_uniq'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.1.7 on 2026-10-18 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0012_activity_ingest_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='activity',
+            name='score_version',
+            field=models.PositiveSmallIntegerField(blank=True, help_text='Scoring rules that computed points (null: client-supplied)', null=True),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0013_activity_score_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('taken_at', models.DateTimeField(db_index=True)),
+                ('users', models.JSONField(default=list, help_text='Usernames in rank order')),
+                ('points', models.JSONField(default=list, help_text='Total points, aligned with users')),
+            ],
+            options={
+                'db_table': 'leaderboard_snapshots',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='activityrollup',
+            index=models.Index(fields=['dimension', 'period', 'bucket_start', 'key'], name='activity_rollups_window_idx'),
+        ),
+    ]
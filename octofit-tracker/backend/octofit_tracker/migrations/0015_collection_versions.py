@@ -0,0 +1,25 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0014_leaderboard_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CollectionVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('namespace', models.CharField(max_length=200, unique=True)),
+                ('version', models.BigIntegerField()),
+                ('modified', models.FloatField(help_text='Unix time of the latest change')),
+            ],
+            options={
+                'db_table': 'collection_versions',
+            },
+        ),
+    ]
@@ -0,0 +1,71 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:40
+
+from django.db import migrations, models
+
+
+def split_documents(apps, schema_editor):
+    """Move the primary key out of each row's ``'kind:pk'`` document"""
+    SearchTerm = apps.get_model('octofit_tracker', 'SearchTerm')
+    for document in SearchTerm.objects.values_list('document', flat=True).distinct().iterator():
+        SearchTerm.objects.filter(document=document).update(object_id=int(document.split(':', 1)[1]))
+
+
+def join_documents(apps, schema_editor):
+    SearchTerm = apps.get_model('octofit_tracker', 'SearchTerm')
+    for kind, object_id in SearchTerm.objects.values_list('kind', 'object_id').distinct().iterator():
+        SearchTerm.objects.filter(kind=kind, object_id=object_id).update(document=f'{kind}:{object_id}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0015_collection_versions'),
+    ]
+
+    operations = [
+        migrations.RemoveConstraint(
+            model_name='searchterm',
+            name='search_terms_term_document_uniq',
+        ),
+        migrations.RemoveIndex(
+            model_name='searchterm',
+            name='search_terms_term_idx',
+        ),
+        migrations.AddField(
+            model_name='searchterm',
+            name='object_id',
+            field=models.BigIntegerField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='searchterm',
+            name='document',
+            field=models.CharField(max_length=40, null=True),
+        ),
+        migrations.RunPython(split_documents, join_documents),
+        migrations.RemoveIndex(
+            model_name='searchterm',
+            name='search_terms_document_idx',
+        ),
+        migrations.RemoveField(
+            model_name='searchterm',
+            name='document',
+        ),
+        migrations.AlterField(
+            model_name='searchterm',
+            name='object_id',
+            field=models.BigIntegerField(),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', '-weight', 'label', 'kind', 'object_id'], name='search_terms_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['kind', 'object_id'], name='search_terms_object_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'kind', 'object_id'),
+                                               name='search_terms_term_object_uniq'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:17
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Entries per chunk, as in snapshots.CHUNK_SIZE when this migration was written.
+CHUNK_SIZE = 10000
+
+
+def split_snapshots(apps, schema_editor):
+    """Move each snapshot's ranking into chunk rows"""
+    LeaderboardSnapshot = apps.get_model('octofit_tracker', 'LeaderboardSnapshot')
+    LeaderboardSnapshotChunk = apps.get_model('octofit_tracker', 'LeaderboardSnapshotChunk')
+    for snapshot_id in LeaderboardSnapshot.objects.values_list('pk', flat=True):
+        users, points = LeaderboardSnapshot.objects.values_list('users', 'points').get(pk=snapshot_id)
+        LeaderboardSnapshotChunk.objects.bulk_create([
+            LeaderboardSnapshotChunk(snapshot_id=snapshot_id, first_rank=start + 1,
+                                     users=users[start:start + CHUNK_SIZE], points=points[start:start + CHUNK_SIZE])
+            for start in range(0, len(users), CHUNK_SIZE)
+        ])
+        LeaderboardSnapshot.objects.filter(pk=snapshot_id).update(entries=len(users))
+
+
+def join_snapshots(apps, schema_editor):
+    LeaderboardSnapshot = apps.get_model('octofit_tracker', 'LeaderboardSnapshot')
+    LeaderboardSnapshotChunk = apps.get_model('octofit_tracker', 'LeaderboardSnapshotChunk')
+    for snapshot_id in LeaderboardSnapshot.objects.values_list('pk', flat=True):
+        users, points = [], []
+        for chunk_users, chunk_points in LeaderboardSnapshotChunk.objects.filter(
+            snapshot_id=snapshot_id,
+        ).order_by('first_rank').values_list('users', 'points'):
+            users.extend(chunk_users)
+            points.extend(chunk_points)
+        LeaderboardSnapshot.objects.filter(pk=snapshot_id).update(users=users, points=points)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0016_search_term_object_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='leaderboardsnapshot',
+            name='entries',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='LeaderboardSnapshotChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_rank', models.IntegerField()),
+                ('users', models.JSONField(default=list, help_text='Usernames in rank order')),
+                ('points', models.JSONField(default=list, help_text='Total points, aligned with users')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='chunks', to='octofit_tracker.leaderboardsnapshot')),
+            ],
+            options={
+                'db_table': 'leaderboard_snapshot_chunks',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardsnapshotchunk',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'first_rank'), name='leaderboard_snapshot_chunks_uniq'),
+        ),
+        migrations.RunPython(split_snapshots, join_snapshots),
+        migrations.RemoveField(
+            model_name='leaderboardsnapshot',
+            name='points',
+        ),
+        migrations.RemoveField(
+            model_name='leaderboardsnapshot',
+            name='users',
+        ),
+    ]
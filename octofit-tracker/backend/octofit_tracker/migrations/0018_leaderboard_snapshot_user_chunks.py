@@ -0,0 +1,58 @@
+# Generated by Django 4.1.7 on 2026-10-18 21:35
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# Entries per row, as in snapshots.USER_CHUNK_SIZE when this migration was written.
+USER_CHUNK_SIZE = 1000
+
+
+def index_snapshots(apps, schema_editor):
+    """Build the username index of every existing snapshot from its rank chunks"""
+    LeaderboardSnapshot = apps.get_model('octofit_tracker', 'LeaderboardSnapshot')
+    LeaderboardSnapshotChunk = apps.get_model('octofit_tracker', 'LeaderboardSnapshotChunk')
+    LeaderboardSnapshotUserChunk = apps.get_model('octofit_tracker', 'LeaderboardSnapshotUserChunk')
+    for snapshot_id in LeaderboardSnapshot.objects.values_list('pk', flat=True):
+        entries = []
+        chunks = LeaderboardSnapshotChunk.objects.filter(snapshot_id=snapshot_id)
+        for first_rank, users, points in chunks.values_list('first_rank', 'users', 'points'):
+            entries.extend(zip(users, range(first_rank, first_rank + len(users)), points))
+        entries.sort()
+        LeaderboardSnapshotUserChunk.objects.bulk_create([
+            LeaderboardSnapshotUserChunk(
+                snapshot_id=snapshot_id, first_user=entries[start][0],
+                users=[user for user, _, _ in part], ranks=[rank for _, rank, _ in part],
+                points=[points for _, _, points in part],
+            )
+            for start, part in ((start, entries[start:start + USER_CHUNK_SIZE])
+                                for start in range(0, len(entries), USER_CHUNK_SIZE))
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0017_leaderboard_snapshot_chunks'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardSnapshotUserChunk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('first_user', models.CharField(max_length=150)),
+                ('users', models.JSONField(default=list, help_text='Usernames in sorted order')),
+                ('ranks', models.JSONField(default=list, help_text='Ranks, aligned with users')),
+                ('points', models.JSONField(default=list, help_text='Total points, aligned with users')),
+                ('snapshot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='user_chunks', to='octofit_tracker.leaderboardsnapshot')),
+            ],
+            options={
+                'db_table': 'leaderboard_snapshot_user_chunks',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='leaderboardsnapshotuserchunk',
+            constraint=models.UniqueConstraint(fields=('snapshot', 'first_user'), name='leaderboard_snapshot_user_chunks_uniq'),
+        ),
+        migrations.RunPython(index_snapshots, migrations.RunPython.noop),
+    ]
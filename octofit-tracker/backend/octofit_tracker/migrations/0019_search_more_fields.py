@@ -0,0 +1,48 @@
+from importlib import import_module
+
+from django.db import migrations
+
+terms_for = import_module('octofit_tracker.migrations.0011_search_terms').terms_for
+
+# Searchable fields before and after this migration, as (model, label field,
+# {field: weight}); kept here so later changes to ``search`` cannot alter them.
+BEFORE = {
+    'user': ('User', 'username', {'username': 3, 'full_name': 2}),
+    'team': ('Team', 'name', {'name': 3, 'description': 1}),
+    'workout': ('Workout', 'name', {'name': 3, 'description': 1, 'exercises': 1}),
+}
+AFTER = {
+    'user': ('User', 'username', {'username': 3, 'full_name': 2, 'email': 1}),
+    'team': ('Team', 'name', {'name': 3, 'captain': 2, 'description': 1}),
+    'workout': ('Workout', 'name', {'name': 3, 'category': 2, 'description': 1, 'exercises': 1, 'recommended_for': 1}),
+}
+
+
+def reindex(sources):
+    def run(apps, schema_editor):
+        SearchTerm = apps.get_model('octofit_tracker', 'SearchTerm')
+        for kind, (model_name, label, fields) in sources.items():
+            SearchTerm.objects.filter(kind=kind).delete()
+            rows = []
+            for instance in apps.get_model('octofit_tracker', model_name).objects.only(label, *fields).iterator():
+                rows.extend(
+                    SearchTerm(term=term, kind=kind, object_id=instance.pk,
+                               label=str(getattr(instance, label))[:255], weight=weight)
+                    for term, weight in terms_for(instance, fields).items()
+                )
+                if len(rows) >= 2000:
+                    SearchTerm.objects.bulk_create(rows)
+                    rows = []
+            SearchTerm.objects.bulk_create(rows)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('octofit_tracker', '0018_leaderboard_snapshot_user_chunks'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindex(AFTER), reindex(BEFORE)),
+    ]
@@ -8,7 +8,10 @@ class User(models.Model):
     username = models.CharField(max_length=150, unique=True)
     password = models.CharField(max_length=255)
     full_name = models.CharField(max_length=255)
-    team = models.CharField(max_length=100, blank=True, null=True)
+    team = models.ForeignKey(
+        'Team', to_field='name', db_column='team', db_index=False,
+        on_delete=models.SET_NULL, blank=True, null=True, related_name='users',
+    )
     avatar_url = models.CharField(max_length=500, blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -16,6 +19,7 @@ class User(models.Model):
         db_table = 'users'
         indexes = [
             models.Index(fields=['email']),
+            models.Index(fields=['team', 'id'], name='users_team_idx'),
         ]
 
     def __str__(self):
@@ -27,8 +31,10 @@ class Team(models.Model):
     name = models.CharField(max_length=255, unique=True)
     description = models.TextField(blank=True)
     captain = models.CharField(max_length=150)
-    members = models.JSONField(default=list)
+    members = models.ManyToManyField(User, through='TeamMembership', related_name='member_of', blank=True)
     total_points = models.IntegerField(default=0)
+    total_activities = models.IntegerField(default=0)
+    member_count = models.IntegerField(default=0)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -38,41 +44,85 @@ class Team(models.Model):
         return self.name
 
 
+class TeamMembership(models.Model):
+    """A user on a team's roster"""
+    team = models.ForeignKey(Team, to_field='name', db_column='team', on_delete=models.CASCADE,
+                             related_name='memberships')
+    user = models.ForeignKey(User, to_field='username', db_column='user', on_delete=models.CASCADE,
+                             related_name='memberships')
+    joined_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'team_memberships'
+        constraints = [
+            models.UniqueConstraint(fields=['team', 'user'], name='team_memberships_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} @ {self.team_id}"
+
+
 class Activity(models.Model):
     """Activity model for OctoFit Tracker"""
-    user = models.CharField(max_length=150)
+    user = models.ForeignKey(User, to_field='username', db_column='user', db_index=False,
+                             on_delete=models.CASCADE, related_name='activities')
     activity_type = models.CharField(max_length=100)
     duration = models.IntegerField(help_text="Duration in minutes")
     distance = models.FloatField(default=0.0, help_text="Distance in kilometers")
     calories = models.IntegerField(default=0)
     points = models.IntegerField(default=0)
+    score_version = models.PositiveSmallIntegerField(
+        blank=True, null=True, help_text="Scoring rules that computed points (null: client-supplied)",
+    )
     date = models.DateTimeField()
     notes = models.TextField(blank=True)
+    ingest_key = models.CharField(max_length=32, blank=True, null=True, editable=False,
+                                  help_text="Key of the ingestion queue entry that stored this activity")
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         db_table = 'activities'
         ordering = ['-date']
+        indexes = [
+            models.Index(fields=['-date', '-id'], name='activities_date_id_idx'),
+            models.Index(fields=['user', '-date', '-id'], name='activities_user_date_idx'),
+            models.Index(fields=['activity_type', '-date', '-id'], name='activities_type_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ingest_key'], condition=models.Q(ingest_key__isnull=False),
+                name='activities_ingest_key_uniq',
+            ),
+        ]
 
     def __str__(self):
-        return f"{self.user} - {self.activity_type} - {self.date}"
+        return f"{self.user_id} - {self.activity_type} - {self.date}"
 
 
 class Leaderboard(models.Model):
     """Leaderboard model for OctoFit Tracker"""
-    user = models.CharField(max_length=150, unique=True)
-    team = models.CharField(max_length=100)
+    user = models.OneToOneField(User, to_field='username', db_column='user', on_delete=models.CASCADE,
+                                related_name='leaderboard_entry')
+    team = models.ForeignKey(Team, to_field='name', db_column='team', db_index=False,
+                             on_delete=models.SET_NULL, blank=True, null=True, related_name='leaderboard_entries')
     total_points = models.IntegerField(default=0)
     total_activities = models.IntegerField(default=0)
     rank = models.IntegerField(default=0)
+    team_rank = models.IntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
     
     class Meta:
         db_table = 'leaderboard'
         ordering = ['-total_points']
+        indexes = [
+            models.Index(fields=['-total_points', 'user'], name='leaderboard_points_user_idx'),
+            models.Index(fields=['team', '-total_points', 'user'], name='leaderboard_team_points_idx'),
+            models.Index(fields=['rank'], name='leaderboard_rank_idx'),
+            models.Index(fields=['team', 'team_rank'], name='leaderboard_team_rank_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.rank}. {self.user} - {self.total_points} points"
+        return f"{self.rank}. {self.user_id} - {self.total_points} points"
 
 
 class Workout(models.Model):
@@ -88,6 +138,138 @@ class Workout(models.Model):
     
     class Meta:
         db_table = 'workouts'
+        indexes = [
+            models.Index(fields=['difficulty', 'id'], name='workouts_difficulty_idx'),
+            models.Index(fields=['category', 'id'], name='workouts_category_idx'),
+        ]
 
     def __str__(self):
         return f"{self.name} ({self.difficulty})"
+
+
+class WorkoutRecommendation(models.Model):
+    """A user's best-matching workouts, precomputed by ``refresh_recommendations``"""
+    user = models.OneToOneField(User, to_field='username', db_column='user', on_delete=models.CASCADE,
+                                related_name='workout_recommendation')
+    workouts = models.JSONField(default=list, help_text="Workout ids, best first")
+    scores = models.JSONField(default=list)
+    computed_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'workout_recommendations'
+
+    def __str__(self):
+        return f"{self.user_id}: {self.workouts}"
+
+
+class ActivityRollup(models.Model):
+    """Activity totals per user, team or activity type and time bucket"""
+    DIMENSIONS = ['user', 'team', 'type']
+    PERIODS = ['day', 'week', 'month']
+
+    dimension = models.CharField(max_length=10)
+    key = models.CharField(max_length=150)
+    period = models.CharField(max_length=10)
+    bucket_start = models.DateField()
+    activities = models.IntegerField(default=0)
+    duration = models.IntegerField(default=0)
+    distance = models.FloatField(default=0.0)
+    calories = models.IntegerField(default=0)
+    points = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'activity_rollups'
+        indexes = [
+            models.Index(fields=['dimension', 'period', 'bucket_start', 'key'], name='activity_rollups_window_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['dimension', 'period', 'key', 'bucket_start'],
+                name='activity_rollups_bucket_uniq',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}:{self.key} {self.period} {self.bucket_start}"
+
+
+class SearchTerm(models.Model):
+    """One edge n-gram of a searchable user, team or workout"""
+    term = models.CharField(max_length=32)
+    kind = models.CharField(max_length=10)
+    object_id = models.BigIntegerField()
+    label = models.CharField(max_length=255)
+    weight = models.SmallIntegerField(default=1)
+
+    class Meta:
+        db_table = 'search_terms'
+        indexes = [
+            models.Index(fields=['term', '-weight', 'label', 'kind', 'object_id'], name='search_terms_term_idx'),
+            models.Index(fields=['kind', 'object_id'], name='search_terms_object_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['term', 'kind', 'object_id'], name='search_terms_term_object_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} -> {self.kind}:{self.object_id}"
+
+
+class LeaderboardSnapshot(models.Model):
+    """The leaderboard ranking at one moment, stored in ``LeaderboardSnapshotChunk`` rows"""
+    taken_at = models.DateTimeField(db_index=True)
+    entries = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'leaderboard_snapshots'
+
+    def __str__(self):
+        return f"Leaderboard at {self.taken_at}"
+
+
+class LeaderboardSnapshotChunk(models.Model):
+    """Consecutive ranks of a snapshot, stored compactly"""
+    snapshot = models.ForeignKey(LeaderboardSnapshot, on_delete=models.CASCADE, related_name='chunks')
+    first_rank = models.IntegerField()
+    users = models.JSONField(default=list, help_text="Usernames in rank order")
+    points = models.JSONField(default=list, help_text="Total points, aligned with users")
+
+    class Meta:
+        db_table = 'leaderboard_snapshot_chunks'
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'first_rank'], name='leaderboard_snapshot_chunks_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.snapshot} from rank {self.first_rank}"
+
+
+class LeaderboardSnapshotUserChunk(models.Model):
+    """Entries of a snapshot in username order, to find one user without decoding the ranking"""
+    snapshot = models.ForeignKey(LeaderboardSnapshot, on_delete=models.CASCADE, related_name='user_chunks')
+    first_user = models.CharField(max_length=150)
+    users = models.JSONField(default=list, help_text="Usernames in sorted order")
+    ranks = models.JSONField(default=list, help_text="Ranks, aligned with users")
+    points = models.JSONField(default=list, help_text="Total points, aligned with users")
+
+    class Meta:
+        db_table = 'leaderboard_snapshot_user_chunks'
+        constraints = [
+            models.UniqueConstraint(fields=['snapshot', 'first_user'], name='leaderboard_snapshot_user_chunks_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.snapshot} from user {self.first_user}"
+
+
+class CollectionVersion(models.Model):
+    """The change counter of one cached collection (see ``versions``)"""
+    namespace = models.CharField(max_length=200, unique=True)
+    version = models.BigIntegerField()
+    modified = models.FloatField(help_text="Unix time of the latest change")
+
+    class Meta:
+        db_table = 'collection_versions'
+
+    def __str__(self):
+        return f"{self.namespace}@{self.version}"
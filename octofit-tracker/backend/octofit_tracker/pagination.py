@@ -0,0 +1,170 @@
+"""
+Keyset (cursor) pagination for the OctoFit Tracker API.
+
+Pages are selected with a ``WHERE (ordering columns) > (last row seen)``
+predicate instead of ``OFFSET``, so fetching page N costs the same as page 1
+and rows inserted while a client is paging never cause duplicates or gaps.
+Cursors are opaque, URL-safe tokens holding the ordering values of the row at
+the page boundary.
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from datetime import date, datetime
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Paginate on a unique, fully ordered tuple of columns.
+
+    ``ordering`` must end with a unique column so every row has a distinct
+    position; prefix a column with ``-`` to sort it descending.
+    """
+    ordering = ('id',)
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        cursor = self.decode_cursor(request)
+        reverse = bool(cursor and cursor['r'])
+
+        ordering = [_flip(field) for field in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(_after(ordering, self.coerce_values(queryset.model, cursor['v'])))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        # Arriving through a cursor means there is a page on the side we came from.
+        self.has_next = True if reverse else has_more
+        self.has_previous = has_more if reverse else cursor is not None
+        self.page = results
+        return results
+
+    def get_page_size(self, request):
+        page_size = api_settings.PAGE_SIZE or 50
+        try:
+            requested = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            requested = 0
+        if requested > 0:
+            page_size = requested
+        return min(page_size, getattr(settings, 'OCTOFIT_MAX_PAGE_SIZE', 500))
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.request.build_absolute_uri(), self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            cursor = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            values, reverse = cursor['v'], cursor['r']
+        except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+        return {'v': values, 'r': bool(reverse)}
+
+    def coerce_values(self, model, values):
+        """Cursor values converted by their model fields; a tampered cursor is not found"""
+        coerced = []
+        for field, value in zip(self.ordering, values):
+            try:
+                model_field = model._meta.get_field(field.lstrip('-'))
+                value = getattr(model_field, 'target_field', model_field).to_python(value)
+            except (FieldDoesNotExist, ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            coerced.append(value)
+        return coerced
+
+    def encode_cursor(self, item, reverse):
+        values = [_cursor_value(item, field.lstrip('-')) for field in self.ordering]
+        payload = json.dumps({'v': values, 'r': reverse}, separators=(',', ':'))
+        token = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, token)
+
+
+class ActivityPagination(KeysetPagination):
+    """Newest activities first"""
+    ordering = ('-date', '-id')
+
+
+class LeaderboardPagination(KeysetPagination):
+    """Highest points first, ties broken the same way as ``rank``"""
+    ordering = ('-total_points', 'user')
+
+
+class RollupPagination(KeysetPagination):
+    """One row per key and bucket, oldest bucket first"""
+    ordering = ('key', 'bucket_start')
+
+
+def _flip(field):
+    return field[1:] if field.startswith('-') else f'-{field}'
+
+
+def _after(ordering, values):
+    """Row-value comparison ``(a, b, c) > (x, y, z)`` honouring each direction"""
+    condition = Q()
+    equal = Q()
+    for field, value in zip(ordering, values):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _cursor_value(item, name):
+    value = item[name] if isinstance(item, dict) else item.serializable_value(name)
+    if isinstance(value, (datetime, date)):
+        # Full precision: a truncated timestamp would skip or repeat rows.
+        return value.isoformat()
+    return value
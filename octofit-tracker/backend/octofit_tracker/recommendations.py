@@ -0,0 +1,142 @@
+"""
+Workout recommendations scored with NumPy feature matrices.
+
+Each user is described by their recent activity (the share of each workout
+category their activity types train, their typical session length and their
+intensity in points per minute) and their team. Each workout is described by
+its category, duration, difficulty and ``recommended_for`` team. One pass of
+array arithmetic scores every (user, workout) pair, and the best
+``OCTOFIT_RECOMMENDATION_COUNT`` per user are stored in
+``WorkoutRecommendation``. ``refresh_recommendations`` runs this in the
+background, so serving a user's list is a single row lookup.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .models import Activity, User, Workout, WorkoutRecommendation
+from .versions import bump_on_commit
+
+# Workout category each activity type trains; other types count towards 'Mixed'.
+CATEGORY_OF_ACTIVITY = {
+    'Running': 'Cardio',
+    'Cycling': 'Cardio',
+    'Swimming': 'Cardio',
+    'Hiking': 'Cardio',
+    'Weight Training': 'Strength',
+    'Boxing': 'Mixed',
+    'Yoga': 'Flexibility',
+}
+
+DIFFICULTY_LEVELS = {'Beginner': 0, 'Intermediate': 1, 'Advanced': 2}
+
+# Points per minute at which a user is treated as ready for each level above Beginner.
+INTENSITY_THRESHOLDS = (1.0, 2.0)
+
+# Users scored per block, bounding the size of the score matrix.
+BLOCK_SIZE = 5000
+
+# Relative weight of each component of the score; they sum to 1.
+WEIGHTS = {'category': 0.45, 'level': 0.25, 'duration': 0.15, 'team': 0.15}
+
+
+def workout_features(workouts):
+    """``(categories, one-hot category matrix, durations, levels, teams)`` for ``workouts`` rows"""
+    categories = sorted({workout['category'] for workout in workouts} | {'Mixed'})
+    column = {category: index for index, category in enumerate(categories)}
+    onehot = np.zeros((len(workouts), len(categories)))
+    onehot[np.arange(len(workouts)), [column[workout['category']] for workout in workouts]] = 1.0
+    durations = np.array([workout['duration'] for workout in workouts], dtype=float)
+    levels = np.array([DIFFICULTY_LEVELS.get(workout['difficulty'], 1) for workout in workouts], dtype=float)
+    teams = np.array([workout['recommended_for'] or '' for workout in workouts], dtype=object)
+    return categories, onehot, durations, levels, teams
+
+
+def user_features(usernames, categories, default_duration, since):
+    """``(category mix, mean durations, levels)`` from each user's activities since ``since``"""
+    row = {username: index for index, username in enumerate(usernames)}
+    column = {category: index for index, category in enumerate(categories)}
+    counts = np.zeros((len(usernames), len(categories)))
+    minutes = np.zeros(len(usernames))
+    points = np.zeros(len(usernames))
+    mix = Activity.objects.filter(date__gte=since).values_list('user', 'activity_type').annotate(
+        sessions=Count('id'), minutes=Sum('duration'), points=Sum('points'),
+    ).order_by()
+    for username, activity_type, sessions, total_minutes, total_points in mix:
+        if username not in row:
+            continue
+        category = CATEGORY_OF_ACTIVITY.get(activity_type, 'Mixed')
+        counts[row[username], column.get(category, column['Mixed'])] += sessions
+        minutes[row[username]] += total_minutes or 0
+        points[row[username]] += total_points or 0
+
+    sessions = counts.sum(axis=1)
+    active = sessions > 0
+    shares = np.divide(counts, sessions[:, None], out=np.zeros_like(counts), where=active[:, None])
+    durations = np.divide(minutes, sessions, out=np.full(len(usernames), default_duration), where=active)
+    intensity = np.divide(points, minutes, out=np.zeros(len(usernames)), where=minutes > 0)
+    levels = np.searchsorted(INTENSITY_THRESHOLDS, intensity, side='right').astype(float)
+    return shares, durations, levels
+
+
+def score(user_shares, user_durations, user_levels, user_teams, onehot, durations, levels, teams):
+    """``(users x workouts)`` scores in ``[0, 1]``"""
+    category = user_shares @ onehot.T
+    longest = max(durations.max(initial=0.0), user_durations.max(initial=0.0), 1.0)
+    duration = 1.0 - np.abs(user_durations[:, None] - durations[None, :]) / longest
+    level = 1.0 - np.abs(user_levels[:, None] - levels[None, :]) / 2.0
+    team = (user_teams[:, None] == teams[None, :]) & (teams[None, :] != '')
+    return (WEIGHTS['category'] * category + WEIGHTS['duration'] * duration
+            + WEIGHTS['level'] * level + WEIGHTS['team'] * team)
+
+
+def top_n(scores, count):
+    """Column indices of the ``count`` best scores per row, best first (ties by column)"""
+    count = min(count, scores.shape[1])
+    if count == 0:
+        return np.zeros((scores.shape[0], 0), dtype=int)
+    # Stable sort on the negated scores keeps ties in workout order.
+    return np.argsort(-scores, axis=1, kind='stable')[:, :count]
+
+
+def refresh_recommendations(count=None, window_days=None):
+    """Recompute every user's recommended workouts; returns the number of users"""
+    count = settings.OCTOFIT_RECOMMENDATION_COUNT if count is None else count
+    window_days = settings.OCTOFIT_RECOMMENDATION_WINDOW_DAYS if window_days is None else window_days
+    workouts = list(Workout.objects.order_by('id').values('id', 'category', 'duration', 'difficulty',
+                                                          'recommended_for'))
+    users = list(User.objects.order_by('username').values_list('username', 'team'))
+    now = timezone.now()
+
+    rows = []
+    if workouts and users:
+        categories, onehot, durations, levels, teams = workout_features(workouts)
+        usernames = [username for username, _ in users]
+        shares, user_durations, user_levels = user_features(
+            usernames, categories, float(np.median(durations)), now - timedelta(days=window_days),
+        )
+        user_teams = np.array([team or '' for _, team in users], dtype=object)
+        ids = np.array([workout['id'] for workout in workouts])
+        for start in range(0, len(usernames), BLOCK_SIZE):
+            block = slice(start, start + BLOCK_SIZE)
+            scores = score(shares[block], user_durations[block], user_levels[block], user_teams[block],
+                           onehot, durations, levels, teams)
+            best = top_n(scores, count)
+            best_scores = np.round(np.take_along_axis(scores, best, axis=1), 4)
+            for offset, username in enumerate(usernames[block]):
+                rows.append(WorkoutRecommendation(
+                    user_id=username,
+                    workouts=ids[best[offset]].tolist(),
+                    scores=best_scores[offset].tolist(),
+                    computed_at=now,
+                ))
+
+    with transaction.atomic():
+        WorkoutRecommendation.objects.all().delete()
+        WorkoutRecommendation.objects.bulk_create(rows, batch_size=1000)
+        bump_on_commit('recommendation')
+    return len(rows)
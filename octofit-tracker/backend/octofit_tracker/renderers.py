@@ -0,0 +1,85 @@
+import csv
+import io
+import json
+
+from django.utils.encoding import force_str
+from rest_framework.renderers import BaseRenderer
+
+try:
+    import msgpack
+except ImportError:  # MessagePackRenderer is only enabled when it is installed
+    msgpack = None
+
+
+class StreamingRenderer(BaseRenderer):
+    """
+    Renders a list of rows; ``stream`` encodes row batches lazily.
+
+    ``render`` covers ordinary responses (such as validation errors) sent
+    through the same negotiated format.
+    """
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        columns = list(rows[0]) if rows and isinstance(rows[0], dict) else []
+        return b''.join(self.stream(columns, [rows]))
+
+    def stream(self, columns, batches):
+        """Yield encoded chunks: an optional header, then one per batch of row dicts"""
+        raise NotImplementedError
+
+
+class NDJSONRenderer(StreamingRenderer):
+    """One compact JSON object per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+    def stream(self, columns, batches):
+        encode = self._encoder.encode
+        for rows in batches:
+            if rows:
+                yield ''.join(encode(row) + '\n' for row in rows).encode(self.charset)
+
+
+class CSVRenderer(StreamingRenderer):
+    """A header row followed by one line per row; nulls are empty cells"""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, columns, batches):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        yield self._drain(buffer)
+        for rows in batches:
+            writer.writerows(['' if row[column] is None else row[column] for column in columns] for row in rows)
+            if buffer.tell():
+                yield self._drain(buffer)
+
+    def _drain(self, buffer):
+        chunk = buffer.getvalue().encode(self.charset)
+        buffer.seek(0)
+        buffer.truncate()
+        return chunk
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Compact binary encoding of the same data as the JSON responses; needs ``msgpack``"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, use_bin_type=True, default=_msgpack_default)
+
+
+def _msgpack_default(value):
+    # Whatever DRF's JSON encoder would turn into a string (lazy text, UUIDs, decimals).
+    return force_str(value)
@@ -0,0 +1,97 @@
+"""
+Read-through cache for API responses.
+
+Responses are keyed by endpoint, host, normalised query parameters and the
+version counters of the collections they are built from (see ``versions``),
+so a write to any of those collections makes every dependent entry
+unreachable. Entries also expire after ``OCTOFIT_RESPONSE_CACHE_TTL`` seconds.
+"""
+import functools
+import hashlib
+import threading
+
+from django.conf import settings
+from rest_framework.response import Response
+
+from .versions import get_cache, get_versions
+
+
+class CacheStats:
+    """Thread-safe hit/miss counters per endpoint"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def record(self, endpoint, hit):
+        with self._lock:
+            counts = self._counts.setdefault(endpoint, {'hits': 0, 'misses': 0})
+            counts['hits' if hit else 'misses'] += 1
+
+    def snapshot(self):
+        with self._lock:
+            endpoints = {endpoint: dict(counts) for endpoint, counts in self._counts.items()}
+        for counts in endpoints.values():
+            total = counts['hits'] + counts['misses']
+            counts['hit_ratio'] = round(counts['hits'] / total, 4) if total else 0.0
+        return endpoints
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+stats = CacheStats()
+
+
+def normalize_params(query_params):
+    """Order-independent representation of a QueryDict"""
+    return sorted(
+        (key, sorted(value.strip() for value in values))
+        for key, values in query_params.lists()
+    )
+
+
+def make_key(endpoint, request, versions, kwargs):
+    raw = repr((
+        endpoint,
+        request.get_host(),
+        normalize_params(request.query_params),
+        sorted(kwargs.items()),
+        sorted(versions.items()),
+    ))
+    return f'octofit:response:{endpoint}:{hashlib.sha1(raw.encode("utf-8")).hexdigest()}'
+
+
+def cached_response(*namespaces, timeout=None):
+    """
+    Cache a viewset action's successful responses.
+
+    ``namespaces`` are the collections the response is built from; bumping
+    any of them invalidates the entry.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            if not settings.OCTOFIT_RESPONSE_CACHE_ENABLED:
+                return view_method(self, request, *args, **kwargs)
+
+            cache = get_cache()
+            endpoint = f'{self.basename}.{self.action}'
+            key = make_key(endpoint, request, get_versions(namespaces, request._request), kwargs)
+            cached = cache.get(key)
+            if cached is not None:
+                stats.record(endpoint, hit=True)
+                response = Response(cached)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            stats.record(endpoint, hit=False)
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                ttl = settings.OCTOFIT_RESPONSE_CACHE_TTL if timeout is None else timeout
+                cache.set(key, response.data, ttl)
+            response['X-Cache'] = 'MISS'
+            return response
+        return wrapper
+    return decorator
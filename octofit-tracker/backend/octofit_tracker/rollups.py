@@ -0,0 +1,162 @@
+"""
+Incrementally maintained activity rollups.
+
+Every activity contributes to one ``ActivityRollup`` row per dimension
+(user, team, activity type) and period (day, week, month). Writes apply
+signed deltas to those rows, so a statistics query reads one row per bucket
+instead of scanning the underlying activities. Arbitrary date windows are
+answered from month buckets for the whole months they span and day buckets
+for the rest (``window_totals``).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import Activity, ActivityRollup, Leaderboard
+
+# Order of the summed values in a delta.
+MEASURES = ('activities', 'duration', 'distance', 'calories', 'points')
+
+
+def bucket_start(moment, period):
+    """First day of the ``period`` bucket containing ``moment`` (a date or datetime)"""
+    if isinstance(moment, datetime):
+        day = timezone.localtime(moment).date() if timezone.is_aware(moment) else moment.date()
+    else:
+        day = moment
+    if period == 'day':
+        return day
+    if period == 'week':
+        return day - timedelta(days=day.weekday())
+    if period == 'month':
+        return day.replace(day=1)
+    raise ValueError(f'Unknown period: {period}')
+
+
+def window_buckets(start, end):
+    """``Q`` selecting the day and month buckets that exactly cover ``start`` to ``end``"""
+    first_month = start if start.day == 1 else (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    # Last day of the last month that ends within the window.
+    months_end = end if (end + timedelta(days=1)).day == 1 else end.replace(day=1) - timedelta(days=1)
+    if first_month > months_end:
+        return Q(period='day', bucket_start__range=(start, end))
+    # Contiguous ranges (rather than lists of buckets) let the window index seek.
+    buckets = Q(period='month', bucket_start__range=(first_month, months_end.replace(day=1)))
+    if start < first_month:
+        buckets |= Q(period='day', bucket_start__range=(start, first_month - timedelta(days=1)))
+    if months_end < end:
+        buckets |= Q(period='day', bucket_start__range=(months_end + timedelta(days=1), end))
+    return buckets
+
+
+def window_totals(start, end, users=None):
+    """
+    Per-user ``{'key', 'points', 'activities'}`` between ``start`` and ``end`` inclusive, best first.
+
+    Users without activities in the window are left out; ``users`` (usernames
+    or a subquery of them) restricts the result.
+    """
+    rows = ActivityRollup.objects.filter(window_buckets(start, end), dimension='user')
+    if users is not None:
+        rows = rows.filter(key__in=users)
+    return rows.values('key').annotate(points=Sum('points'), activities=Sum('activities')).order_by('-points', 'key')
+
+
+def accumulate(deltas, activities, teams, sign=1):
+    """
+    Add ``sign`` times each activity to ``deltas``.
+
+    ``deltas`` maps ``(dimension, period, key, bucket_start)`` to a list of
+    measures; ``teams`` maps usernames to the team of their leaderboard entry.
+    """
+    for activity in activities:
+        keys = {'user': activity.user_id, 'type': activity.activity_type}
+        team = teams.get(activity.user_id)
+        if team:
+            keys['team'] = team
+        values = (1, activity.duration, activity.distance, activity.calories, activity.points)
+        for period in ActivityRollup.PERIODS:
+            start = bucket_start(activity.date, period)
+            for dimension, key in keys.items():
+                delta = deltas[(dimension, period, key, start)]
+                for index, value in enumerate(values):
+                    delta[index] += sign * value
+    return deltas
+
+
+def new_deltas():
+    return defaultdict(lambda: [0, 0, 0.0, 0, 0])
+
+
+def apply_activity_changes(added=(), removed=()):
+    """Fold created, updated or deleted activities into the rollups"""
+    added, removed = list(added), list(removed)
+    usernames = {activity.user_id for activity in added + removed}
+    teams = dict(Leaderboard.objects.filter(user__in=usernames).values_list('user', 'team'))
+    deltas = new_deltas()
+    accumulate(deltas, added, teams, sign=1)
+    accumulate(deltas, removed, teams, sign=-1)
+    with transaction.atomic():
+        for bucket in sorted(deltas):
+            _apply(bucket, deltas[bucket])
+
+
+def rebuild(batch_size=2000):
+    """Recompute every rollup from the activity table"""
+    teams = dict(Leaderboard.objects.values_list('user', 'team'))
+    deltas = new_deltas()
+    activities = Activity.objects.only('user', 'activity_type', 'duration', 'distance', 'calories', 'points', 'date')
+    accumulate(deltas, activities.iterator(chunk_size=batch_size), teams)
+    with transaction.atomic():
+        ActivityRollup.objects.all().delete()
+        ActivityRollup.objects.bulk_create(
+            (rollup_row(bucket, delta) for bucket, delta in deltas.items()),
+            batch_size=batch_size,
+        )
+    return len(deltas)
+
+
+def move_user(username, old_team, new_team):
+    """Move a user's share of the team rollups from ``old_team`` to ``new_team``"""
+    deltas = new_deltas()
+    for row in ActivityRollup.objects.filter(dimension='user', key=username).values('period', 'bucket_start',
+                                                                                   *MEASURES):
+        for team, sign in ((old_team, -1), (new_team, 1)):
+            if team:
+                delta = deltas[('team', row['period'], team, row['bucket_start'])]
+                for index, measure in enumerate(MEASURES):
+                    delta[index] += sign * row[measure]
+    with transaction.atomic():
+        for bucket in sorted(deltas):
+            _apply(bucket, deltas[bucket])
+
+
+def remove_key(dimension, key):
+    """Delete every bucket of one user, team or activity type"""
+    ActivityRollup.objects.filter(dimension=dimension, key=key).delete()
+
+
+def rollup_row(bucket, delta):
+    """Unsaved ``ActivityRollup`` for a bucket key and its measures"""
+    dimension, period, key, start = bucket
+    return ActivityRollup(dimension=dimension, period=period, key=key, bucket_start=start,
+                          **dict(zip(MEASURES, delta)))
+
+
+def _apply(bucket, delta):
+    if not any(delta):
+        return
+    dimension, period, key, start = bucket
+    rows = ActivityRollup.objects.filter(dimension=dimension, period=period, key=key, bucket_start=start)
+    changes = {measure: F(measure) + value for measure, value in zip(MEASURES, delta)}
+    if rows.update(**changes):
+        return
+    try:
+        with transaction.atomic():
+            rollup_row(bucket, delta).save(force_insert=True)
+    except IntegrityError:
+        # Another writer created the bucket first.
+        rows.update(**changes)
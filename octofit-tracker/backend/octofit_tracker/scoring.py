@@ -0,0 +1,142 @@
+"""
+Server-side activity points.
+
+Points are ``int(duration * per_minute) + int(distance * per_km)`` with the
+coefficients of the activity's type in a versioned rule set. Writes through
+the API are scored with ``OCTOFIT_SCORING_VERSION`` and record the version on
+the activity. To change scoring, add a new version to ``RULES``, point the
+setting at it and run ``manage.py rescore``: ``rescore`` recomputes every
+stored activity in NumPy batches streamed from the database and rebuilds the
+leaderboard, team totals and rollups in the same transaction.
+"""
+from collections import defaultdict, namedtuple
+
+import numpy as np
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from . import rollups
+from .aggregation import rebuild_ranks
+from .models import Activity, Leaderboard, Team, User
+from .versions import ACTIVITY_EPOCH, bump_on_commit
+
+Rule = namedtuple('Rule', ['per_minute', 'per_km'])
+
+# Rule sets by version, keyed by activity type; '*' covers every other type.
+# Published versions must never change, only be superseded.
+RULES = {
+    1: {'*': Rule(per_minute=1, per_km=10)},
+}
+
+
+def get_rules(version=None):
+    """The rule set for ``version`` (default: ``OCTOFIT_SCORING_VERSION``)"""
+    version = settings.OCTOFIT_SCORING_VERSION if version is None else version
+    if version not in RULES:
+        raise ImproperlyConfigured(f'Unknown scoring version {version}; known: {sorted(RULES)}')
+    return RULES[version]
+
+
+def rule_for(rules, activity_type):
+    return rules.get(activity_type, rules['*'])
+
+
+def score(activity_type, duration, distance, version=None):
+    """Points for one activity"""
+    rule = rule_for(get_rules(version), activity_type)
+    return int(duration * rule.per_minute) + int((distance or 0.0) * rule.per_km)
+
+
+def score_many(rules, activity_types, durations, distances):
+    """Points for arrays of activities"""
+    kinds, inverse = np.unique(np.asarray(activity_types, dtype=object).astype(str), return_inverse=True)
+    per_minute = np.array([rule_for(rules, kind).per_minute for kind in kinds], dtype=float)[inverse]
+    per_km = np.array([rule_for(rules, kind).per_km for kind in kinds], dtype=float)[inverse]
+    durations = np.asarray(durations, dtype=float)
+    distances = np.nan_to_num(np.asarray(distances, dtype=float))
+    return (np.trunc(durations * per_minute) + np.trunc(distances * per_km)).astype(np.int64)
+
+
+def rescore(version=None, batch_size=5000):
+    """
+    Recompute every activity's points with ``version`` and rebuild what depends on them.
+
+    Returns ``(activities scored, activities changed)``.
+    """
+    version = settings.OCTOFIT_SCORING_VERSION if version is None else version
+    rules = get_rules(version)
+    teams = dict(User.objects.values_list('username', 'team'))
+    index = {username: position for position, username in enumerate(teams)}
+    points = np.zeros(len(index), dtype=np.int64)
+    counts = np.zeros(len(index), dtype=np.int64)
+    scored = changed = 0
+
+    with transaction.atomic():
+        last = None
+        while True:
+            batch = Activity.objects.order_by('id')
+            if last is not None:
+                batch = batch.filter(id__gt=last)
+            rows = list(batch.values_list('id', 'user', 'activity_type', 'duration', 'distance', 'points',
+                                          'score_version')[:batch_size])
+            if not rows:
+                break
+            last = rows[-1][0]
+            ids, users, types, durations, distances, old_points, old_versions = zip(*rows)
+            new_points = score_many(rules, types, durations, distances)
+
+            owners = np.array([index[user] for user in users])
+            np.add.at(points, owners, new_points)
+            np.add.at(counts, owners, 1)
+
+            stale = (new_points != np.array(old_points)) | np.array([v != version for v in old_versions])
+            ids = np.array(ids)
+            # Points take few distinct values, so one UPDATE per value beats per-row CASE updates.
+            for value in np.unique(new_points[stale]):
+                Activity.objects.filter(id__in=ids[stale & (new_points == value)].tolist()).update(
+                    points=int(value), score_version=version,
+                )
+            scored += len(rows)
+            changed += int(stale.sum())
+
+        moved = _rebuild_totals(teams, index, points, counts)
+        rebuild_ranks()
+        if changed or moved:
+            rollups.rebuild()
+        bump_on_commit('activity', ACTIVITY_EPOCH, 'leaderboard', 'team')
+    return scored, changed
+
+
+def _rebuild_totals(teams, index, points, counts):
+    """
+    Write per-user totals to the leaderboard and per-team sums to ``Team``.
+
+    Entries whose team no longer matches their user's are moved to it;
+    returns how many were.
+    """
+    entries = {entry.user_id: entry for entry in Leaderboard.objects.only('id', 'user', 'team', 'total_points',
+                                                                           'total_activities')}
+    updated, created, moved = [], [], 0
+    team_totals = defaultdict(lambda: [0, 0])
+    for username, position in index.items():
+        total_points, total_activities = int(points[position]), int(counts[position])
+        if teams[username] is not None:
+            team_totals[teams[username]][0] += total_points
+            team_totals[teams[username]][1] += total_activities
+        entry = entries.get(username)
+        if entry is None:
+            if total_activities:
+                created.append(Leaderboard(user_id=username, team_id=teams[username], total_points=total_points,
+                                           total_activities=total_activities))
+        elif (entry.total_points, entry.total_activities, entry.team_id) != (total_points, total_activities,
+                                                                              teams[username]):
+            moved += entry.team_id != teams[username]
+            entry.total_points, entry.total_activities, entry.team_id = total_points, total_activities, teams[username]
+            updated.append(entry)
+    Leaderboard.objects.bulk_update(updated, ['total_points', 'total_activities', 'team'], batch_size=1000)
+    Leaderboard.objects.bulk_create(created, batch_size=1000)
+    for name in Team.objects.values_list('name', flat=True):
+        total_points, total_activities = team_totals.get(name, (0, 0))
+        Team.objects.filter(name=name).update(total_points=total_points, total_activities=total_activities)
+    return moved
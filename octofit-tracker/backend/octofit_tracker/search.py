@@ -0,0 +1,121 @@
+"""
+Prefix search over users, teams and workouts.
+
+Searchable text is split into lower-case words, and every word into its edge
+n-grams ("thor" gives "t", "th", "tho", "thor"). Each distinct n-gram of an
+object is one ``SearchTerm`` row, so matching a query word as a prefix is an
+equality lookup on the ``term`` index, already ordered by relevance.
+Multi-word queries must match every word. Rows are rewritten when an object
+is saved and removed when it is deleted (see ``signals``); bulk loads call
+``rebuild_index``.
+"""
+import re
+import unicodedata
+
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import SearchTerm, Team, User, Workout
+
+# Searchable fields per kind, with the weight a match on them carries.
+SOURCES = {
+    'user': (User, {'username': 3, 'full_name': 2, 'email': 1}),
+    'team': (Team, {'name': 3, 'captain': 2, 'description': 1}),
+    'workout': (Workout, {'name': 3, 'category': 2, 'description': 1, 'exercises': 1, 'recommended_for': 1}),
+}
+
+# The field shown for a result.
+LABELS = {'user': 'username', 'team': 'name', 'workout': 'name'}
+
+MAX_TERM_LENGTH = 32
+
+_WORD = re.compile(r'[^\W_]+')
+
+
+def tokenize(text):
+    """Lower-case, accent-free words of ``text``"""
+    text = unicodedata.normalize('NFKD', str(text))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return _WORD.findall(text.lower())
+
+
+def terms_for(kind, instance):
+    """``{n-gram: weight}`` for ``instance``, keeping each n-gram's best weight"""
+    terms = {}
+    for field, weight in SOURCES[kind][1].items():
+        value = getattr(instance, field)
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(item) for item in value)
+        for word in tokenize(value or ''):
+            for end in range(1, min(len(word), MAX_TERM_LENGTH) + 1):
+                prefix = word[:end]
+                if terms.get(prefix, 0) < weight:
+                    terms[prefix] = weight
+    return terms
+
+
+def _rows(kind, instance):
+    label = str(getattr(instance, LABELS[kind]))[:255]
+    return [
+        SearchTerm(term=term, kind=kind, object_id=instance.pk, label=label, weight=weight)
+        for term, weight in terms_for(kind, instance).items()
+    ]
+
+
+def index_object(kind, instance):
+    """Replace the index rows of one object"""
+    with transaction.atomic():
+        SearchTerm.objects.filter(kind=kind, object_id=instance.pk).delete()
+        SearchTerm.objects.bulk_create(_rows(kind, instance))
+
+
+def remove_object(kind, pk):
+    SearchTerm.objects.filter(kind=kind, object_id=pk).delete()
+
+
+def rebuild_index(batch_size=2000):
+    """Index every searchable object from scratch; returns the number of rows written"""
+    written = 0
+    with transaction.atomic():
+        SearchTerm.objects.all().delete()
+        for kind, (model, fields) in SOURCES.items():
+            batch = []
+            columns = ['pk', LABELS[kind], *fields]
+            for instance in model.objects.only(*{column for column in columns if column != 'pk'}).iterator():
+                batch.extend(_rows(kind, instance))
+                if len(batch) >= batch_size:
+                    SearchTerm.objects.bulk_create(batch, batch_size=batch_size)
+                    written += len(batch)
+                    batch = []
+            SearchTerm.objects.bulk_create(batch, batch_size=batch_size)
+            written += len(batch)
+    return written
+
+
+def matches(query, kinds=None):
+    """``SearchTerm`` rows of the documents matching every word of ``query``, best first"""
+    words = sorted({word[:MAX_TERM_LENGTH] for word in tokenize(query)}, key=len, reverse=True)
+    if not words:
+        return SearchTerm.objects.none()
+    # The longest word is usually the most selective, so it drives the lookup.
+    rows = SearchTerm.objects.filter(term=words[0])
+    for word in words[1:]:
+        rows = rows.filter(Exists(SearchTerm.objects.filter(
+            term=word, kind=OuterRef('kind'), object_id=OuterRef('object_id'),
+        )))
+    if kinds:
+        rows = rows.filter(kind__in=kinds)
+    return rows.order_by('-weight', 'label', 'kind', 'object_id')
+
+
+def search(query, kinds=None, limit=10):
+    """The best ``limit`` results as ``{'kind', 'id', 'label'}`` dicts"""
+    return [
+        {'kind': kind, 'id': str(object_id), 'label': label}
+        for kind, object_id, label in matches(query, kinds).values_list('kind', 'object_id', 'label')[:limit]
+    ]
+
+
+def matching_ids(kind, query):
+    """A subquery of the primary keys of every ``kind`` object matching ``query``"""
+    return matches(query, [kind]).order_by().values('object_id')
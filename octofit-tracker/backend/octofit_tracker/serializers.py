@@ -1,10 +1,73 @@
+from django.conf import settings
 from rest_framework import serializers
+from rest_framework.utils import model_meta
+from . import scoring
 from .models import User, Team, Activity, Leaderboard, Workout
 
 
-class UserSerializer(serializers.ModelSerializer):
+class NaturalKeyRelatedField(serializers.SlugRelatedField):
+    """SlugRelatedField that first looks in ``context['preloaded'][slug_field]``"""
+
+    def to_internal_value(self, data):
+        preloaded = self.context.get('preloaded', {}).get(self.slug_field)
+        if preloaded and isinstance(data, str) and data in preloaded:
+            return preloaded[data]
+        return super().to_internal_value(data)
+
+
+class UpdateFieldsMixin:
+    """
+    Save only the submitted columns on update.
+
+    A full ``save()`` would write back every column as read, silently undoing
+    counters such as ``total_points`` that were changed concurrently.
+    """
+
+    def update(self, instance, validated_data):
+        info = model_meta.get_field_info(instance)
+        many = {}
+        changed = []
+        for attr, value in validated_data.items():
+            if attr in info.relations and info.relations[attr].to_many:
+                many[attr] = value
+            else:
+                setattr(instance, attr, value)
+                changed.append(attr)
+        if changed:
+            changed += [
+                field.name for field in instance._meta.concrete_fields
+                if getattr(field, 'auto_now', False) and field.name not in changed
+            ]
+            instance.save(update_fields=changed)
+        for attr, value in many.items():
+            getattr(instance, attr).set(value)
+        return instance
+
+
+class FixedNaturalKeyMixin:
+    """
+    Reject updates that change ``natural_key``.
+
+    Activities, entries and rosters refer to the row by this value, so a
+    rename would leave them pointing at nothing.
+    """
+    natural_key = None
+
+    def validate(self, attrs):
+        attrs = super().validate(attrs)
+        value = attrs.get(self.natural_key)
+        if self.instance is not None and value is not None and value != getattr(self.instance, self.natural_key):
+            raise serializers.ValidationError({self.natural_key: 'This field cannot be changed.'})
+        return attrs
+
+
+class UserSerializer(FixedNaturalKeyMixin, UpdateFieldsMixin, serializers.ModelSerializer):
     """Serializer for User model"""
+    natural_key = 'username'
     id = serializers.CharField(read_only=True)
+    team = NaturalKeyRelatedField(
+        slug_field='name', queryset=Team.objects.all(), allow_null=True, required=False,
+    )
     
     class Meta:
         model = User
@@ -22,60 +85,84 @@ class UserSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Convert ObjectId to string"""
         representation = super().to_representation(instance)
-        if hasattr(instance, 'id'):
+        if 'id' in representation:
             representation['id'] = str(instance.id)
         return representation
 
 
-class TeamSerializer(serializers.ModelSerializer):
+class TeamSerializer(FixedNaturalKeyMixin, UpdateFieldsMixin, serializers.ModelSerializer):
     """Serializer for Team model"""
+    natural_key = 'name'
     id = serializers.CharField(read_only=True)
+    members = NaturalKeyRelatedField(
+        many=True, slug_field='username', queryset=User.objects.all(), required=False,
+    )
     
     class Meta:
         model = Team
-        fields = ['id', 'name', 'description', 'captain', 'members', 'total_points', 'created_at']
+        fields = ['id', 'name', 'description', 'captain', 'members', 'total_points', 'total_activities',
+                  'member_count', 'created_at']
+        read_only_fields = ['total_points', 'total_activities', 'member_count']
 
     def to_representation(self, instance):
         """Convert ObjectId to string"""
         representation = super().to_representation(instance)
-        if hasattr(instance, 'id'):
+        if 'id' in representation:
             representation['id'] = str(instance.id)
         return representation
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     """Serializer for Activity model"""
     id = serializers.CharField(read_only=True)
+    user = NaturalKeyRelatedField(slug_field='username', queryset=User.objects.all())
     
     class Meta:
         model = Activity
-        fields = ['id', 'user', 'activity_type', 'duration', 'distance', 'calories', 'points', 'date', 'notes', 'created_at']
+        fields = ['id', 'user', 'activity_type', 'duration', 'distance', 'calories', 'points', 'score_version',
+                  'date', 'notes', 'created_at']
+        read_only_fields = ['points', 'score_version']
+
+    def validate(self, attrs):
+        """Score the activity server-side; client-supplied points are ignored"""
+        inputs = {field: attrs[field] if field in attrs else getattr(self.instance, field, 0.0)
+                  for field in ('activity_type', 'duration', 'distance')}
+        if self.instance is None or any(field in attrs for field in inputs):
+            attrs['points'] = scoring.score(**inputs)
+            attrs['score_version'] = settings.OCTOFIT_SCORING_VERSION
+        return attrs
 
     def to_representation(self, instance):
         """Convert ObjectId to string"""
         representation = super().to_representation(instance)
-        if hasattr(instance, 'id'):
+        if 'id' in representation:
             representation['id'] = str(instance.id)
         return representation
 
 
-class LeaderboardSerializer(serializers.ModelSerializer):
+class LeaderboardSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     """Serializer for Leaderboard model"""
     id = serializers.CharField(read_only=True)
+    user = NaturalKeyRelatedField(slug_field='username', queryset=User.objects.all())
+    team = NaturalKeyRelatedField(
+        slug_field='name', queryset=Team.objects.all(), allow_null=True, required=False,
+    )
     
     class Meta:
         model = Leaderboard
-        fields = ['id', 'user', 'team', 'total_points', 'total_activities', 'rank', 'last_updated']
+        fields = ['id', 'user', 'team', 'total_points', 'total_activities', 'rank', 'team_rank', 'last_updated']
+        # Maintained by ``aggregation``; writing them would break the dense ranking.
+        read_only_fields = ['total_points', 'total_activities', 'rank', 'team_rank']
 
     def to_representation(self, instance):
         """Convert ObjectId to string"""
         representation = super().to_representation(instance)
-        if hasattr(instance, 'id'):
+        if 'id' in representation:
             representation['id'] = str(instance.id)
         return representation
 
 
-class WorkoutSerializer(serializers.ModelSerializer):
+class WorkoutSerializer(UpdateFieldsMixin, serializers.ModelSerializer):
     """Serializer for Workout model"""
     id = serializers.CharField(read_only=True)
     
@@ -86,6 +173,6 @@ class WorkoutSerializer(serializers.ModelSerializer):
     def to_representation(self, instance):
         """Convert ObjectId to string"""
         representation = super().to_representation(instance)
-        if hasattr(instance, 'id'):
+        if 'id' in representation:
             representation['id'] = str(instance.id)
         return representation
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.1/ref/settings/
 """
 
 from pathlib import Path
+import importlib.util
 import os
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -52,6 +53,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'octofit_tracker.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -97,6 +99,9 @@ DATABASES = {
     }
 }
 
+# Runs SQLite test databases from a file so the concurrency tests are not skipped
+TEST_RUNNER = 'octofit_tracker.test_runner.OctofitTestRunner'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -139,6 +144,86 @@ STATIC_URL = 'static/'
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Version counters live in the database, so a per-process cache stays correct;
+# point OCTOFIT_RESPONSE_CACHE_ALIAS at a shared backend (Redis, Memcached) to
+# share cached responses between processes as well.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'octofit',
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+
+OCTOFIT_RESPONSE_CACHE_ENABLED = os.environ.get('OCTOFIT_RESPONSE_CACHE_ENABLED', '1') == '1'
+OCTOFIT_RESPONSE_CACHE_ALIAS = 'default'
+OCTOFIT_RESPONSE_CACHE_TTL = int(os.environ.get('OCTOFIT_RESPONSE_CACHE_TTL', 60))
+
+# Django REST Framework
+REST_FRAMEWORK = {
+    'DEFAULT_PAGINATION_CLASS': 'octofit_tracker.pagination.KeysetPagination',
+    'PAGE_SIZE': 50,
+    'DEFAULT_RENDERER_CLASSES': [
+        'octofit_tracker.fastpath.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+# Workouts kept per user by refresh_recommendations, and the days of activity they are based on
+OCTOFIT_RECOMMENDATION_COUNT = int(os.environ.get('OCTOFIT_RECOMMENDATION_COUNT', 5))
+OCTOFIT_RECOMMENDATION_WINDOW_DAYS = int(os.environ.get('OCTOFIT_RECOMMENDATION_WINDOW_DAYS', 28))
+
+# Offer MessagePack (Accept: application/msgpack or ?format=msgpack) when msgpack is installed
+if importlib.util.find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].insert(1, 'octofit_tracker.renderers.MessagePackRenderer')
+
+# Build list responses from values() rows instead of per-object serializers
+OCTOFIT_FAST_SERIALIZATION = os.environ.get('OCTOFIT_FAST_SERIALIZATION', '1') == '1'
+
+# Upper bound for ?page_size= and ?limit= on list endpoints
+OCTOFIT_MAX_PAGE_SIZE = int(os.environ.get('OCTOFIT_MAX_PAGE_SIZE', 500))
+
+# Fraction of requests timed by RequestMetricsMiddleware (0 disables it)
+OCTOFIT_METRICS_SAMPLE_RATE = float(os.environ.get('OCTOFIT_METRICS_SAMPLE_RATE', 0.1))
+
+# Batch ingestion (POST /api/activities/bulk/)
+OCTOFIT_BULK_MAX_ITEMS = int(os.environ.get('OCTOFIT_BULK_MAX_ITEMS', 1000))
+OCTOFIT_BULK_BATCH_SIZE = int(os.environ.get('OCTOFIT_BULK_BATCH_SIZE', 200))
+
+# Rows fetched and encoded per step by GET /api/activities/export/
+OCTOFIT_EXPORT_CHUNK_SIZE = int(os.environ.get('OCTOFIT_EXPORT_CHUNK_SIZE', 2000))
+
+# Live leaderboard streams: seconds of changes coalesced into one frame, and the
+# backend that carries changes between processes (use
+# 'octofit_tracker.live.RedisBackend' with OCTOFIT_LIVE_REDIS_URL for several nodes)
+OCTOFIT_LIVE_TICK = float(os.environ.get('OCTOFIT_LIVE_TICK', 1.0))
+OCTOFIT_LIVE_BACKEND = os.environ.get('OCTOFIT_LIVE_BACKEND', 'octofit_tracker.live.LocalBackend')
+OCTOFIT_LIVE_REDIS_URL = os.environ.get('OCTOFIT_LIVE_REDIS_URL', 'redis://localhost:6379/0')
+
+# Send ETag/Last-Modified on cacheable GETs and answer matching revalidations with 304
+OCTOFIT_CONDITIONAL_GET_ENABLED = os.environ.get('OCTOFIT_CONDITIONAL_GET_ENABLED', '1') == '1'
+
+# Write-behind ingestion: POST /api/activities/ answers 202 and queues the activity in
+# a local SQLite file until the drain_activity_queue worker stores it in batches
+OCTOFIT_INGEST_QUEUE_ENABLED = os.environ.get('OCTOFIT_INGEST_QUEUE_ENABLED', '0') == '1'
+OCTOFIT_INGEST_QUEUE_PATH = os.environ.get('OCTOFIT_INGEST_QUEUE_PATH', str(BASE_DIR / 'activity_queue.sqlite3'))
+OCTOFIT_INGEST_QUEUE_MAX_PENDING = int(os.environ.get('OCTOFIT_INGEST_QUEUE_MAX_PENDING', 10000))
+OCTOFIT_INGEST_BATCH_SIZE = int(os.environ.get('OCTOFIT_INGEST_BATCH_SIZE', 500))
+# Seconds a drain worker holds its batch before another worker may take it over
+OCTOFIT_INGEST_CLAIM_SECONDS = float(os.environ.get('OCTOFIT_INGEST_CLAIM_SECONDS', 60))
+
+# Rule set in octofit_tracker.scoring.RULES used to score new activities (run
+# manage.py rescore after changing it)
+OCTOFIT_SCORING_VERSION = int(os.environ.get('OCTOFIT_SCORING_VERSION', 1))
+
+# Start of the current season for ?window=season (ISO date; defaults to the
+# first day of the quarter), and how long snapshot_leaderboard keeps snapshots
+OCTOFIT_SEASON_START = os.environ.get('OCTOFIT_SEASON_START', '')
+OCTOFIT_SNAPSHOT_RETENTION_DAYS = int(os.environ.get('OCTOFIT_SNAPSHOT_RETENTION_DAYS', 400))
+
 # CORS Configuration
 CORS_ALLOW_ALL_ORIGINS = True
 CORS_ALLOW_METHODS = [
@@ -160,3 +245,9 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+CORS_EXPOSE_HEADERS = [
+    'etag',
+    'last-modified',
+    'location',
+    'retry-after',
+]
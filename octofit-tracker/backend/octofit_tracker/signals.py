@@ -0,0 +1,107 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import search
+from .aggregation import apply_membership_change, apply_team_change, recount_members, remove_team, remove_user
+from .models import Activity, Leaderboard, Team, TeamMembership, User, Workout
+from .versions import bump_on_commit, user_activity_namespace
+
+
+@receiver([post_save, post_delete], sender=Activity)
+def activity_changed(sender, instance, **kwargs):
+    """Activities feed the leaderboard, so both collections change"""
+    bump_on_commit('activity', 'leaderboard', user_activity_namespace(instance.user_id))
+
+
+@receiver([post_save, post_delete], sender=Leaderboard)
+def leaderboard_changed(sender, instance, **kwargs):
+    bump_on_commit('leaderboard')
+
+
+@receiver([post_save, post_delete], sender=Team)
+def team_changed(sender, instance, **kwargs):
+    bump_on_commit('team')
+
+
+@receiver(post_save, sender=TeamMembership)
+def member_added(sender, instance, created, **kwargs):
+    """Team payloads include the roster and member count"""
+    if created:
+        apply_membership_change(instance.team_id, 1)
+    bump_on_commit('team')
+
+
+@receiver(post_delete, sender=TeamMembership)
+def member_removed(sender, instance, **kwargs):
+    apply_membership_change(instance.team_id, -1)
+    bump_on_commit('team')
+
+
+@receiver(m2m_changed, sender=Team.members.through)
+def roster_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """``Team.members`` writes bypass the membership signals, so recount the teams involved"""
+    if action == 'pre_clear' and reverse:
+        instance._cleared_teams = list(instance.memberships.values_list('team', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        teams = [instance.name]
+    elif action == 'post_clear':
+        teams = instance.__dict__.pop('_cleared_teams', [])
+    else:
+        teams = Team.objects.filter(pk__in=pk_set).values_list('name', flat=True)
+    counts = recount_members(teams)
+    if not reverse:
+        instance.member_count = counts[instance.name]
+    bump_on_commit('team')
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, update_fields=None, **kwargs):
+    """Standings and team rollups follow the user's current team"""
+    if update_fields is not None and 'team' not in update_fields:
+        return
+    # Team standings count members by User.team.
+    bump_on_commit('team')
+    if not created:
+        apply_team_change(instance.username, instance.team_id)
+
+
+@receiver(pre_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    """The cascade removes activities and the entry without touching ranks or totals"""
+    remove_user(instance.username)
+    bump_on_commit('team')
+
+
+@receiver(pre_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    """``SET_NULL`` detaches entries without re-ranking them, so move them first"""
+    remove_team(instance.name)
+
+
+@receiver([post_save, post_delete], sender=Workout)
+def workout_changed(sender, instance, **kwargs):
+    bump_on_commit('workout')
+
+
+SEARCH_KINDS = {User: 'user', Team: 'team', Workout: 'workout'}
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Team)
+@receiver(post_save, sender=Workout)
+def reindex(sender, instance, update_fields=None, **kwargs):
+    """Rewrite the search terms of a saved object unless no searchable field changed"""
+    kind = SEARCH_KINDS[sender]
+    fields = {search.LABELS[kind], *search.SOURCES[kind][1]}
+    if update_fields is not None and fields.isdisjoint(update_fields):
+        return
+    search.index_object(kind, instance)
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Team)
+@receiver(post_delete, sender=Workout)
+def unindex(sender, instance, **kwargs):
+    search.remove_object(SEARCH_KINDS[sender], instance.pk)
@@ -0,0 +1,165 @@
+"""
+Leaderboard history.
+
+``take_snapshot`` (run periodically by ``snapshot_leaderboard``) stores the
+whole ranking as ``LeaderboardSnapshotChunk`` rows of ``CHUNK_SIZE``
+consecutive ranks: usernames in rank order and their points, so a rank is a
+position in a list. The same entries are also stored in username order as
+``LeaderboardSnapshotUserChunk`` rows of ``USER_CHUNK_SIZE``, so one user's
+rank is found by decoding a single small row. Chunking keeps every row far
+below document size limits however many users there are.
+
+Rank movement over a period is a diff of two snapshots rather than two
+recomputations: the top of the newer ranking, looked up by username in the
+older one. Snapshots never change once taken, so the top entries and the
+index boundaries are cached per process; both are small. Time-windowed
+standings come from the rollups instead (see ``rollups.window_totals``).
+"""
+import functools
+import re
+from bisect import bisect_right
+from itertools import islice
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import Leaderboard, LeaderboardSnapshot, LeaderboardSnapshotChunk, LeaderboardSnapshotUserChunk
+from .versions import bump_on_commit
+
+# Entries per chunk row; 10,000 usernames of up to 150 characters stay under 2MB.
+CHUNK_SIZE = 10000
+# Entries per username index row; small, since a user lookup decodes one row.
+USER_CHUNK_SIZE = 1000
+
+_DAYS = re.compile(r'^(\d+)d$')
+
+
+def parse_window(window, today=None):
+    """``(start, end)`` dates of ``'<n>d'`` (the last n days, today included) or ``'season'``"""
+    today = today or timezone.localdate()
+    if window == 'season':
+        return season_start(today), today
+    match = _DAYS.match(window or '')
+    if not match or not 1 <= int(match.group(1)) <= 366:
+        raise ValueError("window must be 'season' or a number of days from 1d to 366d")
+    return today - timedelta(days=int(match.group(1)) - 1), today
+
+
+def season_start(today):
+    """``OCTOFIT_SEASON_START``, or the first day of the current quarter"""
+    configured = parse_date(settings.OCTOFIT_SEASON_START) if settings.OCTOFIT_SEASON_START else None
+    if configured and configured <= today:
+        return configured
+    return date(today.year, (today.month - 1) // 3 * 3 + 1, 1)
+
+
+def take_snapshot(now=None):
+    """Record the current ranking and drop snapshots past the retention period"""
+    now = now or timezone.now()
+    rows = Leaderboard.objects.order_by('rank', 'user_id').values_list('user_id', 'total_points')
+    # (user, rank, points) of every entry, sorted by user for the index once all ranks are read.
+    entries = []
+    with transaction.atomic():
+        snapshot = LeaderboardSnapshot.objects.create(taken_at=now)
+        rows = rows.iterator(chunk_size=CHUNK_SIZE)
+        while True:
+            chunk = list(islice(rows, CHUNK_SIZE))
+            if not chunk:
+                break
+            LeaderboardSnapshotChunk.objects.create(
+                snapshot=snapshot, first_rank=snapshot.entries + 1,
+                users=[user for user, _ in chunk], points=[points for _, points in chunk],
+            )
+            entries.extend((user, snapshot.entries + offset, points) for offset, (user, points) in enumerate(chunk, 1))
+            snapshot.entries += len(chunk)
+        snapshot.save(update_fields=['entries'])
+        entries.sort()
+        for start in range(0, len(entries), USER_CHUNK_SIZE):
+            part = entries[start:start + USER_CHUNK_SIZE]
+            LeaderboardSnapshotUserChunk.objects.create(
+                snapshot=snapshot, first_user=part[0][0], users=[user for user, _, _ in part],
+                ranks=[rank for _, rank, _ in part], points=[points for _, _, points in part],
+            )
+        cutoff = now - timedelta(days=settings.OCTOFIT_SNAPSHOT_RETENTION_DAYS)
+        LeaderboardSnapshot.objects.filter(taken_at__lt=cutoff).delete()
+        bump_on_commit('snapshot')
+    return snapshot
+
+
+@functools.lru_cache(maxsize=32)
+def _top(snapshot_id, limit):
+    """``(user, points)`` of the ``limit`` best ranked entries of a snapshot"""
+    top = []
+    chunks = LeaderboardSnapshotChunk.objects.filter(snapshot=snapshot_id, first_rank__lte=limit)
+    for users, points in chunks.order_by('first_rank').values_list('users', 'points'):
+        top.extend(zip(users, points))
+    return top[:limit]
+
+
+@functools.lru_cache(maxsize=32)
+def _user_chunk_starts(snapshot_id):
+    """Sorted ``first_user`` of every username index row of a snapshot"""
+    return sorted(LeaderboardSnapshotUserChunk.objects.filter(snapshot=snapshot_id).values_list('first_user', flat=True))
+
+
+def lookup(snapshot_id, usernames):
+    """``{user: (rank, points)}`` for those of ``usernames`` in a snapshot, reading only their index rows"""
+    starts = _user_chunk_starts(snapshot_id)
+    positions = (bisect_right(starts, user) for user in usernames)
+    rows = {starts[position - 1] for position in positions if position}
+    if not rows:
+        return {}
+    wanted = set(usernames)
+    found = {}
+    chunks = LeaderboardSnapshotUserChunk.objects.filter(snapshot=snapshot_id, first_user__in=rows)
+    for users, ranks, points in chunks.values_list('users', 'ranks', 'points'):
+        for user, rank, user_points in zip(users, ranks, points):
+            if user in wanted:
+                found[user] = (rank, user_points)
+    return found
+
+
+def clear_cache():
+    """Forget the cached snapshot lookups (snapshot ids can be reused after a rollback)"""
+    _top.cache_clear()
+    _user_chunk_starts.cache_clear()
+
+
+def movement(days=7, limit=10, user=None):
+    """
+    Rank changes between the newest snapshot and the newest one at least ``days`` older.
+
+    Returns ``None`` without two such snapshots; otherwise a dict with both
+    timestamps and ``entries`` for the top ``limit`` users (or just ``user``).
+    """
+    latest = LeaderboardSnapshot.objects.order_by('-taken_at').values_list('pk', 'taken_at').first()
+    if latest is None:
+        return None
+    previous = LeaderboardSnapshot.objects.filter(
+        taken_at__lte=latest[1] - timedelta(days=days),
+    ).order_by('-taken_at').values_list('pk', 'taken_at').first()
+    if previous is None:
+        return None
+
+    if user is not None:
+        current = lookup(latest[0], [user])
+        selected = [(user, *current[user])] if user in current else []
+    else:
+        selected = [(username, rank, points) for rank, (username, points) in enumerate(_top(latest[0], limit), 1)]
+    previous_entries = lookup(previous[0], [username for username, _, _ in selected])
+
+    entries = []
+    for username, rank, points in selected:
+        before, previous_points = previous_entries.get(username, (None, 0))
+        entries.append({
+            'user': username,
+            'rank': rank,
+            'total_points': points,
+            'previous_rank': before,
+            'change': before - rank if before is not None else None,
+            'points_gained': points - previous_points,
+        })
+    return {'from': previous[1], 'to': latest[1], 'entries': entries}
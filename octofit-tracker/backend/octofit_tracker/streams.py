@@ -0,0 +1,122 @@
+"""
+Server-sent event streams, served as a raw ASGI application.
+
+Django 4.1 cannot stream from an async iterator, so ``LiveRouter`` answers
+stream paths itself and passes every other request to Django. Streams are
+only available when the project runs under an ASGI server.
+
+``GET /api/live/leaderboard/?limit=N`` starts with a ``snapshot`` event
+holding the top ``N`` entries, followed by ``update`` events carrying the
+entries whose points changed since the previous tick (``delta`` is the change
+in points). Clients upsert entries by ``user`` and order them by
+``(-total_points, user)``; a fresh ``snapshot`` replaces all state.
+"""
+import asyncio
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+from .live import RESYNC, encode_event, get_broadcaster
+from .models import Leaderboard
+
+LEADERBOARD_PATH = '/api/live/leaderboard/'
+
+# Seconds of silence after which a comment line keeps proxies from closing the stream.
+HEARTBEAT = 15
+
+HEADERS = [
+    (b'content-type', b'text/event-stream'),
+    (b'cache-control', b'no-cache'),
+    (b'x-accel-buffering', b'no'),
+    (b'access-control-allow-origin', b'*'),
+]
+
+
+class LiveRouter:
+    """Serve stream paths directly and everything else through ``application``"""
+
+    def __init__(self, application):
+        self.application = application
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['path'] == LEADERBOARD_PATH:
+            return await leaderboard_stream(scope, receive, send)
+        return await self.application(scope, receive, send)
+
+
+def top_entries(limit):
+    """The top ``limit`` leaderboard rows in their streamed form"""
+    rows = Leaderboard.objects.order_by('-total_points', 'user_id').values_list(
+        'user_id', 'team_id', 'total_points', 'total_activities', 'rank', 'team_rank',
+    )[:limit]
+    fields = ('user', 'team', 'total_points', 'total_activities', 'rank', 'team_rank')
+    return [dict(zip(fields, row)) for row in rows]
+
+
+@sync_to_async
+def read_top_entries(limit):
+    # Streams bypass Django's handler, so do its connection housekeeping here.
+    close_old_connections()
+    try:
+        return top_entries(limit)
+    finally:
+        close_old_connections()
+
+
+async def snapshot_frame(broadcaster, limit):
+    # Read the sequence first: later updates may repeat what the snapshot shows, never miss it.
+    sequence = broadcaster.sequence
+    entries = await read_top_entries(limit)
+    return encode_event('snapshot', {'entries': entries}, sequence)
+
+
+async def leaderboard_stream(scope, receive, send):
+    """Stream leaderboard snapshots and updates until the client disconnects"""
+    if scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+    limit = _limit(scope)
+    broadcaster = get_broadcaster()
+    subscription = broadcaster.subscribe()
+    disconnected = asyncio.ensure_future(_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': HEADERS})
+        await _send(send, await snapshot_frame(broadcaster, limit))
+        while True:
+            frame = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait({frame, disconnected}, timeout=HEARTBEAT, return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                frame.cancel()
+                break
+            if frame in done:
+                body = frame.result()
+                if body is RESYNC:
+                    body = await snapshot_frame(broadcaster, limit)
+            else:
+                frame.cancel()
+                body = b': keepalive\n\n'
+            await _send(send, body)
+    finally:
+        broadcaster.unsubscribe(subscription)
+        disconnected.cancel()
+
+
+async def _send(send, body):
+    await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+
+
+async def _disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def _limit(scope):
+    query = parse_qs(scope.get('query_string', b'').decode('latin-1'))
+    try:
+        limit = int(query['limit'][0])
+    except (KeyError, ValueError):
+        limit = 10
+    return max(1, min(limit, settings.OCTOFIT_MAX_PAGE_SIZE))
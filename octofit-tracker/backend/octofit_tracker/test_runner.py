@@ -0,0 +1,26 @@
+"""
+Test runner for the project.
+
+Django gives SQLite test databases an in-memory name unless ``TEST['NAME']``
+is set, and an in-memory database cannot host the concurrent writers of
+``ConcurrentCounterTest``. The runner points such databases at a temporary
+file instead; Django removes the file when the run ends.
+"""
+import os
+import tempfile
+
+from django.db import connections
+from django.test.runner import DiscoverRunner
+
+
+class OctofitTestRunner(DiscoverRunner):
+    """``DiscoverRunner`` with file-backed SQLite test databases"""
+
+    def setup_databases(self, **kwargs):
+        for alias in connections:
+            connection = connections[alias]
+            test_settings = connection.settings_dict.setdefault('TEST', {})
+            if connection.vendor == 'sqlite' and not test_settings.get('NAME'):
+                test_settings['NAME'] = os.path.join(tempfile.gettempdir(),
+                                                     f'octofit_test_{alias}_{os.getpid()}.sqlite3')
+        return super().setup_databases(**kwargs)
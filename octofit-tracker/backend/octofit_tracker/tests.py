@@ -1,8 +1,37 @@
-from django.test import TestCase
-from rest_framework.test import APITestCase
+import asyncio
+import base64
+import threading
+import time
+from unittest import mock, skipUnless
+from asgiref.sync import sync_to_async
+from django.db import IntegrityError, OperationalError, connection
+from django.db.models import F
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient, APITestCase
 from rest_framework import status
-from datetime import datetime
-from .models import User, Team, Activity, Leaderboard, Workout
+import csv
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta
+from io import StringIO
+from django.core.management import CommandError, call_command
+from django.utils import timezone
+from .benchmarks import runner as benchmark_runner
+from .benchmarks.endpoints import LOAD_TEST_ENDPOINTS, Endpoint, discover_endpoints
+from . import aggregation, ingest, live, rollups, scoring, search, snapshots
+from .serializers import TeamSerializer
+from .streams import LiveRouter
+from .renderers import msgpack
+from .models import (
+    User, Team, TeamMembership, Activity, ActivityRollup, Leaderboard, Workout, WorkoutRecommendation, SearchTerm,
+    CollectionVersion, LeaderboardSnapshot,
+)
+from .recommendations import refresh_recommendations
+from .middleware import registry as metrics_registry
+from .response_cache import stats as response_cache_stats
+from .versions import get_cache
 
 
 class UserModelTest(TestCase):
@@ -10,19 +39,20 @@ class UserModelTest(TestCase):
     
     def setUp(self):
         """Set up test data"""
+        Team.objects.create(name='Team Alpha', captain='testuser')
         self.user = User.objects.create(
             email='test@example.com',
             username='testuser',
             password='testpass123',
             full_name='Test User',
-            team='Team Alpha'
+            team_id='Team Alpha'
         )
     
     def test_user_creation(self):
         """Test that a user can be created"""
         self.assertEqual(self.user.username, 'testuser')
         self.assertEqual(self.user.email, 'test@example.com')
-        self.assertEqual(self.user.team, 'Team Alpha')
+        self.assertEqual(self.user.team.name, 'Team Alpha')
     
     def test_user_str(self):
         """Test the string representation of user"""
@@ -38,15 +68,19 @@ class TeamModelTest(TestCase):
             name='Team Alpha',
             description='Test team',
             captain='testuser',
-            members=['user1', 'user2'],
             total_points=100
         )
+        for username in ('user1', 'user2'):
+            user = User.objects.create(email=f'{username}@example.com', username=username, password='x',
+                                       full_name=username)
+            self.team.members.add(user)
     
     def test_team_creation(self):
         """Test that a team can be created"""
         self.assertEqual(self.team.name, 'Team Alpha')
         self.assertEqual(self.team.captain, 'testuser')
         self.assertEqual(self.team.total_points, 100)
+        self.assertEqual(sorted(self.team.members.values_list('username', flat=True)), ['user1', 'user2'])
     
     def test_team_str(self):
         """Test the string representation of team"""
@@ -58,8 +92,9 @@ class ActivityModelTest(TestCase):
     
     def setUp(self):
         """Set up test data"""
+        User.objects.create(email='test@example.com', username='testuser', password='x', full_name='Test User')
         self.activity = Activity.objects.create(
-            user='testuser',
+            user_id='testuser',
             activity_type='Running',
             duration=30,
             distance=5.0,
@@ -71,7 +106,7 @@ class ActivityModelTest(TestCase):
     
     def test_activity_creation(self):
         """Test that an activity can be created"""
-        self.assertEqual(self.activity.user, 'testuser')
+        self.assertEqual(self.activity.user.username, 'testuser')
         self.assertEqual(self.activity.activity_type, 'Running')
         self.assertEqual(self.activity.duration, 30)
         self.assertEqual(self.activity.distance, 5.0)
@@ -82,9 +117,11 @@ class LeaderboardModelTest(TestCase):
     
     def setUp(self):
         """Set up test data"""
+        Team.objects.create(name='Team Alpha', captain='testuser')
+        User.objects.create(email='test@example.com', username='testuser', password='x', full_name='Test User')
         self.entry = Leaderboard.objects.create(
-            user='testuser',
-            team='Team Alpha',
+            user_id='testuser',
+            team_id='Team Alpha',
             total_points=500,
             total_activities=10,
             rank=1
@@ -92,7 +129,7 @@ class LeaderboardModelTest(TestCase):
     
     def test_leaderboard_creation(self):
         """Test that a leaderboard entry can be created"""
-        self.assertEqual(self.entry.user, 'testuser')
+        self.assertEqual(self.entry.user_id, 'testuser')
         self.assertEqual(self.entry.total_points, 500)
         self.assertEqual(self.entry.rank, 1)
 
@@ -131,7 +168,9 @@ class UserAPITest(APITestCase):
             'full_name': 'API User',
             'team': 'Team Beta'
         }
-        self.user = User.objects.create(**self.user_data)
+        Team.objects.create(name='Team Beta', captain='apiuser')
+        Team.objects.create(name='Team Gamma', captain='newuser')
+        self.user = User.objects.create(**dict(self.user_data, team=Team.objects.get(name='Team Beta')))
     
     def test_get_users_list(self):
         """Test getting list of users"""
@@ -160,10 +199,11 @@ class TeamAPITest(APITestCase):
             'name': 'API Team',
             'description': 'Test team for API',
             'captain': 'apiuser',
-            'members': ['user1', 'user2'],
             'total_points': 200
         }
         self.team = Team.objects.create(**self.team_data)
+        for username in ('user1', 'user2'):
+            User.objects.create(email=f'{username}@example.com', username=username, password='x', full_name=username)
     
     def test_get_teams_list(self):
         """Test getting list of teams"""
@@ -183,9 +223,161 @@ class TeamAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
 
+class ActivityExportAPITest(APITestCase):
+    """Test cases for streaming activity exports"""
+
+    def setUp(self):
+        """Set up test data"""
+        for name in ('eve', 'fox'):
+            User.objects.create(email=f'{name}@example.com', username=name, password='x', full_name=name)
+        for day in range(1, 6):
+            Activity.objects.create(user_id='eve' if day % 2 else 'fox', activity_type='Swim', duration=day,
+                                    distance=day / 3, points=day, notes=f'lap, "{day}"',
+                                    date=timezone.make_aware(datetime(2024, 3, day, 9, 30)))
+
+    def export(self, **params):
+        response = self.client.get('/api/activities/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content).decode()
+
+    def test_ndjson_rows_match_the_api(self):
+        """Test that NDJSON lines equal the list payload, oldest first"""
+        with self.settings(OCTOFIT_EXPORT_CHUNK_SIZE=2):
+            response, body = self.export()
+        self.assertTrue(response['Content-Type'].startswith('application/x-ndjson'))
+        rows = [json.loads(line) for line in body.splitlines()]
+        listed = self.client.get('/api/activities/', {'page_size': 10}).data['results']
+        self.assertEqual(rows, list(reversed(json.loads(json.dumps(listed)))))
+
+    def test_csv_with_filters(self):
+        """Test CSV output and the user/from/to filters"""
+        response, body = self.export(format='csv', user='eve', **{'from': '2024-03-02', 'to': '2024-03-05'})
+        self.assertTrue(response['Content-Type'].startswith('text/csv'))
+        self.assertIn('activities.csv', response['Content-Disposition'])
+        lines = list(csv.DictReader(StringIO(body)))
+        self.assertEqual([line['duration'] for line in lines], ['3', '5'])
+        self.assertEqual(lines[0]['notes'], 'lap, "3"')
+
+    def test_invalid_dates_and_formats(self):
+        """Test that bad filters are rejected and unknown formats are not found"""
+        response = self.client.get('/api/activities/export/', {'from': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn(b'from and to must be dates', response.content)
+        response = self.client.get('/api/activities/export/', {'format': 'xml'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TeamMembershipAPITest(APITestCase):
+    """Test cases for team rosters"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.team = Team.objects.create(name='Team Roster', captain='ann')
+        for username in ('ann', 'ben', 'cat'):
+            User.objects.create(email=f'{username}@example.com', username=username, password='x', full_name=username)
+
+    def test_add_and_remove_member(self):
+        """Test that members are single membership rows"""
+        url = f'/api/teams/{self.team.pk}/'
+        response = self.client.post(url + 'add_member/', {'username': 'ann'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(url + 'add_member/', {'username': 'ann'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(url + 'add_member/', {'username': 'ghost'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(TeamMembership.objects.filter(team=self.team).count(), 1)
+
+        response = self.client.post(url + 'remove_member/', {'username': 'ann'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.post(url + 'remove_member/', {'username': 'ann'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TeamMembership.objects.exists())
+
+    def test_members_are_written_and_listed_by_username(self):
+        """Test that the members field round-trips usernames"""
+        response = self.client.post('/api/teams/', {
+            'name': 'Team New', 'captain': 'ben', 'members': ['ben', 'cat'],
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(response.data['members']), ['ben', 'cat'])
+        response = self.client.post('/api/teams/', {'name': 'Team Bad', 'captain': 'x', 'members': ['ghost']},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_partial_update_keeps_concurrent_points(self):
+        """Test that an update writes only the submitted columns"""
+        stale = Team.objects.get(pk=self.team.pk)
+        Team.objects.filter(pk=self.team.pk).update(total_points=F('total_points') + 40)
+        serializer = TeamSerializer(stale, data={'description': 'Renamed'}, partial=True)
+        self.assertTrue(serializer.is_valid())
+        serializer.save()
+        self.team.refresh_from_db()
+        self.assertEqual((self.team.description, self.team.total_points), ('Renamed', 40))
+
+    def test_team_list_prefetches_rosters(self):
+        """Test that listing teams does not query once per team"""
+        for number in range(5):
+            team = Team.objects.create(name=f'Team {number}', captain='ann')
+            team.members.add(*User.objects.all())
+        self.client.get('/api/teams/')
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/teams/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 6)
+
+
+class TeamStandingsAPITest(APITestCase):
+    """Test cases for the maintained team standings"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        for name in ('Team Owls', 'Team Larks'):
+            Team.objects.create(name=name, captain='')
+        for username in ('ann', 'ben', 'cat'):
+            User.objects.create(email=f'{username}@example.com', username=username, password='x',
+                                full_name=username, team_id='Team Owls' if username != 'cat' else 'Team Larks')
+
+    def standings(self):
+        """Return standings as (team, points, members, activities, average)"""
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/api/teams/standings/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row['name'], row['total_points'], row['member_count'], row['total_activities'],
+                 row['average_points']) for row in response.data]
+
+    def test_standings_follow_activities_and_user_teams(self):
+        """Test that points, activity counts and member counts follow User.team, not the rosters"""
+        owls = Team.objects.get(name='Team Owls')
+        with self.captureOnCommitCallbacks(execute=True):
+            # Rosters are kept separately and do not change the standings.
+            response = self.client.patch(f'/api/teams/{Team.objects.get(name="Team Larks").pk}/',
+                                         {'members': ['cat', 'ann']}, format='json')
+            self.assertEqual(response.data['member_count'], 2)
+            for username, points in [('ann', 30), ('ben', 15), ('cat', 20), ('ann', 5)]:
+                self.client.post('/api/activities/', {
+                    'user': username, 'activity_type': 'Yoga', 'duration': points,
+                    'date': timezone.now().isoformat(),
+                })
+        self.assertEqual(self.standings(), [('Team Owls', 50, 2, 3, 25.0), ('Team Larks', 20, 1, 1, 20.0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/users/{User.objects.get(username="ben").pk}/', {'team': 'Team Larks'},
+                              format='json')
+            User.objects.create(email='dot@example.com', username='dot', password='x', full_name='dot',
+                                team_id='Team Larks')
+        self.assertEqual(self.standings(), [('Team Larks', 35, 3, 2, 11.67), ('Team Owls', 35, 1, 2, 35.0)])
+        self.assertEqual(owls.memberships.count(), 0)
+
+
 class ActivityAPITest(APITestCase):
     """Test cases for Activity API endpoints"""
     
+    def setUp(self):
+        """Set up test data"""
+        User.objects.create(email='test@example.com', username='testuser', password='x', full_name='Test User')
+
     def test_get_activities_list(self):
         """Test getting list of activities"""
         response = self.client.get('/api/activities/')
@@ -216,6 +408,151 @@ class LeaderboardAPITest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
 
+class LeaderboardRankAPITest(APITestCase):
+    """Test cases for the rank_of and around leaderboard actions"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        for rank in range(1, 11):
+            username = f'runner_{rank:02d}'
+            User.objects.create(email=f'{username}@example.com', username=username, password='x', full_name=username)
+            Leaderboard.objects.create(user_id=username, total_points=1000 - rank * 10, rank=rank)
+
+    def test_rank_of(self):
+        """Test looking up a single user's rank"""
+        response = self.client.get('/api/leaderboard/rank_of/', {'user': 'runner_04'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['user'], response.data['rank']), ('runner_04', 4))
+        self.assertEqual(self.client.get('/api/leaderboard/rank_of/', {'user': 'nobody'}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/leaderboard/rank_of/').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_top_users_limit(self):
+        """Test that the limit is validated and clamped"""
+        response = self.client.get('/api/leaderboard/top_users/', {'limit': 3})
+        self.assertEqual([entry['user'] for entry in response.data], ['runner_01', 'runner_02', 'runner_03'])
+        self.assertEqual(len(self.client.get('/api/leaderboard/top_users/', {'limit': -1}).data), 1)
+        self.assertEqual(self.client.get('/api/leaderboard/top_users/', {'limit': 'abc'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_leaderboard_is_read_only(self):
+        """Test that entries cannot be created, changed or deleted over the API"""
+        entry = Leaderboard.objects.get(user_id='runner_04')
+        url = f'/api/leaderboard/{entry.pk}/'
+        responses = [
+            self.client.post('/api/leaderboard/', {'user': 'runner_04'}, format='json'),
+            self.client.patch(url, {'total_points': 5000, 'rank': 1, 'team': None}, format='json'),
+            self.client.put(url, {'user': 'runner_04'}, format='json'),
+            self.client.delete(url),
+        ]
+        self.assertEqual({response.status_code for response in responses}, {status.HTTP_405_METHOD_NOT_ALLOWED})
+        entry.refresh_from_db()
+        self.assertEqual((entry.total_points, entry.rank), (960, 4))
+        self.assertEqual(Leaderboard.objects.count(), 10)
+
+    def test_around(self):
+        """Test the neighbourhood of a user, clipped at the top of the board"""
+        response = self.client.get('/api/leaderboard/around/', {'user': 'runner_05', 'window': 2})
+        self.assertEqual([entry['rank'] for entry in response.data], [3, 4, 5, 6, 7])
+        response = self.client.get('/api/leaderboard/around/', {'user': 'runner_01'})
+        self.assertEqual([entry['rank'] for entry in response.data], list(range(1, 7)))
+        response = self.client.get('/api/leaderboard/around/', {'user': 'runner_01', 'window': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class LeaderboardHistoryTest(APITestCase):
+    """Test cases for windowed leaderboards and rank movement"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        snapshots.clear_cache()
+        Team.objects.create(name='Team Now', captain='ada')
+        for username, team in (('ada', 'Team Now'), ('bo', None), ('cy', 'Team Now')):
+            User.objects.create(email=f'{username}@example.com', username=username, password='x',
+                                full_name=username, team_id=team)
+
+    def log(self, username, duration, days_ago):
+        response = self.client.post('/api/activities/', {
+            'user': username, 'activity_type': 'Yoga', 'duration': duration,
+            'date': (timezone.now() - timedelta(days=days_ago)).isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_window_buckets_cover_range(self):
+        """Test that whole months are read from month buckets and the edges from day buckets"""
+        rows = []
+        for day in range(60):
+            moment = date(2024, 1, 10) + timedelta(days=day)
+            rows += [ActivityRollup(dimension='user', key='ada', period='day', bucket_start=moment, points=1)]
+        rows += [ActivityRollup(dimension='user', key='ada', period='month', bucket_start=date(2024, 2, 1), points=29)]
+        ActivityRollup.objects.bulk_create(rows)
+        totals = list(rollups.window_totals(date(2024, 1, 15), date(2024, 3, 3)))
+        self.assertEqual(totals, [{'key': 'ada', 'points': 17 + 29 + 3, 'activities': 0}])
+
+    def test_windowed_leaderboard(self):
+        """Test that ?window= ranks users by points earned within the window"""
+        self.log('ada', 10, 1)
+        self.log('ada', 100, 20)
+        self.log('bo', 30, 2)
+        self.log('cy', 500, 200)
+        response = self.client.get('/api/leaderboard/', {'window': '7d'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(r['rank'], r['user'], r['points']) for r in response.data['results']],
+                         [(1, 'bo', 30), (2, 'ada', 10)])
+        self.assertEqual(response.data['to'], timezone.localdate().isoformat())
+        response = self.client.get('/api/leaderboard/', {'window': '30d', 'team': 'Team Now'})
+        self.assertEqual([(r['user'], r['points'], r['activities']) for r in response.data['results']],
+                         [('ada', 110, 2)])
+        self.assertEqual(self.client.get('/api/leaderboard/', {'window': '2w'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(snapshots.parse_window('season', date(2024, 5, 20)), (date(2024, 4, 1), date(2024, 5, 20)))
+
+    def test_movement_diffs_snapshots(self):
+        """Test that rank movement compares the latest snapshot with an older one"""
+        self.log('ada', 50, 0)
+        self.log('bo', 40, 0)
+        now = timezone.now()
+        snapshots.take_snapshot(now - timedelta(days=8))
+        self.assertEqual(self.client.get('/api/leaderboard/movement/').status_code, status.HTTP_404_NOT_FOUND)
+        self.log('bo', 20, 0)
+        self.log('cy', 5, 0)
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True), mock.patch.object(snapshots, 'CHUNK_SIZE', 2):
+            call_command('snapshot_leaderboard', stdout=out)
+        self.assertIn('Snapshot of 3 entries', out.getvalue())
+        latest = LeaderboardSnapshot.objects.latest('taken_at')
+        self.assertEqual(list(latest.chunks.order_by('first_rank').values_list('first_rank', 'users')),
+                         [(1, ['bo', 'ada']), (3, ['cy'])])
+
+        response = self.client.get('/api/leaderboard/movement/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(e['user'], e['rank'], e['previous_rank'], e['change'], e['points_gained'])
+                          for e in response.data['entries']],
+                         [('bo', 1, 2, 1, 20), ('ada', 2, 1, -1, 0), ('cy', 3, None, None, 5)])
+        response = self.client.get('/api/leaderboard/movement/', {'user': 'ada', 'days': 7})
+        self.assertEqual([e['user'] for e in response.data['entries']], ['ada'])
+        self.assertEqual(self.client.get('/api/leaderboard/movement/', {'days': 9}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_user_movement_reads_only_index_rows(self):
+        """Test that one user's movement is answered from their username index rows, not the rankings"""
+        for username, points in (('ada', 50), ('bo', 40), ('cy', 30)):
+            self.log(username, points, 0)
+        now = timezone.now()
+        with mock.patch.object(snapshots, 'USER_CHUNK_SIZE', 1):
+            snapshots.take_snapshot(now - timedelta(days=8))
+            self.log('cy', 30, 0)
+            snapshots.take_snapshot(now)
+        self.assertEqual(LeaderboardSnapshot.objects.latest('taken_at').user_chunks.count(), 3)
+        with CaptureQueriesContext(connection) as queries:
+            diff = snapshots.movement(user='cy')
+        self.assertEqual([(e['rank'], e['previous_rank'], e['points_gained']) for e in diff['entries']], [(1, 3, 30)])
+        self.assertFalse([query for query in queries if 'leaderboard_snapshot_chunks' in query['sql']])
+        self.assertEqual(snapshots.movement(user='nobody')['entries'], [])
+
+
 class WorkoutAPITest(APITestCase):
     """Test cases for Workout API endpoints"""
     
@@ -237,3 +574,1066 @@ class WorkoutAPITest(APITestCase):
         }
         response = self.client.post('/api/workouts/', workout_data)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+
+class LeaderboardAggregationTest(APITestCase):
+    """Test cases for incremental leaderboard maintenance"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.team = Team.objects.create(name='Team Alpha', captain='alice')
+        User.objects.create(email='alice@example.com', username='alice', password='x', full_name='Alice', team_id='Team Alpha')
+        User.objects.create(email='bob@example.com', username='bob', password='x', full_name='Bob', team_id='Team Alpha')
+
+    def post_activity(self, user, points):
+        """Create an activity through the API"""
+        response = self.client.post('/api/activities/', {
+            'user': user,
+            'activity_type': 'Running',
+            'duration': points,
+            'date': datetime.now().isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data['id']
+
+    def ranks(self):
+        """Return leaderboard as (user, points, activities, rank) ordered by rank"""
+        return list(Leaderboard.objects.order_by('rank').values_list('user', 'total_points', 'total_activities', 'rank'))
+
+    def test_create_updates_leaderboard_and_team(self):
+        """Test that creating activities maintains totals and ranks"""
+        self.post_activity('alice', 50)
+        self.post_activity('bob', 80)
+        self.post_activity('alice', 40)
+        self.assertEqual(self.ranks(), [('alice', 90, 2, 1), ('bob', 80, 1, 2)])
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.total_points, 170)
+
+    def test_update_and_delete_apply_deltas(self):
+        """Test that editing and deleting activities move ranks back"""
+        self.post_activity('alice', 50)
+        activity_id = self.post_activity('bob', 40)
+        response = self.client.patch(f'/api/activities/{activity_id}/', {'duration': 70})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.ranks(), [('bob', 70, 1, 1), ('alice', 50, 1, 2)])
+        response = self.client.delete(f'/api/activities/{activity_id}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.ranks(), [('alice', 50, 1, 1), ('bob', 0, 0, 2)])
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.total_points, 50)
+
+    def test_team_ranks_stay_within_partitions(self):
+        """Test that in-team ranks are maintained per team, including teamless users"""
+        Team.objects.create(name='Team Beta', captain='cleo')
+        User.objects.create(email='cleo@example.com', username='cleo', password='x', full_name='Cleo', team_id='Team Beta')
+        User.objects.create(email='dan@example.com', username='dan', password='x', full_name='Dan')
+        for user, points in [('alice', 30), ('cleo', 60), ('bob', 50), ('dan', 10), ('alice', 40), ('cleo', -55)]:
+            self.post_activity(user, points)
+        standings = Leaderboard.objects.order_by('rank').values_list('user', 'team', 'rank', 'team_rank')
+        self.assertEqual(list(standings), [
+            ('alice', 'Team Alpha', 1, 1), ('bob', 'Team Alpha', 2, 2),
+            ('dan', None, 3, 1), ('cleo', 'Team Beta', 4, 1),
+        ])
+        self.assertEqual(aggregation.rebuild_ranks(), 0)
+        response = self.client.get('/api/leaderboard/rank_of/', {'user': 'bob'})
+        self.assertEqual((response.data['rank'], response.data['team_rank']), (2, 2))
+
+    def test_deleting_users_and_teams_keeps_aggregates_exact(self):
+        """Test that deletes close rank gaps and take totals and rollups with them"""
+        Team.objects.create(name='Team Beta', captain='cleo')
+        for username, team in [('cleo', 'Team Beta'), ('dan', 'Team Alpha')]:
+            User.objects.create(email=f'{username}@example.com', username=username, password='x', full_name=username,
+                                team_id=team)
+        for user, points in [('alice', 30), ('bob', 50), ('cleo', 60), ('dan', 10)]:
+            self.post_activity(user, points)
+
+        response = self.client.delete(f'/api/users/{User.objects.get(username="bob").pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.ranks(), [('cleo', 60, 1, 1), ('alice', 30, 1, 2), ('dan', 10, 1, 3)])
+        self.team.refresh_from_db()
+        self.assertEqual((self.team.total_points, self.team.total_activities), (40, 2))
+        self.assertFalse(ActivityRollup.objects.filter(dimension='user', key='bob').exists())
+        team_points = ActivityRollup.objects.filter(dimension='team', key='Team Alpha', period='day')
+        self.assertEqual(sum(team_points.values_list('points', flat=True)), 40)
+
+        response = self.client.delete(f'/api/teams/{self.team.pk}/')
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        standings = Leaderboard.objects.order_by('rank').values_list('user', 'team', 'rank', 'team_rank')
+        self.assertEqual(list(standings), [('cleo', 'Team Beta', 1, 1), ('alice', None, 2, 1), ('dan', None, 3, 2)])
+        self.assertFalse(ActivityRollup.objects.filter(dimension='team', key='Team Alpha').exists())
+        self.assertEqual(aggregation.rebuild_ranks(), 0)
+
+    def test_usernames_and_team_names_cannot_be_changed(self):
+        """Test that renames are rejected instead of orphaning the rows that refer to them"""
+        self.post_activity('alice', 30)
+        user = User.objects.get(username='alice')
+        response = self.client.patch(f'/api/users/{user.pk}/', {'username': 'alicia'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('username', response.data)
+        response = self.client.patch(f'/api/teams/{self.team.pk}/', {'name': 'Team Omega'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(f'/api/users/{user.pk}/', {'username': 'alice', 'full_name': 'Alice A.'},
+                                     format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Leaderboard.objects.get(user_id='alice').team_id, 'Team Alpha')
+
+
+class ScoringTest(APITestCase):
+    """Test cases for server-side points and rescoring"""
+
+    def setUp(self):
+        """Set up test data"""
+        Team.objects.create(name='Team Score', captain='ada')
+        for username in ('ada', 'bo'):
+            User.objects.create(email=f'{username}@example.com', username=username, password='x',
+                                full_name=username, team_id='Team Score')
+
+    def post_activity(self, user, activity_type, duration, distance):
+        response = self.client.post('/api/activities/', {
+            'user': user, 'activity_type': activity_type, 'duration': duration, 'distance': distance,
+            'points': 1000, 'date': '2024-05-01T07:00:00Z',
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data
+
+    def test_points_are_computed_on_write(self):
+        """Test that client-supplied points are ignored in favour of the current rules"""
+        data = self.post_activity('ada', 'Running', 30, 5.25)
+        self.assertEqual((data['points'], data['score_version']), (82, 1))
+        response = self.client.patch(f"/api/activities/{data['id']}/", {'distance': 0, 'points': 5}, format='json')
+        self.assertEqual(response.data['points'], 30)
+        response = self.client.patch(f"/api/activities/{data['id']}/", {'notes': 'easy'}, format='json')
+        self.assertEqual(response.data['points'], 30)
+        self.assertEqual(Leaderboard.objects.get(user='ada').total_points, 30)
+
+    def test_rescore_rebuilds_totals(self):
+        """Test that a new rule set rewrites history and every total derived from it"""
+        self.post_activity('ada', 'Running', 30, 5.0)
+        self.post_activity('bo', 'Cycling', 40, 20.0)
+        self.post_activity('ada', 'Yoga', 60, 0)
+        Activity.objects.filter(activity_type='Yoga').update(score_version=None)
+        self.assertEqual(list(Leaderboard.objects.order_by('rank').values_list('user', 'total_points')),
+                         [('bo', 240), ('ada', 140)])
+
+        rules = {'*': scoring.Rule(1, 10), 'Cycling': scoring.Rule(1, 2), 'Yoga': scoring.Rule(0.5, 0)}
+        out = StringIO()
+        with mock.patch.dict(scoring.RULES, {2: rules}), self.captureOnCommitCallbacks(execute=True):
+            call_command('rescore', '--scoring-version', '2', '--batch-size', '2', stdout=out)
+        self.assertIn('Rescored 3 activities (3 changed)', out.getvalue())
+        self.assertEqual(sorted(Activity.objects.values_list('activity_type', 'points', 'score_version')),
+                         [('Cycling', 80, 2), ('Running', 80, 2), ('Yoga', 30, 2)])
+        self.assertEqual(list(Leaderboard.objects.order_by('rank').values_list('user', 'total_points', 'rank')),
+                         [('ada', 110, 1), ('bo', 80, 2)])
+        self.assertEqual(Team.objects.get(name='Team Score').total_points, 190)
+        self.assertEqual(ActivityRollup.objects.get(dimension='user', key='ada', period='day').points, 110)
+
+        with mock.patch.dict(scoring.RULES, {2: rules}):
+            self.assertEqual(scoring.rescore(2), (3, 0))
+        with self.assertRaises(CommandError):
+            call_command('rescore', '--scoring-version', '9', stdout=StringIO())
+
+
+class PaginationAPITest(APITestCase):
+    """Test cases for keyset pagination"""
+
+    def setUp(self):
+        """Set up test data"""
+        User.objects.create(email='pager@example.com', username='pager', password='x', full_name='Pager')
+        base = datetime(2024, 1, 1, 12, 0)
+        for i in range(5):
+            Activity.objects.create(user_id='pager', activity_type='Yoga', duration=10, points=i,
+                                    date=base.replace(day=1 + i // 2))
+
+    def test_cursor_walks_every_row_once(self):
+        """Test that following next then previous cursors is stable"""
+        response = self.client.get('/api/activities/by_user/', {'user': 'pager', 'page_size': 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data['previous'])
+        pages = [[a['id'] for a in response.data['results']]]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            pages.append([a['id'] for a in response.data['results']])
+        seen = [activity_id for page in pages for activity_id in page]
+        expected = [str(pk) for pk in Activity.objects.order_by('-date', '-id').values_list('id', flat=True)]
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+
+        response = self.client.get(response.data['previous'])
+        self.assertEqual([a['id'] for a in response.data['results']], pages[1])
+
+    def test_page_size_is_capped(self):
+        """Test that page_size cannot exceed the configured maximum"""
+        with self.settings(OCTOFIT_MAX_PAGE_SIZE=3):
+            response = self.client.get('/api/activities/', {'page_size': 1000})
+        self.assertEqual(len(response.data['results']), 3)
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        response = self.client.get('/api/activities/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_values(self):
+        """Test that well-formed cursors holding values of the wrong type are rejected, not 500s"""
+        def cursor(values):
+            return base64.urlsafe_b64encode(json.dumps({'v': values, 'r': False}).encode()).decode()
+
+        tampered = [
+            ('/api/activities/', [{'a': 1}, 1]),
+            ('/api/activities/', ['notadate', 1]),
+            ('/api/activities/', [None, 1]),
+            ('/api/activities/', ['2024-01-01T12:00:00+00:00', 'x']),
+            ('/api/leaderboard/', ['many', 'pager']),
+            ('/api/leaderboard/', [10, None]),
+        ]
+        for url, values in tampered:
+            with self.subTest(url=url, values=values):
+                response = self.client.get(url, {'cursor': cursor(values)})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = self.client.get('/api/activities/', {'cursor': cursor(['2024-01-02T12:00:00+00:00', 10 ** 6])})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class IndexReportCommandTest(TestCase):
+    """Test cases for the index_report management command"""
+
+    def test_every_query_shape_uses_an_index(self):
+        """Test that no viewset query shape needs a full scan"""
+        out = StringIO()
+        call_command('index_report', '--explain', '--fail-on-scan', stdout=out)
+        self.assertIn('Full scans: 0', out.getvalue())
+
+
+class BulkActivityAPITest(APITestCase):
+    """Test cases for batch activity ingestion"""
+
+    def setUp(self):
+        """Set up test data"""
+        self.team = Team.objects.create(name='Team Sync', captain='walker')
+        User.objects.create(email='walker@example.com', username='walker', password='x', full_name='Walker', team_id='Team Sync')
+
+    def activity(self, points):
+        """Build an activity payload"""
+        return {'user': 'walker', 'activity_type': 'Walking', 'duration': points,
+                'date': '2024-05-01T07:00:00Z'}
+
+    def test_bulk_json_array(self):
+        """Test that a JSON array is inserted and aggregated once"""
+        response = self.client.post('/api/activities/bulk/', [self.activity(10), self.activity(15)], format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(Activity.objects.filter(user='walker').count(), 2)
+        entry = Leaderboard.objects.get(user='walker')
+        self.assertEqual((entry.total_points, entry.total_activities, entry.rank), (25, 2, 1))
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.total_points, 25)
+
+    def test_bulk_ndjson_partial_failure(self):
+        """Test per-item results when some NDJSON lines are invalid"""
+        invalid = dict(self.activity(5), duration='long')
+        body = '\n'.join(json.dumps(item) for item in [self.activity(10), invalid, self.activity(7)])
+        response = self.client.post('/api/activities/bulk/', body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'invalid', 'created'])
+        self.assertIn('duration', response.data['results'][1]['errors'])
+        self.assertEqual(Leaderboard.objects.get(user='walker').total_points, 17)
+
+    def test_bulk_non_string_users_are_item_errors(self):
+        """Test that unhashable or non-string user values fail only their own item"""
+        items = [self.activity(10), dict(self.activity(5), user=['walker']), dict(self.activity(5), user={'a': 1}),
+                 'not an object']
+        response = self.client.post('/api/activities/bulk/', items, format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('user', response.data['results'][1]['errors'])
+
+
+class IngestQueueTest(APITestCase):
+    """Test cases for write-behind activity ingestion"""
+
+    def setUp(self):
+        """Set up test data"""
+        Team.objects.create(name='Team Sync', captain='walker')
+        User.objects.create(email='walker@example.com', username='walker', password='x', full_name='Walker',
+                            team_id='Team Sync')
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = self.settings(OCTOFIT_INGEST_QUEUE_ENABLED=True, OCTOFIT_INGEST_QUEUE_MAX_PENDING=3,
+                                  OCTOFIT_INGEST_QUEUE_PATH=os.path.join(directory.name, 'queue.sqlite3'))
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+
+    def post(self, points):
+        return self.client.post('/api/activities/', {
+            'user': 'walker', 'activity_type': 'Walking', 'duration': points,
+            'date': '2024-05-01T07:00:00Z',
+        }, format='json')
+
+    def test_post_is_queued_then_drained(self):
+        """Test that POSTs are acknowledged with 202 and stored in one batch by the worker"""
+        response = self.post(10)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.post(15).status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.post('lots').status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Activity.objects.exists())
+        self.assertEqual(self.client.get(response['Location']).data['status'], 'queued')
+        self.assertEqual(self.client.get('/api/activities/ingest/').data['pending'], 2)
+
+        out = StringIO()
+        with CaptureQueriesContext(connection) as queries, self.captureOnCommitCallbacks(execute=True):
+            call_command('drain_activity_queue', '--once', stdout=out, stderr=StringIO())
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "activities"')]
+        self.assertEqual(len(inserts), 1)
+        self.assertIn('Drained 2 queued activities (2 stored)', out.getvalue())
+        entry = Leaderboard.objects.get(user='walker')
+        self.assertEqual((entry.total_points, entry.total_activities, entry.rank), (25, 2, 1))
+        self.assertEqual(Team.objects.get(name='Team Sync').total_points, 25)
+        status_response = self.client.get(response['Location'])
+        self.assertEqual(status_response.data['status'], 'stored')
+        self.assertEqual(Activity.objects.get(pk=status_response.data['id']).points, 10)
+        self.assertEqual(self.client.get('/api/activities/ingest/').data['pending'], 0)
+
+    def test_replay_after_crash_stores_once(self):
+        """Test that a batch committed but not acknowledged is not stored twice"""
+        self.post(10)
+        queue = ingest.get_queue()
+        with mock.patch.object(queue, 'ack', side_effect=RuntimeError('worker killed')):
+            with self.assertRaises(RuntimeError):
+                ingest.drain_batch(queue)
+        self.assertEqual(queue.stats()['pending'], 1)
+        self.assertEqual(ingest.drain_batch(queue), (0, 0))
+        later = time.time() + 120  # past the dead worker's claim
+        with mock.patch.object(ingest, 'time', mock.Mock(time=lambda: later)):
+            self.assertEqual(ingest.drain_batch(queue), (1, 0))
+        self.assertEqual(Activity.objects.count(), 1)
+        self.assertEqual(Leaderboard.objects.get(user='walker').total_points, 10)
+
+    def test_workers_claim_disjoint_batches(self):
+        """Test that concurrent workers neither share entries nor collide on ingest keys"""
+        for points in (1, 2, 3):
+            self.post(points)
+        queue = ingest.get_queue()
+        first = queue.claim(2, lease=60)
+        second = queue.claim(2, lease=60)
+        self.assertEqual((len(first), len(second)), (2, 1))
+        self.assertFalse({key for _, key, _ in first} & {key for _, key, _ in second})
+        self.assertEqual(queue.claim(2, lease=60), [])
+
+    def test_expired_claim_collision_is_retried(self):
+        """Test that keys stored by another worker during our batch are skipped on retry"""
+        for points in (1, 2, 3):
+            self.post(points)
+        store = ingest._store
+        calls = []
+
+        def racing(activities):
+            if not calls:
+                calls.append(activities)
+                store(activities[:1])  # another worker, after our claim expired
+                raise IntegrityError('UNIQUE constraint failed: activities.ingest_key')
+            return store(activities)
+
+        with mock.patch.object(ingest, '_store', side_effect=racing):
+            self.assertEqual(ingest.drain_batch(ingest.get_queue()), (3, 2))
+        self.assertEqual(Activity.objects.count(), 3)
+        self.assertEqual(Leaderboard.objects.get(user='walker').total_points, 6)
+
+    def test_drain_warns_without_shared_live_backend(self):
+        """Test that the worker runs with the default backend but warns that streams miss its changes"""
+        self.post(10)
+        out, err = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('drain_activity_queue', '--once', stdout=out, stderr=err)
+        self.assertIn('OCTOFIT_LIVE_BACKEND is in-process', err.getvalue())
+        self.assertIn('Drained 1 queued activities', out.getvalue())
+
+    def test_status_leaves_a_disabled_queue_alone(self):
+        """Test that reading the status of a disabled queue does not create its file"""
+        with self.settings(OCTOFIT_INGEST_QUEUE_ENABLED=False), \
+                mock.patch.object(ingest, 'get_queue', side_effect=AssertionError('queue opened')):
+            response = self.client.get('/api/activities/ingest/')
+            self.assertEqual(response.data, {'enabled': False})
+            response = self.client.get('/api/activities/ingest/', {'key': 'missing'})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_full_queue_pushes_back(self):
+        """Test that POSTs beyond the pending limit are refused with Retry-After"""
+        for points in (1, 2, 3):
+            self.assertEqual(self.post(points).status_code, status.HTTP_202_ACCEPTED)
+        response = self.post(4)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(ingest.get_queue().stats()['pending'], 3)
+
+
+class ResponseCacheTest(APITestCase):
+    """Test cases for the read-through response cache"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        response_cache_stats.reset()
+        self.workout_data = {
+            'name': 'Plank Ladder', 'description': 'Core work', 'difficulty': 'Beginner',
+            'duration': 15, 'category': 'Strength', 'exercises': ['Plank'],
+        }
+        Workout.objects.create(**self.workout_data)
+
+    def test_hit_and_invalidation_on_write(self):
+        """Test that repeated reads hit and a save invalidates"""
+        url = '/api/workouts/by_difficulty/'
+        first = self.client.get(url, {'difficulty': 'Beginner'})
+        second = self.client.get(url, {'difficulty': 'Beginner'})
+        self.assertEqual((first['X-Cache'], second['X-Cache']), ('MISS', 'HIT'))
+        self.assertEqual(first.data, second.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Workout.objects.create(**dict(self.workout_data, name='Wall Sit'))
+        third = self.client.get(url, {'difficulty': 'Beginner'})
+        self.assertEqual(third['X-Cache'], 'MISS')
+        self.assertEqual(len(third.data['results']), 2)
+
+        stats = self.client.get('/api/_cache/').data['endpoints']['workout.by_difficulty']
+        self.assertEqual((stats['hits'], stats['misses']), (1, 2))
+
+    def test_key_ignores_parameter_order(self):
+        """Test that equivalent query strings share an entry"""
+        self.client.get('/api/leaderboard/top_users/?limit=5&x=1')
+        response = self.client.get('/api/leaderboard/top_users/?x=1&limit=5')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+
+class ConditionalGetTest(APITestCase):
+    """Test cases for ETag / Last-Modified revalidation"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        for username in ('alice', 'bob'):
+            User.objects.create(email=f'{username}@example.com', username=username, password='x', full_name=username)
+        Workout.objects.create(
+            name='Plank Ladder', description='Core work', difficulty='Beginner',
+            duration=15, category='Strength', exercises=['Plank'],
+        )
+
+    def log(self, username):
+        data = {
+            'user': username, 'activity_type': 'Running', 'duration': 30, 'distance': 5.0,
+            'calories': 300, 'points': 10, 'date': timezone.now().isoformat(),
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.post('/api/activities/', data).status_code, status.HTTP_201_CREATED)
+
+    def test_not_modified_reads_only_versions(self):
+        """Test that a matching If-None-Match is answered from the version counters alone"""
+        first = self.client.get('/api/workouts/')
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        self.assertIn('no-cache', first['Cache-Control'])
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/workouts/', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(second.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(second['ETag'], first['ETag'])
+        self.assertEqual(second.content, b'')
+
+    def test_write_changes_etag(self):
+        """Test that a write and a different query both change the validator"""
+        etag = self.client.get('/api/workouts/')['ETag']
+        self.assertNotEqual(self.client.get('/api/workouts/', {'page_size': 1})['ETag'], etag)
+        with self.captureOnCommitCallbacks(execute=True):
+            Workout.objects.create(
+                name='Wall Sit', description='Legs', difficulty='Beginner',
+                duration=10, category='Strength', exercises=['Wall Sit'],
+            )
+        response = self.client.get('/api/workouts/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_bumps_from_other_processes_are_seen(self):
+        """Test that validators and cached bodies follow the stored counters, not the local cache"""
+        params = {'difficulty': 'Beginner'}
+        first = self.client.get('/api/workouts/by_difficulty/', params)
+        self.assertEqual(self.client.get('/api/workouts/by_difficulty/', params)['X-Cache'], 'HIT')
+        # What a bump in a worker or management command leaves behind.
+        CollectionVersion.objects.filter(namespace='workout').update(version=F('version') + 1)
+        response = self.client.get('/api/workouts/by_difficulty/', params, HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+    def test_user_activity_versions_are_independent(self):
+        """Test that one user's activity leaves another user's validator alone"""
+        alice = self.client.get('/api/activities/by_user/', {'user': 'alice'})['ETag']
+        listing = self.client.get('/api/activities/')['ETag']
+        self.log('bob')
+        response = self.client.get('/api/activities/by_user/', {'user': 'alice'}, HTTP_IF_NONE_MATCH=alice)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        response = self.client.get('/api/activities/', HTTP_IF_NONE_MATCH=listing)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.log('alice')
+        response = self.client.get('/api/activities/by_user/', {'user': 'alice'}, HTTP_IF_NONE_MATCH=alice)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_if_modified_since(self):
+        """Test that Last-Modified is only sent once its second has passed"""
+        self.assertFalse(self.client.get('/api/workouts/').has_header('Last-Modified'))
+        with mock.patch('octofit_tracker.conditional.time.time', return_value=time.time() + 5):
+            last_modified = self.client.get('/api/workouts/')['Last-Modified']
+            response = self.client.get('/api/workouts/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class PopulateDbCommandTest(TestCase):
+    """Test cases for the populate_db management command"""
+
+    def test_synthetic_dataset_is_consistent(self):
+        """Test that bulk generation produces matching aggregates"""
+        call_command('populate_db', '--users', '30', '--teams', '3', '--activities-per-user', '4',
+                     '--seed', '7', '--batch-size', '16', stdout=StringIO())
+        self.assertEqual(Team.objects.count(), 3)
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Activity.objects.count(), 120)
+
+        entries = list(Leaderboard.objects.order_by('rank'))
+        self.assertEqual([entry.rank for entry in entries], list(range(1, 31)))
+        self.assertEqual(entries, sorted(entries, key=lambda entry: (-entry.total_points, entry.user_id)))
+        for entry in entries[:5]:
+            points = sum(Activity.objects.filter(user=entry.user_id).values_list('points', flat=True))
+            self.assertEqual(entry.total_points, points)
+        for team in Team.objects.all():
+            self.assertEqual(team.total_points,
+                             sum(Leaderboard.objects.filter(team=team.name).values_list('total_points', flat=True)))
+
+    def test_seed_is_reproducible(self):
+        """Test that the same seed yields the same standings"""
+        standings = []
+        for _ in range(2):
+            call_command('populate_db', '--seed', '42', stdout=StringIO())
+            standings.append(list(Leaderboard.objects.order_by('rank').values_list('user', 'total_points')))
+        self.assertEqual(standings[0], standings[1])
+
+
+class BenchmarkRunnerTest(TestCase):
+    """Test cases for the benchmark suite helpers"""
+
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+        self.assertEqual(benchmark_runner.percentile(values, 50), 50)
+        self.assertEqual(benchmark_runner.percentile(values, 99), 99)
+        self.assertEqual(benchmark_runner.percentile([], 95), 0.0)
+
+    def test_endpoints_are_discovered_and_measured(self):
+        """Test that router actions are discovered and produce a report"""
+        call_command('populate_db', '--seed', '3', stdout=StringIO())
+        endpoints = {endpoint.name: endpoint for endpoint in discover_endpoints()}
+        self.assertIn('activity.by_user', endpoints)
+        self.assertIn('leaderboard.retrieve', endpoints)
+        self.assertNotIn('team.add_member', endpoints)
+        self.assertLessEqual(set(LOAD_TEST_ENDPOINTS), set(endpoints))
+
+        result = benchmark_runner.run([endpoints['activity.by_user']], iterations=3)['activity.by_user']
+        self.assertEqual(result['requests'], 3)
+        self.assertEqual(result['statuses'], [200])
+        self.assertGreaterEqual(result['queries'], 1)
+
+    def test_load_test_runs_concurrently_in_both_modes(self):
+        """Test that the concurrency comparison issues every request"""
+        endpoint = Endpoint('api_root', '/api/', {})
+        for use_async in (False, True):
+            result = benchmark_runner.load_test(endpoint, concurrency=4, total=10, use_async=use_async)
+            self.assertEqual((result['requests'], result['statuses'], result['concurrency']), (10, [200], 4))
+
+    def test_compare_flags_regressions(self):
+        """Test that slower p95 or extra queries are reported"""
+        baseline = {'endpoints': {'a': {'p95_ms': 10.0, 'queries': 1}, 'b': {'p95_ms': 10.0, 'queries': 1}}}
+        results = {'a': {'p95_ms': 11.0, 'queries': 1}, 'b': {'p95_ms': 13.0, 'queries': 2}}
+        regressions = benchmark_runner.compare(results, baseline, threshold=0.2)
+        self.assertEqual(len(regressions), 2)
+        self.assertTrue(all(regression.startswith('b:') for regression in regressions))
+
+
+class RequestMetricsMiddlewareTest(APITestCase):
+    """Test cases for request timing instrumentation"""
+
+    def setUp(self):
+        """Set up test data"""
+        metrics_registry.reset()
+
+    def test_server_timing_and_aggregates(self):
+        """Test that sampled requests expose and record their timings"""
+        with self.settings(OCTOFIT_METRICS_SAMPLE_RATE=0.0):
+            self.client.get('/api/activities/by_user/', {'user': 'nobody'})
+        with self.settings(OCTOFIT_METRICS_SAMPLE_RATE=1.0):
+            response = self.client.get('/api/activities/by_user/', {'user': 'nobody'})
+            self.assertIn('db;dur=', response['Server-Timing'])
+            self.assertIn('render;dur=', response['Server-Timing'])
+            self.assertIn('2 queries', response['Server-Timing'])
+            metrics = self.client.get('/api/_metrics/').data
+
+        view = metrics['views']['ActivityViewSet.by_user']
+        self.assertEqual(view['count'], 1)
+        self.assertEqual(view['queries_max'], 2)
+        self.assertEqual(sum(view['histograms']['total']), 1)
+        self.assertEqual(len(view['histograms']['total']), len(metrics['buckets_ms']))
+
+    def test_unsampled_requests_are_untouched(self):
+        """Test that a zero sample rate skips instrumentation"""
+        with self.settings(OCTOFIT_METRICS_SAMPLE_RATE=0.0):
+            response = self.client.get('/api/workouts/')
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(metrics_registry.snapshot()['views'], {})
+
+
+class FastSerializationTest(APITestCase):
+    """Test cases for the values()-based list serialization"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        call_command('populate_db', '--seed', '5', stdout=StringIO())
+        Activity.objects.create(user_id='thor', activity_type='Yoga', duration=12, distance=0.1, points=3,
+                                date=datetime(2024, 2, 29, 6, 30, 15, 123456), notes='Ünïcode\u2028line')
+        User.objects.filter(username='thor').update(avatar_url=None)
+
+    def test_byte_compatible_with_serializers(self):
+        """Test that fast and regular list responses are identical"""
+        urls = ['/api/users/', '/api/teams/', '/api/activities/', '/api/leaderboard/', '/api/workouts/',
+                '/api/activities/by_user/?user=thor', '/api/leaderboard/top_users/?limit=20',
+                '/api/activities/?fields=id,notes,user', '/api/workouts/?omit=description,exercises',
+                '/api/teams/?omit=members', '/api/leaderboard/around/?user=thor&fields=user,rank']
+        for url in urls:
+            with self.settings(OCTOFIT_FAST_SERIALIZATION=False, OCTOFIT_RESPONSE_CACHE_ENABLED=False):
+                expected = self.client.get(url, HTTP_ACCEPT='application/json').content
+            with self.settings(OCTOFIT_FAST_SERIALIZATION=True, OCTOFIT_RESPONSE_CACHE_ENABLED=False):
+                actual = self.client.get(url, HTTP_ACCEPT='application/json').content
+            self.assertEqual(actual, expected, url)
+
+    def test_byte_compatible_in_other_timezone(self):
+        """Test that datetimes are converted to the active timezone like DRF does"""
+        with timezone.override('America/New_York'):
+            self.test_byte_compatible_with_serializers()
+
+
+class WorkoutRecommendationTest(APITestCase):
+    """Test cases for precomputed workout recommendations"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        Team.objects.create(name='Team Calm', captain='yogi')
+        for username, team in (('yogi', 'Team Calm'), ('lifter', None), ('newbie', None)):
+            User.objects.create(email=f'{username}@example.com', username=username, password='x',
+                                full_name=username, team_id=team)
+        self.workouts = {}
+        for name, category, difficulty, duration, team in [
+            ('Stretch', 'Flexibility', 'Beginner', 30, ''),
+            ('Calm Flow', 'Flexibility', 'Beginner', 30, 'Team Calm'),
+            ('Power Lift', 'Strength', 'Advanced', 60, ''),
+            ('Sprints', 'Cardio', 'Intermediate', 20, ''),
+        ]:
+            self.workouts[name] = Workout.objects.create(
+                name=name, description='d', difficulty=difficulty, duration=duration, category=category,
+                recommended_for=team,
+            ).pk
+        for username, activity_type, duration, points in [
+            ('yogi', 'Yoga', 30, 15), ('yogi', 'Yoga', 35, 15), ('lifter', 'Weight Training', 60, 150),
+        ]:
+            Activity.objects.create(user_id=username, activity_type=activity_type, duration=duration,
+                                    points=points, date=timezone.now())
+
+    def test_refresh_ranks_workouts_per_user(self):
+        """Test that activity mix, intensity and team drive the stored order"""
+        out = StringIO()
+        call_command('refresh_recommendations', '--count', '3', stdout=out)
+        self.assertIn('3 users', out.getvalue())
+        stored = {row.user_id: row for row in WorkoutRecommendation.objects.all()}
+        names = {pk: name for name, pk in self.workouts.items()}
+        self.assertEqual([names[pk] for pk in stored['yogi'].workouts], ['Calm Flow', 'Stretch', 'Sprints'])
+        self.assertEqual(names[stored['lifter'].workouts[0]], 'Power Lift')
+        self.assertEqual(len(stored['newbie'].workouts), 3)
+        self.assertEqual(stored['yogi'].scores, sorted(stored['yogi'].scores, reverse=True))
+
+    def test_recommended_endpoint_is_a_lookup(self):
+        """Test that serving recommendations reads the versions, the stored list and the workouts"""
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_recommendations()
+        self.client.get('/api/workouts/recommended/', {'user': 'newbie'})
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/workouts/recommended/', {'user': 'yogi', 'fields': 'name'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['name'] for item in response.data][:2], ['Calm Flow', 'Stretch'])
+        self.assertEqual(set(response.data[0]), {'name', 'score'})
+
+        Workout.objects.filter(pk=self.workouts['Calm Flow']).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkoutRecommendation.objects.filter(user='lifter').delete()
+        response = self.client.get('/api/workouts/recommended/', {'user': 'yogi'})
+        self.assertEqual(response.data[0]['name'], 'Stretch')
+        self.assertEqual(self.client.get('/api/workouts/recommended/', {'user': 'lifter'}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+        self.assertEqual(self.client.get('/api/workouts/recommended/').status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsetTest(APITestCase):
+    """Test cases for ?fields=/?omit= and compact formats"""
+
+    def setUp(self):
+        """Set up test data"""
+        get_cache().clear()
+        Team.objects.create(name='Team Sparse', captain='sam')
+        User.objects.create(email='sam@example.com', username='sam', password='x', full_name='Sam',
+                            team_id='Team Sparse')
+        TeamMembership.objects.create(team_id='Team Sparse', user_id='sam')
+        self.activity = Activity.objects.create(user_id='sam', activity_type='Swim', duration=40, points=12,
+                                                date=timezone.now(), notes='Long notes')
+        Workout.objects.create(name='Laps', description='Long description', difficulty='Easy', duration=30,
+                               category='Cardio', exercises=['Freestyle', 'Backstroke'])
+
+    def test_unselected_columns_are_not_fetched(self):
+        """Test that list, detail and instance-path reads only query the selected columns"""
+        for fast in (True, False):
+            with self.settings(OCTOFIT_FAST_SERIALIZATION=fast), CaptureQueriesContext(connection) as queries:
+                response = self.client.get('/api/activities/', {'fields': 'activity_type,points'})
+            self.assertEqual(response.data['results'], [{'activity_type': 'Swim', 'points': 12}])
+            sql = ' '.join(query['sql'] for query in queries)
+            self.assertNotIn('notes', sql)
+            self.assertNotIn('JOIN', sql)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/activities/{self.activity.pk}/', {'omit': 'notes,user'})
+        self.assertNotIn('notes', response.data)
+        self.assertEqual(response.data['id'], str(self.activity.pk))
+        self.assertNotIn('notes', queries[-1]['sql'])
+
+        self.client.get('/api/teams/', {'fields': 'name'})
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/teams/', {'fields': 'name,member_count'})
+        self.assertEqual(response.data['results'], [{'name': 'Team Sparse', 'member_count': 1}])
+
+    def test_invalid_selection_is_rejected(self):
+        """Test that unknown or empty selections are client errors"""
+        for params in ({'fields': 'name,secret'}, {'omit': 'bogus'}, {'fields': 'name', 'omit': 'name'}):
+            response = self.client.get('/api/workouts/', params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertIn('fields', response.data)
+
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_messagepack_matches_json(self):
+        """Test that MessagePack carries the same payload as JSON"""
+        expected = self.client.get('/api/workouts/', {'fields': 'name,exercises'}, HTTP_ACCEPT='application/json')
+        response = self.client.get('/api/workouts/', {'fields': 'name,exercises'}, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json.loads(expected.content))
+        self.assertLess(len(response.content), len(expected.content))
+        response = self.client.get('/api/activities/', {'format': 'msgpack'})
+        self.assertEqual(msgpack.unpackb(response.content)['results'][0]['notes'], 'Long notes')
+
+
+class SearchIndexTest(APITestCase):
+    """Test cases for the prefix search index"""
+
+    def setUp(self):
+        """Set up test data"""
+        Team.objects.create(name='Team Thunder', description='Storm chasers', captain='thor')
+        self.thor = User.objects.create(email='thor@example.com', username='thor', password='x',
+                                        full_name='Thor Odinson', team_id='Team Thunder')
+        User.objects.create(email='tony@example.com', username='tony_stark', password='x', full_name='Tony Stark')
+        self.workout = Workout.objects.create(name='Thunder Sprints', description='Short bursts', difficulty='Hard',
+                                              duration=20, category='Cardio', exercises=['Hill runs'])
+
+    def test_prefix_search(self):
+        """Test that every query word must prefix a word of the result, best matches first"""
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/search/', {'q': 'Th'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = [(item['kind'], item['label']) for item in response.data['results']]
+        self.assertEqual(results, [('team', 'Team Thunder'), ('workout', 'Thunder Sprints'), ('user', 'thor')])
+        self.assertEqual(response.data['results'][2]['id'], str(self.thor.pk))
+
+        self.assertEqual([item['label'] for item in search.search('thunder spr')], ['Thunder Sprints'])
+        self.assertEqual([item['label'] for item in search.search('ÖDIN')], ['thor'])
+        self.assertEqual([item['label'] for item in search.search('hill')], ['Thunder Sprints'])
+        self.assertEqual(search.search('th', kinds=['user']), [{'kind': 'user', 'id': str(self.thor.pk), 'label': 'thor'}])
+        self.assertEqual(search.search('  '), [])
+        self.assertEqual(self.client.get('/api/search/', {'q': 'th', 'kind': 'bogus'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+
+    def test_index_follows_saves_and_deletes(self):
+        """Test that edits and deletions are reflected in the index"""
+        self.thor.full_name = 'God of Lightning'
+        self.thor.save()
+        self.assertEqual([item['label'] for item in search.search('light')], ['thor'])
+        self.assertEqual(search.search('odin'), [])
+
+        self.workout.delete()
+        self.assertFalse(SearchTerm.objects.filter(kind='workout', object_id=self.workout.pk).exists())
+        self.assertEqual(search.rebuild_index(), SearchTerm.objects.count())
+        self.assertEqual([item['kind'] for item in search.search('thunder')], ['team'])
+
+    def test_admin_search_uses_index(self):
+        """Test that the admin changelist search box matches through the index"""
+        from django.contrib.auth.models import User as AdminUser
+        self.client.force_login(AdminUser.objects.create_superuser('admin', 'admin@example.com', 'x'))
+        response = self.client.get('/admin/octofit_tracker/user/', {'q': 'ton'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.context['cl'].result_list), list(User.objects.filter(username='tony_stark')))
+        response = self.client.get('/admin/octofit_tracker/user/', {'q': 'tony@example.com'})
+        self.assertEqual(list(response.context['cl'].result_list), list(User.objects.filter(username='tony_stark')))
+        response = self.client.get('/admin/octofit_tracker/team/', {'q': 'thor'})
+        self.assertEqual([team.name for team in response.context['cl'].result_list], ['Team Thunder'])
+        response = self.client.get('/admin/octofit_tracker/workout/', {'q': 'cardio'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.workout])
+        response = self.client.get('/admin/octofit_tracker/workout/', {'q': 'thunder hill'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.workout])
+
+
+class ActivityStatsAPITest(APITestCase):
+    """Test cases for rollup-backed activity statistics"""
+
+    def setUp(self):
+        """Set up test data"""
+        Team.objects.create(name='Team Roll', captain='rita')
+        User.objects.create(email='rita@example.com', username='rita', password='x', full_name='Rita', team_id='Team Roll')
+
+    def post_activity(self, date, duration, activity_type='Running'):
+        """Create an activity through the API (scored at duration + 55 points)"""
+        response = self.client.post('/api/activities/', {
+            'user': 'rita', 'activity_type': activity_type, 'duration': duration, 'distance': 5.5,
+            'calories': 200, 'date': date,
+        })
+        return response.data['id']
+
+    def test_weekly_buckets_follow_writes(self):
+        """Test that create, update and delete keep weekly rollups exact"""
+        self.post_activity('2024-03-04T08:00:00Z', 10)
+        self.post_activity('2024-03-10T20:00:00Z', 20, 'Cycling')
+        late = self.post_activity('2024-03-12T08:00:00Z', 5)
+        params = {'group_by': 'user', 'key': 'rita', 'bucket': 'week', 'from': '2024-03-01', 'to': '2024-03-31'}
+
+        results = self.client.get('/api/activities/stats/', params).data['results']
+        self.assertEqual([(r['bucket_start'], r['activities'], r['points'], r['distance']) for r in results],
+                         [('2024-03-04', 2, 140, 11.0), ('2024-03-11', 1, 60, 5.5)])
+
+        self.client.patch(f'/api/activities/{late}/', {'duration': 8})
+        self.client.delete(f'/api/activities/{late}/')
+        results = self.client.get('/api/activities/stats/', params).data['results']
+        self.assertEqual([(r['activities'], r['points']) for r in results], [(2, 140), (0, 0)])
+
+        by_type = self.client.get('/api/activities/stats/', {'group_by': 'type', 'bucket': 'month',
+                                                              'from': '2024-03-01', 'to': '2024-03-31'}).data
+        self.assertEqual([(r['key'], r['points']) for r in by_type['results']], [('Cycling', 75), ('Running', 65)])
+        by_team = self.client.get('/api/activities/stats/', {'group_by': 'team', 'bucket': 'day', 'key': 'Team Roll',
+                                                              'from': '2024-03-10', 'to': '2024-03-10'}).data
+        self.assertEqual([r['points'] for r in by_team['results']], [75])
+
+    def test_rollups_match_rebuild(self):
+        """Test that incremental rollups equal a rebuild from scratch"""
+        call_command('populate_db', '--users', '6', '--seed', '9', stdout=StringIO())
+        incremental = sorted(ActivityRollup.objects.values_list(
+            'dimension', 'period', 'key', 'bucket_start', 'activities', 'points'))
+        rollups.rebuild()
+        rebuilt = sorted(ActivityRollup.objects.values_list(
+            'dimension', 'period', 'key', 'bucket_start', 'activities', 'points'))
+        self.assertEqual(incremental, rebuilt)
+
+    def test_invalid_parameters(self):
+        """Test that unknown dimensions and bad dates are rejected"""
+        self.assertEqual(self.client.get('/api/activities/stats/', {'group_by': 'planet'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/activities/stats/', {'bucket': 'year'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/activities/stats/', {'from': '2024-02-30'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/activities/stats/', {'from': 'bad'}).status_code, 400)
+        self.assertEqual(self.client.get('/api/activities/stats/', {'to': '03/01/2024'}).status_code, 400)
+
+    def test_team_change_moves_standings_and_rollups(self):
+        """Test that team totals, team ranks and team rollups follow a user to a new team"""
+        Team.objects.create(name='Team Swap', captain='sam')
+        User.objects.create(email='sam@example.com', username='sam', password='x', full_name='Sam',
+                            team_id='Team Swap')
+        self.client.post('/api/activities/', {'user': 'sam', 'activity_type': 'Rowing', 'duration': 100,
+                                              'date': '2024-03-05T08:00:00Z'})
+        self.post_activity('2024-03-04T08:00:00Z', 10)
+        response = self.client.patch(f'/api/users/{User.objects.get(username="rita").pk}/',
+                                     {'team': 'Team Swap'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        entry = Leaderboard.objects.get(user='rita')
+        self.assertEqual((entry.team_id, entry.team_rank), ('Team Swap', 2))
+        totals = dict(Team.objects.values_list('name', 'total_points'))
+        self.assertEqual((totals['Team Roll'], totals['Team Swap']), (0, 165))
+        params = {'group_by': 'team', 'bucket': 'month', 'from': '2024-03-01', 'to': '2024-03-31'}
+        results = self.client.get('/api/activities/stats/', params).data['results']
+        self.assertEqual([(r['key'], r['points']) for r in results], [('Team Roll', 0), ('Team Swap', 165)])
+        incremental = sorted(ActivityRollup.objects.filter(points__gt=0).values_list('key', 'period', 'points'))
+        rollups.rebuild()
+        self.assertEqual(sorted(ActivityRollup.objects.values_list('key', 'period', 'points')), incremental)
+
+
+class ConcurrentCounterTest(TransactionTestCase):
+    """Stress tests for parallel membership and point updates"""
+
+    workers = 8
+    per_worker = 5
+
+    def setUp(self):
+        """Set up test data"""
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            # Shared-cache connections fail lock waits and cannot roll back cleanly.
+            self.skipTest('needs a file or server database for concurrent writers')
+        self.team = Team.objects.create(name='Team Rush', captain='runner_0')
+        for number in range(self.workers):
+            User.objects.create(email=f'runner_{number}@example.com', username=f'runner_{number}',
+                                password='x', full_name=f'Runner {number}', team_id='Team Rush')
+
+    def run_parallel(self, work):
+        """Run ``work(index, client)`` on every worker thread at once"""
+        barrier = threading.Barrier(self.workers)
+        failures = []
+
+        def target(index):
+            try:
+                barrier.wait()
+                work(index, APIClient())
+            except Exception as exc:  # surfaced in the main thread
+                failures.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=target, args=(index,)) for index in range(self.workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(failures, [])
+
+    def post(self, client, path, data):
+        """POST, retrying transactions the database aborted on lock contention"""
+        for _ in range(200):
+            try:
+                return client.post(path, data, format='json')
+            except OperationalError:
+                time.sleep(0.01)
+        raise AssertionError(f'{path} stayed locked')
+
+    def test_parallel_add_member_inserts_each_member_once(self):
+        """Test that racing add_member calls neither lose nor duplicate members"""
+        url = f'/api/teams/{self.team.pk}/add_member/'
+        statuses = []
+
+        def work(index, client):
+            statuses.append(self.post(client, url, {'username': f'runner_{index}'}).status_code)
+            statuses.append(self.post(client, url, {'username': 'runner_0'}).status_code)
+
+        self.run_parallel(work)
+        self.assertEqual(TeamMembership.objects.filter(team=self.team).count(), self.workers)
+        self.assertEqual(statuses.count(status.HTTP_200_OK), self.workers)
+
+    def test_parallel_activity_points_are_exact(self):
+        """Test that racing activity writes produce exact leaderboard and team totals"""
+        def work(index, client):
+            for number in range(self.per_worker):
+                # Half the workers pile onto one user to contend for the same rows.
+                user = 'runner_0' if index % 2 else f'runner_{index}'
+                response = self.post(client, '/api/activities/', {
+                    'user': user, 'activity_type': 'Sprint', 'duration': number + 1,
+                    'date': timezone.now().isoformat(),
+                })
+                self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        self.run_parallel(work)
+        per_worker = sum(range(1, self.per_worker + 1))
+        self.team.refresh_from_db()
+        self.assertEqual(self.team.total_points, per_worker * self.workers)
+        self.assertEqual(sum(Leaderboard.objects.values_list('total_points', flat=True)), per_worker * self.workers)
+        self.assertEqual(Leaderboard.objects.get(user='runner_0').total_activities,
+                         self.per_worker * (self.workers // 2 + 1))
+        self.assertEqual(sorted(Leaderboard.objects.values_list('rank', flat=True)),
+                         list(range(1, Leaderboard.objects.count() + 1)))
+
+
+class AsgiMetricsTest(TransactionTestCase):
+    """Test cases for the API served through the ASGI handler"""
+
+    def setUp(self):
+        """Set up test data"""
+        User.objects.create(email='ada@example.com', username='ada', password='x', full_name='ada')
+        for points in range(2):
+            Activity.objects.create(user_id='ada', activity_type='Rowing', duration=10, points=points + 1,
+                                    date=timezone.now())
+        get_cache().clear()
+
+    async def test_queries_are_timed_under_asgi(self):
+        """Test that a sync view's queries reach the request timer"""
+        with self.settings(OCTOFIT_METRICS_SAMPLE_RATE=1.0):
+            await self.async_client.get('/api/activities/by_user/', {'user': 'ada'})
+            response = await self.async_client.get('/api/activities/by_user/', {'user': 'ada'})
+        self.assertIn('2 queries', response['Server-Timing'])
+
+    async def test_async_routes_are_gone(self):
+        """Test that the thread-pool /api/async/ twins are no longer routed"""
+        response = await self.async_client.get('/api/async/activities/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+def read_event(message):
+    """Parse one server-sent event from an ASGI body message"""
+    fields = dict(line.split(': ', 1) for line in message['body'].decode('utf-8').strip().split('\n'))
+    return fields['event'], json.loads(fields['data'])
+
+
+class LiveLeaderboardTest(TransactionTestCase):
+    """Test cases for the live leaderboard stream"""
+
+    def setUp(self):
+        """Set up test data"""
+        live._broadcaster = None
+        for name in ('ada', 'bo'):
+            User.objects.create(email=f'{name}@example.com', username=name, password='x', full_name=name)
+        Leaderboard.objects.create(user_id='ada', total_points=30, total_activities=1, rank=1)
+
+    def tearDown(self):
+        live._broadcaster = None
+
+    def log(self, username, points):
+        response = APIClient().post('/api/activities/', {
+            'user': username, 'activity_type': 'Rowing', 'duration': points,
+            'date': timezone.now().isoformat(),
+        })
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    async def test_changes_are_coalesced_per_tick(self):
+        """Test that one tick sends a single frame with one entry per user"""
+        broadcaster = live.Broadcaster(live.LocalBackend(), tick=3600)
+        subscription = broadcaster.subscribe()
+        entry = {'user': 'ada', 'team': None, 'total_points': 40, 'total_activities': 2, 'rank': 1, 'delta': 10}
+        broadcaster.publish([entry])
+        broadcaster.publish([dict(entry, total_points=45, delta=5), dict(entry, user='bo', total_points=50)])
+        self.assertEqual(broadcaster.flush(), 1)
+        self.assertEqual(broadcaster.flush(), 0)
+        broadcaster.unsubscribe(subscription)
+
+        event, data = read_event({'body': await asyncio.wait_for(subscription.queue.get(), 1)})
+        self.assertEqual(event, 'update')
+        self.assertEqual([(e['user'], e['total_points'], e['delta']) for e in data['entries']],
+                         [('bo', 50, 10), ('ada', 45, 15)])
+        self.assertTrue(subscription.queue.empty())
+
+    async def test_stream_sends_snapshot_then_updates(self):
+        """Test that a subscriber gets the standings, then committed moves"""
+        sent, inbox = asyncio.Queue(), asyncio.Queue()
+        scope = {'type': 'http', 'method': 'GET', 'path': '/api/live/leaderboard/', 'query_string': b'limit=5'}
+        with self.settings(OCTOFIT_LIVE_TICK=0.05):
+            stream = asyncio.ensure_future(LiveRouter(None)(scope, inbox.get, sent.put))
+            start = await asyncio.wait_for(sent.get(), 5)
+            self.assertEqual((start['status'], dict(start['headers'])[b'content-type']),
+                             (200, b'text/event-stream'))
+            event, data = read_event(await asyncio.wait_for(sent.get(), 5))
+            self.assertEqual((event, [e['user'] for e in data['entries']]), ('snapshot', ['ada']))
+
+            await sync_to_async(self.log)('bo', 50)
+            event, data = read_event(await asyncio.wait_for(sent.get(), 5))
+            await inbox.put({'type': 'http.disconnect'})
+            await asyncio.wait_for(stream, 5)
+        self.assertEqual(event, 'update')
+        self.assertEqual(data['entries'], [
+            {'user': 'bo', 'team': None, 'total_points': 50, 'total_activities': 1, 'rank': 1, 'team_rank': 1,
+             'delta': 50},
+        ])
@@ -20,7 +20,7 @@ from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 import os
-from .views import UserViewSet, TeamViewSet, ActivityViewSet, LeaderboardViewSet, WorkoutViewSet
+from .views import UserViewSet, TeamViewSet, ActivityViewSet, LeaderboardViewSet, WorkoutViewSet, cache_stats, metrics, search
 
 # Get codespace environment variable
 codespace_name = os.environ.get('CODESPACE_NAME')
@@ -52,6 +52,8 @@ def api_root(request):
             'activities': f"{base_url}/api/activities/",
             'leaderboard': f"{base_url}/api/leaderboard/",
             'workouts': f"{base_url}/api/workouts/",
+            'live_leaderboard': f"{base_url}/api/live/leaderboard/",
+            'search': f"{base_url}/api/search/",
             'admin': f"{base_url}/admin/",
         }
     })
@@ -61,5 +63,8 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', api_root, name='api-root'),
     path('api/', api_root, name='api-root-alt'),
+    path('api/_cache/', cache_stats, name='cache-stats'),
+    path('api/_metrics/', metrics, name='metrics'),
+    path('api/search/', search, name='search'),
     path('api/', include(router.urls)),
 ]
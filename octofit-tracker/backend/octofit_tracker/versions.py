@@ -0,0 +1,114 @@
+"""
+Collection version counters.
+
+Each namespace (``'leaderboard'``, ``'workout'``, ...) has a counter that is
+bumped whenever the underlying rows change. Anything derived from a
+collection can embed the counter in its key and is invalidated simply by the
+next bump, without tracking individual entries. The counters are
+``CollectionVersion`` rows, so bumps made by management commands and other
+workers reach every serving process even when cached responses live in a
+per-process cache. Each bump also records the time of the change, which
+backs ``Last-Modified`` headers.
+
+Activities are additionally versioned per user (``user_activity_namespace``).
+Writes that replace activities wholesale bump ``ACTIVITY_EPOCH`` instead of
+every per-user counter.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.db.models import F
+
+from .models import CollectionVersion
+
+
+ACTIVITY_EPOCH = 'activity:epoch'
+
+
+def user_activity_namespace(username):
+    """Namespace of one user's activities"""
+    return f'activity:user:{username}'
+
+
+def get_cache():
+    """The cache backend holding cached responses"""
+    return caches[settings.OCTOFIT_RESPONSE_CACHE_ALIAS]
+
+
+def _initial():
+    # Start from the clock so a counter that is recreated never reuses an old
+    # value and revives stale entries.
+    return time.time_ns() // 1000
+
+
+def get_state(namespaces, request=None):
+    """
+    Return ``({namespace: version}, last modified)``, initialising missing counters.
+
+    With ``request``, counters already read for that request are reused, so
+    the validators and the response cache of one request cost one query.
+    """
+    memo = {}
+    if request is not None:
+        memo = getattr(request, '_octofit_versions', None)
+        if memo is None:
+            memo = request._octofit_versions = {}
+    namespaces = set(namespaces)
+    unread = namespaces - set(memo)
+    if unread:
+        memo.update(_read(unread))
+    missing = unread - set(memo)
+    if missing:
+        # Unknown: assume it just changed.
+        now = time.time()
+        CollectionVersion.objects.bulk_create(
+            [CollectionVersion(namespace=namespace, version=_initial(), modified=now) for namespace in missing],
+            ignore_conflicts=True,
+        )
+        memo.update(_read(missing))
+    versions = {namespace: memo[namespace][0] for namespace in namespaces}
+    return versions, max(memo[namespace][1] for namespace in namespaces)
+
+
+def _read(namespaces):
+    return {
+        namespace: (version, modified)
+        for namespace, version, modified in CollectionVersion.objects.filter(
+            namespace__in=namespaces,
+        ).values_list('namespace', 'version', 'modified')
+    }
+
+
+def get_versions(namespaces, request=None):
+    """Return ``{namespace: version}``, initialising missing counters"""
+    return get_state(namespaces, request)[0]
+
+
+def get_last_modified(namespaces, request=None):
+    """Unix time of the latest change to any of ``namespaces``"""
+    return get_state(namespaces, request)[1]
+
+
+def bump(*namespaces):
+    """Advance the counters for ``namespaces`` immediately"""
+    namespaces = set(namespaces)
+    now = time.time()
+    updated = CollectionVersion.objects.filter(namespace__in=namespaces).update(
+        version=F('version') + 1, modified=now,
+    )
+    if updated < len(namespaces):
+        existing = set(CollectionVersion.objects.filter(
+            namespace__in=namespaces,
+        ).values_list('namespace', flat=True))
+        CollectionVersion.objects.bulk_create(
+            [CollectionVersion(namespace=namespace, version=_initial(), modified=now)
+             for namespace in namespaces - existing],
+            ignore_conflicts=True,
+        )
+
+
+def bump_on_commit(*namespaces):
+    """Advance the counters once the current transaction commits"""
+    transaction.on_commit(lambda: bump(*namespaces))
@@ -1,16 +1,126 @@
+import copy
+
+from datetime import datetime, time, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, status
-from rest_framework.decorators import action
+from rest_framework.decorators import action, api_view
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
-from .models import User, Team, Activity, Leaderboard, Workout
+from rest_framework.reverse import reverse
+from .models import User, Team, TeamMembership, Activity, ActivityRollup, Leaderboard, Workout, WorkoutRecommendation
 from .serializers import UserSerializer, TeamSerializer, ActivitySerializer, LeaderboardSerializer, WorkoutSerializer
+from . import ingest, rollups, search as search_index, snapshots
+from .aggregation import apply_activity_changes
+from .conditional import ConditionalGetMixin
+from .fastpath import plan_for, readable_fields
+from .pagination import ActivityPagination, LeaderboardPagination, RollupPagination
+from .parsers import NDJSONParser
+from .renderers import CSVRenderer, NDJSONRenderer
+from .middleware import registry as metrics_registry
+from .response_cache import cached_response, stats as response_cache_stats
+from .versions import ACTIVITY_EPOCH, user_activity_namespace
+
+
+class PaginatedActionMixin:
+    """
+    Paginate custom list actions the same way as the default list view.
+
+    When ``OCTOFIT_FAST_SERIALIZATION`` is on and the serializer is supported,
+    rows are fetched with ``values()`` and converted by a precompiled
+    ``FieldPlan`` instead of going through the serializer per object.
+
+    Reads accept ``?fields=a,b`` or ``?omit=c`` to return a subset of the
+    serializer's fields; columns and relations outside it are not fetched.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.paginated_response(self.filter_queryset(self.get_queryset()))
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        selected = self.get_selected_fields()
+        if selected is not None:
+            queryset = self.sparse_queryset(queryset, selected)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        selected = self.get_selected_fields()
+        if selected is not None:
+            target = getattr(serializer, 'child', serializer)
+            for name in [name for name in target.fields if name not in selected]:
+                target.fields.pop(name)
+        return serializer
+
+    def get_selected_fields(self):
+        """Names chosen with ``?fields=``/``?omit=`` in serializer order, or ``None`` for all"""
+        if not hasattr(self, '_selected_fields'):
+            self._selected_fields = None
+            request = getattr(self, 'request', None)
+            if request is not None and request.method in ('GET', 'HEAD'):
+                self._selected_fields = _select_fields(
+                    readable_fields(self.get_serializer_class()), request.query_params,
+                )
+        return self._selected_fields
+
+    def sparse_queryset(self, queryset, selected):
+        """Defer the columns and drop the joins and prefetches ``selected`` does not need"""
+        model = queryset.model
+        sources = readable_fields(self.get_serializer_class())
+        needed = {sources[name] for name in selected}
+        needed.update(field.lstrip('-') for field in getattr(self.paginator, 'ordering', ()))
+        columns = [field.name for field in model._meta.concrete_fields if field.name in needed]
+        queryset = queryset.only(model._meta.pk.name, *columns)
+        if isinstance(queryset.query.select_related, dict):
+            joins = [name for name in queryset.query.select_related if name in needed]
+            queryset = queryset.select_related(None)
+            if joins:
+                queryset = queryset.select_related(*joins)
+        prefetches = [lookup for lookup in queryset._prefetch_related_lookups if lookup in needed]
+        return queryset.prefetch_related(None).prefetch_related(*prefetches)
+
+    def get_field_plan(self):
+        """The fast-path plan for this view's serializer, if enabled"""
+        if not settings.OCTOFIT_FAST_SERIALIZATION:
+            return None
+        return plan_for(self.get_serializer_class(), self.get_selected_fields())
+
+    def serialize_many(self, rows):
+        """Representation of ``rows`` (model instances or ``values()`` dicts)"""
+        if rows and isinstance(rows[0], dict):
+            return self.get_field_plan().represent(rows)
+        return self.get_serializer(rows, many=True).data
+
+    def fast_queryset(self, queryset, extra_columns=()):
+        """``queryset.values()`` with the plan's columns, or ``queryset`` unchanged"""
+        plan = self.get_field_plan()
+        if plan is None:
+            return queryset
+        columns = list(plan.columns)
+        columns += [column for column in extra_columns if column not in columns]
+        return queryset.values(*columns)
+
+    def paginated_response(self, queryset):
+        """Serialize one page of ``queryset`` with next/previous cursors"""
+        ordering = [field.lstrip('-') for field in getattr(self.paginator, 'ordering', ())]
+        page = self.paginate_queryset(self.fast_queryset(queryset, ordering))
+        return self.get_paginated_response(self.serialize_many(page))
 
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for users.
     Allows CRUD operations on users.
     """
-    queryset = User.objects.all()
+    queryset = User.objects.select_related('team')
     serializer_class = UserSerializer
 
     @action(detail=False, methods=['get'])
@@ -18,29 +128,50 @@ class UserViewSet(viewsets.ModelViewSet):
         """Get users by team name"""
         team_name = request.query_params.get('team', None)
         if team_name:
-            users = User.objects.filter(team=team_name)
-            serializer = self.get_serializer(users, many=True)
-            return Response(serializer.data)
+            users = self.get_queryset().filter(team=team_name)
+            return self.paginated_response(users)
         return Response({'error': 'Team parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class TeamViewSet(viewsets.ModelViewSet):
+class TeamViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for teams.
     Allows CRUD operations on teams.
     """
-    queryset = Team.objects.all()
+    queryset = Team.objects.prefetch_related('members')
     serializer_class = TeamSerializer
+    version_namespaces = ('team',)
+
+    @action(detail=False, methods=['get'])
+    @cached_response('team')
+    def standings(self, request):
+        """Get every team's totals and average points per member, best first"""
+        teams = Team.objects.order_by('-total_points', 'name').values('name', 'total_points', 'total_activities')
+        # Points are attributed by User.team, so members are counted the same way (not from the roster).
+        counts = dict(
+            User.objects.filter(team__isnull=False).values_list('team').annotate(members=Count('id')).order_by()
+        )
+        standings = []
+        for team in teams:
+            members = counts.get(team['name'], 0)
+            standings.append(dict(team, member_count=members,
+                                  average_points=round(team['total_points'] / members, 2) if members else 0))
+        return Response(standings)
 
     @action(detail=True, methods=['post'])
     def add_member(self, request, pk=None):
         """Add a member to a team"""
         team = self.get_object()
         username = request.data.get('username')
-        if username and username not in team.members:
-            team.members.append(username)
-            team.save()
-            return Response({'status': 'member added'})
+        if username and User.objects.filter(username=username).exists():
+            try:
+                # A single insert; the unique constraint rejects duplicates.
+                with transaction.atomic():
+                    TeamMembership.objects.create(team_id=team.name, user_id=username)
+            except IntegrityError:
+                pass
+            else:
+                return Response({'status': 'member added'})
         return Response({'error': 'Invalid username or member already exists'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=True, methods=['post'])
@@ -48,93 +179,455 @@ class TeamViewSet(viewsets.ModelViewSet):
         """Remove a member from a team"""
         team = self.get_object()
         username = request.data.get('username')
-        if username and username in team.members:
-            team.members.remove(username)
-            team.save()
+        if username and TeamMembership.objects.filter(team_id=team.name, user_id=username).delete()[0]:
             return Response({'status': 'member removed'})
         return Response({'error': 'Member not found in team'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class ActivityViewSet(viewsets.ModelViewSet):
+class ActivityViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for activities.
     Allows CRUD operations on activities.
     """
-    queryset = Activity.objects.all()
+    queryset = Activity.objects.select_related('user')
     serializer_class = ActivitySerializer
+    version_namespaces = ('activity',)
+    pagination_class = ActivityPagination
+
+    def get_version_namespaces(self):
+        username = self.request.query_params.get('user')
+        if self.action == 'by_user' and username:
+            # Only this user's writes change the response.
+            return (user_activity_namespace(username), ACTIVITY_EPOCH)
+        if self.action == 'ingest_status':
+            return ()  # queue state is not versioned
+        return self.version_namespaces
+
+    def create(self, request, *args, **kwargs):
+        """Create an activity, or queue it for the drain worker when write-behind ingestion is on"""
+        if not settings.OCTOFIT_INGEST_QUEUE_ENABLED:
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            (key,) = ingest.get_queue().put([ingest.encode(serializer.validated_data)])
+        except ingest.QueueFull:
+            return Response({'error': 'Too many activities are waiting to be stored; retry shortly'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE, headers={'Retry-After': '1'})
+        location = reverse('activity-ingest-status', request=request) + f'?key={key}'
+        return Response({'status': 'queued', 'key': key}, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': location})
+
+    def perform_create(self, serializer):
+        """Save the activity and fold it into the leaderboard"""
+        with transaction.atomic():
+            activity = serializer.save()
+            apply_activity_changes(added=[activity])
+
+    def perform_update(self, serializer):
+        """Save the activity and apply the difference to the leaderboard"""
+        previous = copy.copy(serializer.instance)
+        with transaction.atomic():
+            activity = serializer.save()
+            apply_activity_changes(added=[activity], removed=[previous])
+
+    def perform_destroy(self, instance):
+        """Delete the activity and remove it from the leaderboard"""
+        with transaction.atomic():
+            instance.delete()
+            apply_activity_changes(removed=[instance])
 
     @action(detail=False, methods=['get'])
     def by_user(self, request):
         """Get activities by username"""
         username = request.query_params.get('user', None)
         if username:
-            activities = Activity.objects.filter(user=username)
-            serializer = self.get_serializer(activities, many=True)
-            return Response(serializer.data)
+            activities = self.get_queryset().filter(user=username)
+            return self.paginated_response(activities)
         return Response({'error': 'User parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'], url_path='ingest')
+    def ingest_status(self, request):
+        """Depth of the write-behind queue, or the state of one queued activity (?key=)"""
+        enabled = settings.OCTOFIT_INGEST_QUEUE_ENABLED
+        key = request.query_params.get('key')
+        if not key:
+            # Opening the queue creates its file, so a disabled queue is left alone.
+            return Response(dict(ingest.get_queue().stats(), enabled=True) if enabled else {'enabled': False})
+        if enabled and ingest.get_queue().contains(key):
+            return Response({'key': key, 'status': 'queued'})
+        stored = Activity.objects.filter(ingest_key=key).values_list('id', flat=True).first()
+        if stored is None:
+            return Response({'error': 'Unknown key'}, status=status.HTTP_404_NOT_FOUND)
+        return Response({'key': key, 'status': 'stored', 'id': str(stored)})
+
     @action(detail=False, methods=['get'])
     def by_type(self, request):
         """Get activities by activity type"""
         activity_type = request.query_params.get('type', None)
         if activity_type:
-            activities = Activity.objects.filter(activity_type=activity_type)
-            serializer = self.get_serializer(activities, many=True)
-            return Response(serializer.data)
+            activities = self.get_queryset().filter(activity_type=activity_type)
+            return self.paginated_response(activities)
         return Response({'error': 'Type parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """Get activity totals per user, team or type, bucketed by day, week or month"""
+        group_by = request.query_params.get('group_by', 'user')
+        bucket = request.query_params.get('bucket', 'day')
+        if group_by not in ActivityRollup.DIMENSIONS:
+            return Response({'error': f"group_by must be one of {', '.join(ActivityRollup.DIMENSIONS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if bucket not in ActivityRollup.PERIODS:
+            return Response({'error': f"bucket must be one of {', '.join(ActivityRollup.PERIODS)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            end = _parse_day(request.query_params.get('to')) or timezone.localdate()
+            start = _parse_day(request.query_params.get('from')) or end - timedelta(days=30)
+        except ValueError:
+            return Response({'error': 'from and to must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'error': 'from must not be after to'}, status=status.HTTP_400_BAD_REQUEST)
+
+        buckets = ActivityRollup.objects.filter(
+            dimension=group_by,
+            period=bucket,
+            bucket_start__gte=rollups.bucket_start(start, bucket),
+            bucket_start__lte=end,
+        )
+        key = request.query_params.get('key')
+        if key:
+            buckets = buckets.filter(key=key)
+
+        paginator = RollupPagination()
+        page = paginator.paginate_queryset(buckets.values('key', 'bucket_start', *rollups.MEASURES), request, view=self)
+        return paginator.get_paginated_response([
+            dict(row, bucket_start=row['bucket_start'].isoformat(), distance=round(row['distance'], 3))
+            for row in page
+        ])
+
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """Stream activities oldest first as NDJSON (default) or CSV (?format=csv)"""
+        activities = self.get_queryset()
+        username = request.query_params.get('user')
+        if username:
+            activities = activities.filter(user=username)
+        try:
+            start = _parse_day(request.query_params.get('from'))
+            end = _parse_day(request.query_params.get('to'))
+        except ValueError:
+            return Response({'error': 'from and to must be dates (YYYY-MM-DD)'}, status=status.HTTP_400_BAD_REQUEST)
+        if start:
+            activities = activities.filter(date__gte=_start_of_day(start))
+        if end:
+            activities = activities.filter(date__lt=_start_of_day(end + timedelta(days=1)))
+
+        renderer = request.accepted_renderer
+        columns = [name for name, field in self.get_serializer().fields.items() if not field.write_only]
+        response = StreamingHttpResponse(
+            renderer.stream(columns, self.export_batches(activities.order_by('date', 'id'))),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="activities.{renderer.format}"'
+        return response
+
+    def export_batches(self, queryset):
+        """Serialized rows in lists of ``OCTOFIT_EXPORT_CHUNK_SIZE``, read through a server-side cursor"""
+        chunk_size = settings.OCTOFIT_EXPORT_CHUNK_SIZE
+        plan = self.get_field_plan()
+        if plan is not None:
+            rows = queryset.values(*plan.columns).iterator(chunk_size=chunk_size)
+        else:
+            rows = queryset.iterator(chunk_size=chunk_size)
+        while True:
+            batch = list(islice(rows, chunk_size))
+            if not batch:
+                return
+            yield plan.represent(batch) if plan is not None else self.get_serializer(batch, many=True).data
+
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """Create a batch of activities from a JSON array or NDJSON stream"""
+        items = request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'A non-empty list of activities is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.OCTOFIT_BULK_MAX_ITEMS:
+            return Response({'error': f'At most {settings.OCTOFIT_BULK_MAX_ITEMS} activities per batch'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Only string usernames are preloaded; the serializer reports any other value per item.
+        usernames = {item['user'] for item in items if isinstance(item, dict) and isinstance(item.get('user'), str)}
+        users = User.objects.in_bulk(list(usernames), field_name='username')
+        context = dict(self.get_serializer_context(), preloaded={'username': users})
+        serializer = self.get_serializer(data=items, many=True, context=context)
+        if serializer.is_valid():
+            errors = {}
+            valid = list(enumerate(serializer.validated_data))
+        else:
+            # Keep the valid items; ListSerializer discards them once any item fails.
+            errors = {index: error for index, error in enumerate(serializer.errors) if error}
+            valid = [(index, serializer.child.run_validation(item))
+                     for index, item in enumerate(items) if index not in errors]
 
-class LeaderboardViewSet(viewsets.ModelViewSet):
+        created = []
+        if valid:
+            with transaction.atomic():
+                created = Activity.objects.bulk_create(
+                    [Activity(**data) for _, data in valid],
+                    batch_size=settings.OCTOFIT_BULK_BATCH_SIZE,
+                )
+                apply_activity_changes(added=created)
+
+        results = [{'index': index, 'status': 'invalid', 'errors': error} for index, error in errors.items()]
+        results += [
+            {'index': index, 'status': 'created', 'id': str(activity.id) if activity.id is not None else None}
+            for (index, _), activity in zip(valid, created)
+        ]
+        results.sort(key=lambda result: result['index'])
+
+        if not errors:
+            response_status = status.HTTP_201_CREATED
+        elif created:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_400_BAD_REQUEST
+        return Response({'created': len(created), 'invalid': len(errors), 'results': results}, status=response_status)
+
+
+def _select_fields(available, params):
+    """Validate ``?fields=`` and ``?omit=`` against ``available`` field names"""
+    requested = {
+        param: {name.strip() for value in params.getlist(param) for name in value.split(',') if name.strip()}
+        for param in ('fields', 'omit')
+    }
+    if not requested['fields'] and not requested['omit']:
+        return None
+    unknown = sorted((requested['fields'] | requested['omit']) - set(available))
+    if unknown:
+        raise ValidationError({'fields': f'Unknown field(s): {", ".join(unknown)}'})
+    selected = tuple(
+        name for name in available
+        if (not requested['fields'] or name in requested['fields']) and name not in requested['omit']
+    )
+    if not selected:
+        raise ValidationError({'fields': 'At least one field must be selected'})
+    return selected
+
+
+def _parse_day(value):
+    """``None`` for a missing value; ``ValueError`` for anything but YYYY-MM-DD"""
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise ValueError(value)
+    return day
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class LeaderboardViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ReadOnlyModelViewSet):
     """
     API endpoint for leaderboard.
-    Allows CRUD operations on leaderboard entries.
+    Read-only: entries, totals and ranks are maintained by ``aggregation``.
     """
-    queryset = Leaderboard.objects.all()
+    queryset = Leaderboard.objects.select_related('user', 'team')
     serializer_class = LeaderboardSerializer
+    version_namespaces = ('leaderboard',)
+    pagination_class = LeaderboardPagination
+
+    def get_version_namespaces(self):
+        if self.action == 'movement':
+            return ('snapshot',)
+        if self.action == 'list' and 'window' in self.request.query_params:
+            return ()  # windows move with the calendar, not only with writes
+        return self.version_namespaces
+
+    def list(self, request, *args, **kwargs):
+        """All-time standings, or points earned within ``?window=7d|30d|season``"""
+        if 'window' in request.query_params:
+            return self.windowed(request)
+        return super().list(request, *args, **kwargs)
+
+    @cached_response('leaderboard')
+    def windowed(self, request):
+        """Users ranked by the points of their activities within the window, from the rollups"""
+        try:
+            start, end = snapshots.parse_window(request.query_params['window'])
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.OCTOFIT_MAX_PAGE_SIZE))
+        team = request.query_params.get('team')
+        users = User.objects.filter(team=team).values('username') if team else None
+        rows = rollups.window_totals(start, end, users)[:limit]
+        return Response({
+            'window': request.query_params['window'],
+            'from': start.isoformat(),
+            'to': end.isoformat(),
+            'results': [
+                {'rank': rank, 'user': row['key'], 'points': row['points'], 'activities': row['activities']}
+                for rank, row in enumerate(rows, start=1)
+            ],
+        })
 
     @action(detail=False, methods=['get'])
+    @cached_response('leaderboard')
     def top_users(self, request):
         """Get top N users from leaderboard"""
-        limit = int(request.query_params.get('limit', 10))
-        top_users = Leaderboard.objects.all().order_by('-total_points')[:limit]
-        serializer = self.get_serializer(top_users, many=True)
-        return Response(serializer.data)
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.OCTOFIT_MAX_PAGE_SIZE))
+        top_users = self.get_queryset().order_by('-total_points', 'user_id')[:limit]
+        return Response(self.serialize_many(list(self.fast_queryset(top_users))))
+
+    @action(detail=False, methods=['get'])
+    @cached_response('leaderboard')
+    def rank_of(self, request):
+        """Get one user's leaderboard entry, including their rank"""
+        username = request.query_params.get('user', None)
+        if not username:
+            return Response({'error': 'User parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        entries = self.serialize_many(list(self.fast_queryset(self.get_queryset().filter(user=username))))
+        if not entries:
+            return Response({'error': 'User is not on the leaderboard'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(entries[0])
 
     @action(detail=False, methods=['get'])
+    @cached_response('leaderboard')
+    def around(self, request):
+        """Get the entries ranked within ``window`` places of a user"""
+        username = request.query_params.get('user', None)
+        if not username:
+            return Response({'error': 'User parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            window = int(request.query_params.get('window', 5))
+        except ValueError:
+            return Response({'error': 'window must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        window = max(0, min(window, settings.OCTOFIT_MAX_PAGE_SIZE // 2))
+        rank = Leaderboard.objects.filter(user=username).values_list('rank', flat=True).first()
+        if rank is None:
+            return Response({'error': 'User is not on the leaderboard'}, status=status.HTTP_404_NOT_FOUND)
+        # Ranks are kept dense by aggregation, so neighbours are a range on the rank index.
+        nearby = self.get_queryset().filter(rank__gte=rank - window, rank__lte=rank + window).order_by('rank')
+        return Response(self.serialize_many(list(self.fast_queryset(nearby))))
+
+    @action(detail=False, methods=['get'])
+    def movement(self, request):
+        """Get rank changes between the latest snapshot and the one ``?days=`` (default 7) before it"""
+        try:
+            days = int(request.query_params.get('days', 7))
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'error': 'days and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = max(1, min(limit, settings.OCTOFIT_MAX_PAGE_SIZE))
+        diff = snapshots.movement(max(days, 0), limit, request.query_params.get('user'))
+        if diff is None:
+            return Response({'error': f'No snapshots {days} days apart yet'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(diff)
+
+    @action(detail=False, methods=['get'])
+    @cached_response('leaderboard')
     def by_team(self, request):
         """Get leaderboard entries by team"""
         team_name = request.query_params.get('team', None)
         if team_name:
-            entries = Leaderboard.objects.filter(team=team_name)
-            serializer = self.get_serializer(entries, many=True)
-            return Response(serializer.data)
+            entries = self.get_queryset().filter(team=team_name)
+            return self.paginated_response(entries)
         return Response({'error': 'Team parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
 
-class WorkoutViewSet(viewsets.ModelViewSet):
+class WorkoutViewSet(ConditionalGetMixin, PaginatedActionMixin, viewsets.ModelViewSet):
     """
     API endpoint for workouts.
     Allows CRUD operations on workouts.
     """
     queryset = Workout.objects.all()
     serializer_class = WorkoutSerializer
+    version_namespaces = ('workout',)
 
     @action(detail=False, methods=['get'])
+    @cached_response('workout')
     def by_difficulty(self, request):
         """Get workouts by difficulty level"""
         difficulty = request.query_params.get('difficulty', None)
         if difficulty:
             workouts = Workout.objects.filter(difficulty=difficulty)
-            serializer = self.get_serializer(workouts, many=True)
-            return Response(serializer.data)
+            return self.paginated_response(workouts)
         return Response({'error': 'Difficulty parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, methods=['get'])
+    @cached_response('workout')
     def by_category(self, request):
         """Get workouts by category"""
         category = request.query_params.get('category', None)
         if category:
             workouts = Workout.objects.filter(category=category)
-            serializer = self.get_serializer(workouts, many=True)
-            return Response(serializer.data)
+            return self.paginated_response(workouts)
         return Response({'error': 'Category parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    def get_version_namespaces(self):
+        if self.action == 'recommended':
+            return ('workout', 'recommendation')
+        return self.version_namespaces
+
+    @action(detail=False, methods=['get'])
+    @cached_response('workout', 'recommendation')
+    def recommended(self, request):
+        """Get a user's precomputed workout recommendations, best first"""
+        username = request.query_params.get('user', None)
+        if not username:
+            return Response({'error': 'User parameter is required'}, status=status.HTTP_400_BAD_REQUEST)
+        stored = WorkoutRecommendation.objects.filter(user=username).values_list('workouts', 'scores').first()
+        if stored is None:
+            return Response({'error': 'No recommendations for this user yet'}, status=status.HTTP_404_NOT_FOUND)
+        ids, scores = stored
+        position = {pk: index for index, pk in enumerate(ids)}
+
+        def place(row):
+            return position[row['id'] if isinstance(row, dict) else row.pk]
+        # Workouts deleted since the last refresh simply drop out.
+        rows = sorted(self.fast_queryset(self.get_queryset().filter(pk__in=ids), ['id']), key=place)
+        data = self.serialize_many(rows)
+        return Response([dict(item, score=scores[place(row)]) for item, row in zip(data, rows)])
+
+
+@api_view(['GET'])
+def search(request):
+    """Typeahead search over users, teams and workouts by word prefix"""
+    query = request.query_params.get('q', '')
+    kinds = [kind for kind in request.query_params.get('kind', '').split(',') if kind]
+    unknown = set(kinds) - set(search_index.SOURCES)
+    if unknown:
+        return Response({'error': f"Unknown kind: {', '.join(sorted(unknown))}"}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        limit = int(request.query_params.get('limit', 10))
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    limit = max(1, min(limit, settings.OCTOFIT_MAX_PAGE_SIZE))
+    return Response({'results': search_index.search(query, kinds, limit)})
+
+
+@api_view(['GET'])
+def cache_stats(request):
+    """Hit/miss counters of the response cache, per endpoint"""
+    return Response({
+        'enabled': settings.OCTOFIT_RESPONSE_CACHE_ENABLED,
+        'ttl': settings.OCTOFIT_RESPONSE_CACHE_TTL,
+        'endpoints': response_cache_stats.snapshot(),
+    })
+
+
+@api_view(['GET'])
+def metrics(request):
+    """Per-view request metrics collected by RequestMetricsMiddleware"""
+    return Response(dict(
+        metrics_registry.snapshot(),
+        sample_rate=settings.OCTOFIT_METRICS_SAMPLE_RATE,
+        response_cache=response_cache_stats.snapshot(),
+    ))